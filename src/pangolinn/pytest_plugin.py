@@ -0,0 +1,153 @@
+# Copyright 2023 FBK
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License
+"""
+Pytest plugin that generates the pangolinn tests of the wrappers registered with
+:py:func:`register_wrapper`, so that no test class has to be written for each pair of wrapper
+and tester. E.g., in a test module collected by pytest::
+
+    from pangolinn.pytest_plugin import register_wrapper
+
+    @register_wrapper()
+    class MyWrapper(seq2seq.PangolinnSeq2SeqModuleWrapper):
+        ...
+
+generates the padding and causal tests of `MyWrapper`. Each test is a separate pytest item,
+so that they can be distributed among workers (e.g., with `pytest -n 8 --dist loadscope` of
+`pytest-xdist`). The plugin is enabled automatically when pangolinn is installed, and at the
+end of the session it reports the time spent in the tests and in building each wrapper.
+"""
+from __future__ import annotations
+
+from collections import defaultdict
+from typing import Any, Dict, List, Set, Tuple, Type
+
+import pytest
+
+
+# PyTorch (and therefore pangolinn.seq2seq) is imported only when wrappers are registered,
+# as the plugin is loaded by all the pytest sessions of the environment where it is installed
+
+# testers and class attributes of the generated test classes of each registered wrapper
+_REGISTERED_WRAPPERS: Dict[Type, Tuple[Tuple[Type, ...], Dict[str, Any]]] = {}
+_GENERATED_TEST_CLASSES: Set[Type] = set()
+# build times of the wrapper for each test, as (test class, test method name)
+_BUILD_TIMES: Dict[Tuple[Type, str], float] = {}
+
+_WRAPPER_PROPERTY = "pangolinn_wrapper"
+_BUILD_TIME_PROPERTY = "pangolinn_build_time"
+
+
+def register_wrapper(*testers: Type, **attributes: Any):
+    """
+    Class decorator that registers a :py:class:`pangolinn.seq2seq.PangolinnSeq2SeqModuleWrapper`
+    to generate its tests in the test module where it is defined.
+
+    :param testers: the testers to run on the wrapper; by default,
+                    :py:class:`pangolinn.seq2seq.EncoderPaddingTestCase` and
+                    :py:class:`pangolinn.seq2seq.CausalTestCase`
+    :param attributes: class attributes to set in the generated test classes
+                       (e.g., `cache_module_wrapper=True`)
+    """
+    if not testers:
+        from pangolinn import seq2seq
+        testers = (seq2seq.EncoderPaddingTestCase, seq2seq.CausalTestCase)
+
+    def register(wrapper_class: Type) -> Type:
+        _REGISTERED_WRAPPERS[wrapper_class] = (testers, attributes)
+        return wrapper_class
+    return register
+
+
+def _test_class(wrapper_class: Type, tester: Type, attributes: Dict[str, Any]) -> Type:
+    def _wrapper_setup(self, pangolinn_class: Type):
+        # records the time spent in building the wrapper for each test
+        try:
+            tester._wrapper_setup(self, pangolinn_class)
+        finally:
+            _BUILD_TIMES[(self.__class__, self._testMethodName)] = \
+                getattr(self, "module_wrapper_build_time", 0.0)
+
+    test_class = type(
+        f"{wrapper_class.__name__}{tester.__name__}",
+        (tester, ),
+        dict(
+            attributes,
+            module_wrapper_class=wrapper_class,
+            _wrapper_setup=_wrapper_setup,
+            __module__=wrapper_class.__module__,
+            __doc__=f"{tester.__name__} generated for {wrapper_class.__name__}."))
+    _GENERATED_TEST_CLASSES.add(test_class)
+    return test_class
+
+
+def pytest_pycollect_makeitem(collector: pytest.Collector, name: str, obj: Any):
+    # wrappers are expanded only in the module where they are defined, and not in the ones
+    # that import them
+    if not isinstance(collector, pytest.Module) or not isinstance(obj, type) or \
+            obj not in _REGISTERED_WRAPPERS or obj.__module__ != collector.obj.__name__:
+        return None
+    testers, attributes = _REGISTERED_WRAPPERS[obj]
+    items = []
+    for tester in testers:
+        test_class = _test_class(obj, tester, attributes)
+        # the generated unittest classes are collected by the builtin unittest support,
+        # which retrieves them from the module by name
+        setattr(collector.obj, test_class.__name__, test_class)
+        items.append(collector.ihook.pytest_pycollect_makeitem(
+            collector=collector, name=test_class.__name__, obj=test_class))
+    return items
+
+
+@pytest.hookimpl(hookwrapper=True)
+def pytest_runtest_makereport(item: pytest.Item, call: pytest.CallInfo):
+    outcome = yield
+    report = outcome.get_result()
+    cls = getattr(item, "cls", None)
+    if call.when == "call" and cls in _GENERATED_TEST_CLASSES:
+        # the properties are sent with the reports also by pytest-xdist workers
+        report.user_properties.append((_WRAPPER_PROPERTY, cls.module_wrapper_class.__name__))
+        report.user_properties.append(
+            (_BUILD_TIME_PROPERTY, _BUILD_TIMES.pop((cls, item.name), 0.0)))
+
+
+class _TimingReporter:
+    """
+    Collects the time of the generated tests from their reports.
+    """
+    def __init__(self):
+        self.test_times: Dict[str, List[float]] = defaultdict(list)
+        self.build_times: Dict[str, float] = defaultdict(float)
+
+    def pytest_runtest_logreport(self, report: pytest.TestReport):
+        properties = dict(report.user_properties)
+        if report.when != "call" or _WRAPPER_PROPERTY not in properties:
+            return
+        wrapper_name = properties[_WRAPPER_PROPERTY]
+        self.test_times[wrapper_name].append(report.duration)
+        self.build_times[wrapper_name] += properties[_BUILD_TIME_PROPERTY]
+
+    def pytest_terminal_summary(self, terminalreporter):
+        if not self.test_times:
+            return
+        terminalreporter.write_sep("=", "pangolinn timings")
+        terminalreporter.write_line(
+            f"{'wrapper':<40} {'tests':>6} {'test time (s)':>14} {'build time (s)':>15}")
+        for wrapper_name, test_times in sorted(self.test_times.items()):
+            terminalreporter.write_line(
+                f"{wrapper_name:<40} {len(test_times):>6} {sum(test_times):>14.3f} "
+                f"{self.build_times[wrapper_name]:>15.3f}")
+
+
+def pytest_configure(config: pytest.Config):
+    config.pluginmanager.register(_TimingReporter(), "pangolinn-timing-reporter")
@@ -0,0 +1,185 @@
+# Copyright 2023 FBK
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License
+"""
+Runner that executes pangolinn test suites in parallel. The tests are discovered as done by
+`python -m unittest discover` and each test class (i.e. each pair of wrapper and tester) is
+executed in a pool of processes, each one limited to a fixed number of PyTorch intra-op
+threads to avoid oversubscribing the CPU. The results are merged in a single report. Usage::
+
+    python -m pangolinn.run -s tests --workers 8 --threads-per-worker 4
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import time
+import unittest
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+
+@dataclass
+class TestClassResult:
+    """
+    Outcome of the tests of a test class. Tests are identified by their id.
+    """
+    name: str
+    tests_run: int = 0
+    duration: float = 0.0
+    failures: List[Tuple[str, str]] = field(default_factory=list)
+    errors: List[Tuple[str, str]] = field(default_factory=list)
+    skipped: List[Tuple[str, str]] = field(default_factory=list)
+    expected_failures: List[str] = field(default_factory=list)
+    unexpected_successes: List[str] = field(default_factory=list)
+
+    @property
+    def was_successful(self) -> bool:
+        return not (self.failures or self.errors or self.unexpected_successes)
+
+
+def _iter_tests(suite: unittest.TestSuite) -> Iterator[unittest.TestCase]:
+    for test in suite:
+        if isinstance(test, unittest.TestSuite):
+            yield from _iter_tests(test)
+        else:
+            yield test
+
+
+def _init_worker(threads_per_worker: int, sys_path: List[str]):
+    sys.path[:] = sys_path
+    import torch
+    torch.set_num_threads(threads_per_worker)
+
+
+def _run_tests(name: str, tests: Sequence[unittest.TestCase]) -> TestClassResult:
+    result = unittest.TestResult()
+    start_time = time.perf_counter()
+    unittest.TestSuite(tests).run(result)
+    return TestClassResult(
+        name=name,
+        tests_run=result.testsRun,
+        duration=time.perf_counter() - start_time,
+        failures=[(test.id(), traceback) for test, traceback in result.failures],
+        errors=[(test.id(), traceback) for test, traceback in result.errors],
+        skipped=[(test.id(), reason) for test, reason in result.skipped],
+        expected_failures=[test.id() for test, _ in result.expectedFailures],
+        unexpected_successes=[test.id() for test in result.unexpectedSuccesses])
+
+
+def _run_test_class(args: Tuple[str, List[str]]) -> TestClassResult:
+    name, test_ids = args
+    loader = unittest.TestLoader()
+    return _run_tests(name, [loader.loadTestsFromName(test_id) for test_id in test_ids])
+
+
+def run(
+        start_dir: str = ".",
+        pattern: str = "test*.py",
+        top_level_dir: Optional[str] = None,
+        num_workers: Optional[int] = None,
+        threads_per_worker: Optional[int] = None) -> List[TestClassResult]:
+    """
+    Discovers the tests and runs each test class in a pool of processes.
+
+    :param start_dir: directory where the discovery of the tests starts
+    :param pattern: pattern of the names of the files containing tests
+    :param top_level_dir: top level directory of the project (defaults to `start_dir`)
+    :param num_workers: number of processes of the pool (defaults to the number of CPUs)
+    :param threads_per_worker: number of PyTorch intra-op threads of each process (defaults to
+                               the number of CPUs divided by the number of processes)
+    :return: the results of each test class
+    """
+    num_workers = num_workers or os.cpu_count() or 1
+    threads_per_worker = threads_per_worker or max(1, (os.cpu_count() or 1) // num_workers)
+    suite = unittest.TestLoader().discover(start_dir, pattern, top_level_dir)
+    test_classes: Dict[str, List[str]] = OrderedDict()
+    results = []
+    for test in _iter_tests(suite):
+        if type(test).__module__ == "unittest.loader":
+            # tests that could not be loaded (e.g., because of import errors) are run here,
+            # to report the loading error
+            results.append(_run_tests(test.id(), [test]))
+            continue
+        class_name = f"{type(test).__module__}.{type(test).__qualname__}"
+        test_classes.setdefault(class_name, []).append(test.id())
+    with multiprocessing.get_context("spawn").Pool(
+            num_workers,
+            initializer=_init_worker,
+            initargs=(threads_per_worker, list(sys.path))) as pool:
+        results.extend(pool.imap_unordered(_run_test_class, test_classes.items()))
+    return sorted(results, key=lambda r: r.name)
+
+
+def format_report(results: List[TestClassResult], wall_time: float) -> str:
+    """
+    :param results: the results returned by :py:func:`run`
+    :param wall_time: the overall time spent in running the tests
+    :return: the report of the results, with failures and errors first
+    """
+    lines = []
+    for result in results:
+        for kind, problems in (("FAIL", result.failures), ("ERROR", result.errors)):
+            for test_id, traceback in problems:
+                lines.extend(["=" * 70, f"{kind}: {test_id}", "-" * 70, traceback])
+    lines.append("-" * 70)
+    for result in results:
+        status = "ok" if result.was_successful else "FAILED"
+        lines.append(
+            f"{result.name:<80} {result.tests_run:>4} tests {result.duration:>8.2f}s {status}")
+    lines.append("-" * 70)
+    num_tests = sum(result.tests_run for result in results)
+    cumulative_time = sum(result.duration for result in results)
+    lines.append(
+        f"Ran {num_tests} tests in {wall_time:.3f}s ({cumulative_time:.3f}s cumulative)")
+    problems = {
+        "failures": sum(len(result.failures) for result in results),
+        "errors": sum(len(result.errors) for result in results),
+        "skipped": sum(len(result.skipped) for result in results),
+        "expected failures": sum(len(result.expected_failures) for result in results),
+        "unexpected successes": sum(len(result.unexpected_successes) for result in results)}
+    details = ", ".join(f"{kind}={count}" for kind, count in problems.items() if count > 0)
+    status = "OK" if all(result.was_successful for result in results) else "FAILED"
+    lines.append(f"{status} ({details})" if details else status)
+    return "\n".join(lines)
+
+
+def main(args: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Runs pangolinn test suites in parallel, one test class per task.")
+    parser.add_argument("-s", "--start-directory", default=".",
+                        help="directory where the discovery of the tests starts")
+    parser.add_argument("-p", "--pattern", default="test*.py",
+                        help="pattern of the names of the files containing tests")
+    parser.add_argument("-t", "--top-level-directory", default=None,
+                        help="top level directory of the project")
+    parser.add_argument("-j", "--workers", type=int, default=None,
+                        help="number of worker processes (defaults to the number of CPUs)")
+    parser.add_argument("--threads-per-worker", type=int, default=None,
+                        help="number of PyTorch intra-op threads of each worker (defaults to "
+                             "the number of CPUs divided by the number of workers)")
+    parsed_args = parser.parse_args(args)
+    start_time = time.perf_counter()
+    results = run(
+        parsed_args.start_directory,
+        parsed_args.pattern,
+        parsed_args.top_level_directory,
+        parsed_args.workers,
+        parsed_args.threads_per_worker)
+    print(format_report(results, time.perf_counter() - start_time))
+    return 0 if all(result.was_successful for result in results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
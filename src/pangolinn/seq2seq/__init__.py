@@ -11,8 +11,29 @@
 # WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 # See the License for the specific language governing permissions and
 # limitations under the License
-__all__ = ["CausalTestCase", "EncoderPaddingTestCase", "PangolinnSeq2SeqModuleWrapper"]
+__all__ = [
+    "CausalTestCase",
+    "CompiledModuleTestCase",
+    "ComplexityTestCase",
+    "EncoderPaddingTestCase",
+    "IncrementalDecodingTestCase",
+    "MemoryTestCase",
+    "PackedSequenceTestCase",
+    "PaddingGradientTestCase",
+    "PangolinnSeq2SeqModuleWrapper",
+    "QuantizedModuleTestCase",
+    "StreamingEncoderTestCase",
+    "ThreadScalingTestCase"]
 
 from .causal_tester import CausalTestCase  # noqa: F401
+from .compiled_tester import CompiledModuleTestCase  # noqa: F401
+from .complexity_tester import ComplexityTestCase  # noqa: F401
+from .gradient_tester import PaddingGradientTestCase  # noqa: F401
+from .incremental_tester import IncrementalDecodingTestCase  # noqa: F401
+from .memory_tester import MemoryTestCase  # noqa: F401
+from .packed_tester import PackedSequenceTestCase  # noqa: F401
 from .padding_tester import EncoderPaddingTestCase  # noqa: F401
+from .quantized_tester import QuantizedModuleTestCase  # noqa: F401
 from .seq2seq_module_wrapper import PangolinnSeq2SeqModuleWrapper  # noqa: F401
+from .streaming_tester import StreamingEncoderTestCase  # noqa: F401
+from .threads_tester import ThreadScalingTestCase  # noqa: F401
@@ -11,20 +11,180 @@
 # WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 # See the License for the specific language governing permissions and
 # limitations under the License
+import hashlib
+import logging
+import os
+import statistics
+import time
 import unittest
-from typing import List, Tuple, Type
+import weakref
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple, Type
 
 import torch
 from torch import Tensor, LongTensor
 
+from pangolinn.seq2seq.diagnostics import ActivationRecorder, first_divergence
+from pangolinn.seq2seq.length_probe import probe_length_mapping
+from pangolinn.seq2seq.length_sweep import shrink_lengths, sweep_lengths
+from pangolinn.seq2seq.profiling import SubmoduleProfile, format_profile
 from pangolinn.seq2seq.seq2seq_module_wrapper import PangolinnSeq2SeqModuleWrapper
+from pangolinn.seq2seq.utils import isclose, rand_padded_batch, rand_tensor, time_forward
+
+
+LOGGER = logging.getLogger(__name__)
+
+
+class _CachedModuleWrapper:
+    """
+    Wrapper instance shared by the tests, together with a snapshot of the state of its module,
+    which is restored before each test so that tests cannot affect each other.
+    """
+    def __init__(self, module_wrapper: PangolinnSeq2SeqModuleWrapper, build_time: float):
+        self.module_wrapper = module_wrapper
+        self.build_time = build_time
+        self._snapshot = {
+            name: tensor.detach().clone()
+            for name, tensor in module_wrapper._module.state_dict(keep_vars=True).items()}
+
+    def restore(self) -> PangolinnSeq2SeqModuleWrapper:
+        """
+        Restores the snapshot of the module state. The tensors are compared by content with
+        the snapshot, as in-place writes through `.data` are not tracked by the version
+        counter of the tensors, and only the modified (or replaced) ones are copied back.
+        """
+        module = self.module_wrapper._module
+        current_state = module.state_dict(keep_vars=True)
+        assert current_state.keys() == self._snapshot.keys(), \
+            "The state of the cached module has been altered: tests cannot add or remove " \
+            "parameters or buffers when `cache_module_wrapper` is enabled."
+        for name, tensor in current_state.items():
+            snapshot = self._snapshot[name]
+            if tensor.dtype != snapshot.dtype or tensor.shape != snapshot.shape or \
+                    not torch.equal(tensor.detach(), snapshot):
+                tensor.data = snapshot.clone()
+        module.zero_grad(set_to_none=True)
+        module.eval()
+        return self.module_wrapper
+
+
+class _ForwardOutputCache:
+    """
+    Least recently used cache of the outputs of the forwards of a module, which keeps the
+    statistics of hits and misses.
+    """
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Tuple, Tuple[weakref.ref, Tensor]]" = OrderedDict()
+
+    def get(self, key: Tuple, module: torch.nn.Module) -> Optional[Tensor]:
+        entry = self._entries.get(key)
+        # the module is checked in addition to the key, as the id of a module that has been
+        # garbage collected can be reused by a new one
+        if entry is None or entry[0]() is not module:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def put(self, key: Tuple, module: torch.nn.Module, output: Tensor):
+        self._entries[key] = (weakref.ref(module), output)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+
+def _tensor_digest(tensor: Tensor) -> bytes:
+    """
+    :return: a digest of the content of the tensor
+    """
+    # the tensor is copied into a storage of its own, as the storage of a view can be larger
+    tensor_bytes = bytes(tensor.detach().clone().contiguous().view(torch.uint8).untyped_storage())
+    return hashlib.blake2b(tensor_bytes, digest_size=16).digest()
+
+
+_MODULE_WRAPPERS_CACHE: Dict[Type, _CachedModuleWrapper] = {}
+_FORWARD_OUTPUT_CACHES: Dict[Type, _ForwardOutputCache] = {}
+# random inputs from which the tests draw their batches when forward outputs are cached,
+# for each wrapper class and seed
+_SEEDED_INPUTS: Dict[Tuple[Type, int], Tensor] = {}
+_SUBMODULE_PROFILES: Dict[Type, SubmoduleProfile] = {}
+_PRECISION_SPEEDUPS: Dict[Tuple[Type, torch.dtype], float] = {}
+
+# tolerances used when comparing outputs in reduced precision, which are looser than
+# the default ones of torch.testing.assert_close as errors accumulate through the layers
+_REDUCED_PRECISION_TOLERANCES = {
+    torch.bfloat16: {"rtol": 5e-2, "atol": 5e-2},
+    torch.float16: {"rtol": 5e-3, "atol": 5e-3},
+}
 
 
 class BaseTester(unittest.TestCase):
     """
     This class provides basic functions useful for pangolinn sequence-to-sequence testers.
+
+    If building the module to be tested is expensive, set the class attribute
+    `cache_module_wrapper` to `True` in your test class: the wrapper is then built only once
+    per process (and shared by all the test classes using the same wrapper class), while its
+    state is restored before each test. The time spent in building the wrapper is reported
+    separately from the time spent in running each test.
+
+    The sequence lengths used by the tests are generated by
+    :py:func:`pangolinn.seq2seq.length_sweep.sweep_lengths`, around `sweep_num_multiples`
+    multiples of the downsampling factor and adding `sweep_num_random_lengths` lengths drawn
+    with the seed `sweep_seed`.
+
+    If `probe_sequence_lengths` is set to `True`, the mapping between input and output
+    sequence lengths is inferred by probing the module (see
+    :py:func:`pangolinn.seq2seq.length_probe.probe_length_mapping`). If the wrapper overrides
+    `sequence_downsampling_factor` or `output_sequence_length`, they are checked against the
+    inferred mapping; otherwise, the inferred mapping is used as `output_sequence_length`.
+
+    If a forward of the module to be tested is expensive, set also `cache_forward_outputs`
+    to `True`: the random inputs of all the tests are then drawn from a single random batch
+    generated with the seed `sweep_seed`, where the sequence in position `i` of an input is
+    a prefix of the `i`-th sequence of the seeded batch, and the outputs of the forwards are
+    cached (up to `forward_cache_size` outputs, evicting the least recently used ones) and
+    reused by all the tests of the classes sharing the same wrapper that feed the module with
+    the same input, as long as the state of the module is not altered. Forwards whose input
+    requires gradients are never cached. The hits and misses of the cache are logged at the
+    end of the tests of each class.
+
+    If `profile_submodules` is set to `True`, the wall time and the number of calls of each
+    submodule are collected while the tests run. At the end of the tests of the class, they
+    are logged as a table and, if `profile_output_dir` is set, saved as JSON in the file
+    `<profile_output_dir>/<test module>.<test class>.json`.
+
+    If `diagnose_failures` is set to `True`, the activations of all the submodules are
+    recorded during the forwards of the tests that compare the output over a batch with the
+    output over a part of it (the padding invariance and causality tests). When such a
+    comparison fails, the first submodule whose output diverges is reported in the error
+    message together with the offending positions. The forward output cache is not used
+    in this mode.
+
+    To run the tests in reduced precision (e.g., `torch.bfloat16`), set `precision_dtype`:
+    the module and the floating point inputs are cast to it, the outputs are compared with
+    tolerances suited to it, and the throughput gain over float32 is logged. The tolerances
+    can be overridden with the class attributes `rtol` and `atol`.
     """
     module_wrapper_class: PangolinnSeq2SeqModuleWrapper.__class__
+    cache_module_wrapper: bool = False
+    cache_forward_outputs: bool = False
+    forward_cache_size: int = 32
+    profile_submodules: bool = False
+    profile_output_dir: Optional[str] = None
+    diagnose_failures: bool = False
+    sweep_num_random_lengths: int = 4
+    sweep_num_multiples: int = 2
+    sweep_seed: int = 0
+    probe_sequence_lengths: bool = False
+    precision_dtype: Optional[torch.dtype] = None
+    rtol: Optional[float] = None
+    atol: Optional[float] = None
 
     def _wrapper_setup(self, pangolinn_class: Type):
         assert self.__class__ is not pangolinn_class, \
@@ -34,7 +194,273 @@ class BaseTester(unittest.TestCase):
         assert self.module_wrapper_class is not None, \
             "Override the class attribute `module_wrapper_class` by setting it to the class of " \
             "your wrapper (e.g., `module_wrapper_class = MyWrapper`)."
-        self.module_wrapper: PangolinnSeq2SeqModuleWrapper = self.module_wrapper_class()
+        assert self.cache_module_wrapper or not self.cache_forward_outputs, \
+            "`cache_forward_outputs` requires `cache_module_wrapper` to be enabled, as the " \
+            "outputs can be reused only if the tests share the same module."
+        if self.cache_module_wrapper:
+            self.module_wrapper: PangolinnSeq2SeqModuleWrapper = self._cached_module_wrapper()
+        else:
+            self.module_wrapper: PangolinnSeq2SeqModuleWrapper = self._build_module_wrapper()
+        self._downsampling_factor = self.module_wrapper.sequence_downsampling_factor
+        if self.probe_sequence_lengths:
+            self._setup_length_mapping()
+        if self.precision_dtype is not None:
+            self._setup_precision()
+        if self.profile_submodules:
+            profile = _SUBMODULE_PROFILES.setdefault(self.__class__, SubmoduleProfile())
+            profile_context = profile.record(self.module_wrapper._module)
+            profile_context.__enter__()
+            self.addCleanup(profile_context.__exit__, None, None, None)
+        self._test_start_time = time.perf_counter()
+
+    def _setup_length_mapping(self):
+        mapping = probe_length_mapping(self.module_wrapper)
+        self.assertIsNotNone(
+            mapping,
+            "Unable to infer the mapping between input and output sequence lengths by probing "
+            f"{self.module_wrapper_class.__name__}: please check the output shape returned by "
+            "its forward.")
+        wrapper_class = self.module_wrapper_class
+        declares_mapping = \
+            wrapper_class.output_sequence_length is not \
+            PangolinnSeq2SeqModuleWrapper.output_sequence_length or \
+            wrapper_class.sequence_downsampling_factor is not \
+            PangolinnSeq2SeqModuleWrapper.sequence_downsampling_factor
+        if declares_mapping:
+            mismatches = [
+                (length, self.module_wrapper.output_sequence_length(length), mapping(length))
+                for length in range(1, 65)
+                if mapping(length) > 0 and
+                self.module_wrapper.output_sequence_length(length) != mapping(length)]
+            self.assertEqual(
+                0,
+                len(mismatches),
+                msg=f"The output sequence lengths declared by {wrapper_class.__name__} do not "
+                    f"match the ones returned by the module, which downsamples the input by a "
+                    f"factor {mapping.stride} ({mapping}). Mismatches as (input length, "
+                    f"declared output length, actual output length): {mismatches}")
+        else:
+            self.module_wrapper.output_sequence_length = mapping
+            self._downsampling_factor = mapping.stride
+
+    def _setup_precision(self):
+        """
+        Casts the module to `precision_dtype`, measuring (once per wrapper class) the
+        throughput gain over float32.
+        """
+        speedup_key = (self.module_wrapper_class, self.precision_dtype)
+        if speedup_key not in _PRECISION_SPEEDUPS:
+            lengths = LongTensor([64] * 8)
+            x = rand_padded_batch(self.module_wrapper, lengths)
+            fp32_latency = statistics.median(time_forward(self.module_wrapper, x, lengths))
+            self.module_wrapper._module.to(self.precision_dtype)
+            reduced_latency = statistics.median(time_forward(
+                self.module_wrapper, self._cast_input(x), lengths))
+            _PRECISION_SPEEDUPS[speedup_key] = fp32_latency / reduced_latency
+            LOGGER.info(
+                f"{self.module_wrapper_class.__name__} in {self.precision_dtype}: "
+                f"{_PRECISION_SPEEDUPS[speedup_key]:.2f}x throughput of float32 "
+                f"({reduced_latency * 1000:.3f}ms vs {fp32_latency * 1000:.3f}ms per batch)")
+        self.module_wrapper._module.to(self.precision_dtype)
+
+    def _cast_input(self, x: Tensor) -> Tensor:
+        if self.precision_dtype is not None and x.dtype.is_floating_point:
+            return x.to(self.precision_dtype)
+        return x
+
+    def _tolerances(self) -> Dict[str, Any]:
+        """
+        :return: the `rtol` and `atol` to be used when comparing outputs, or an empty
+                 dictionary if the defaults of the comparison functions have to be used
+        """
+        if self.rtol is not None or self.atol is not None:
+            return {"rtol": self.rtol or 0.0, "atol": self.atol or 0.0}
+        return dict(_REDUCED_PRECISION_TOLERANCES.get(self.precision_dtype, {}))
+
+    def _assert_close(self, actual: Tensor, expected: Tensor):
+        torch.testing.assert_close(actual, expected, **self._tolerances())
+
+    @contextmanager
+    def _recording_activations(self) -> Iterator[Optional[ActivationRecorder]]:
+        """
+        Within this context, the activations of the submodules are recorded if
+        `diagnose_failures` is enabled; otherwise, the context yields `None`.
+        """
+        if not self.diagnose_failures:
+            yield None
+            return
+        with ActivationRecorder().record(self.module_wrapper._module) as recorder:
+            yield recorder
+
+    def _assert_close_diagnosed(
+            self,
+            actual: Tensor,
+            expected: Tensor,
+            full_activations: Optional[ActivationRecorder],
+            partial_activations: Optional[ActivationRecorder],
+            items_idx: LongTensor):
+        """
+        Checks that `actual` and `expected` are close. If they are not and the activations
+        have been recorded, the first submodule whose output diverges is added to the
+        error message.
+
+        :param full_activations: the activations recorded during the forward over the batch
+        :param partial_activations: the activations recorded during the forward over a part
+                                    of the batch, which contains the items `items_idx`
+        """
+        try:
+            self._assert_close(actual, expected)
+        except AssertionError as error:
+            if full_activations is None or partial_activations is None:
+                raise
+            divergence = first_divergence(
+                full_activations, partial_activations, items_idx, **self._tolerances())
+            if divergence is None:
+                raise
+            raise self.failureException(f"{error}\n{divergence}") from error
+
+    def _perturbation_offending_pairs(
+            self, test_len: int, first_dependent_output: LongTensor) -> List[List[int]]:
+        """
+        Alters each time step of a random sequence and checks which output elements change.
+        A single batch is built, where the first element is a random sequence and each of the
+        other elements is the same sequence with a different time step altered, so that all
+        the time steps are checked with a single forward. As no gradient is involved, this
+        works also for integer inputs (e.g., token ids), whose values are altered within
+        `max_value_allowed`.
+
+        :param test_len: the length of the random sequence
+        :param first_dependent_output: tensor of shape (test_len, ) with, for each input time
+                                       step, the first output element allowed to depend on it
+        :return: the (output, input) position pairs in which the output changes when altering
+                 an input element it should not depend on
+        """
+        x = self._rand_input(1, test_len)
+        perturbed_x = x.repeat(test_len, 1, 1)
+        positions = torch.arange(test_len)
+        if self.module_wrapper.input_dtype.is_floating_point:
+            perturbed_x[positions, positions, :] += 1.0 + self._rand_tensor(
+                (test_len, self.module_wrapper.num_input_channels),
+                self.module_wrapper.input_dtype)
+        else:
+            max_value = self.module_wrapper.max_value_allowed
+            shift = torch.randint(
+                1, max_value, (test_len, self.module_wrapper.num_input_channels),
+                dtype=self.module_wrapper.input_dtype)
+            perturbed_x[positions, positions, :] = \
+                (perturbed_x[positions, positions, :] + shift) % max_value
+        batch = torch.cat([x, perturbed_x], dim=0)
+        expected_shape = [
+            test_len + 1,
+            self.module_wrapper.output_sequence_length(test_len),
+            self.module_wrapper.num_output_channels]
+        with torch.no_grad():
+            output = self._forward_with_expected_shape(
+                batch, LongTensor([test_len] * (test_len + 1)), expected_shape)
+        # changed[p, j] is True if the j-th output element changes when the p-th input is altered
+        changed = ~isclose(output[1:], output[:1], **self._tolerances()).all(dim=-1)
+        output_positions = torch.arange(output.shape[1]).unsqueeze(0)
+        not_dependent_mask = output_positions < first_dependent_output.unsqueeze(1)
+        return (changed & not_dependent_mask).nonzero()[:, [1, 0]].tolist()
+
+    def _assert_close_chunked(self, actual: Tensor, expected: Tensor, chunk_size: int):
+        """
+        Checks that `actual` and `expected`, with shape (batch, seq_len, channels), are close
+        comparing `chunk_size` time steps at a time, so that the memory required by the
+        comparison is bounded also for long sequences.
+        """
+        self.assertEqual(actual.shape, expected.shape)
+        for start in range(0, actual.shape[1], chunk_size):
+            end = min(start + chunk_size, actual.shape[1])
+            try:
+                self._assert_close(actual[:, start:end], expected[:, start:end])
+            except AssertionError as error:
+                raise self.failureException(
+                    f"Mismatch in the time steps [{start}, {end}) of sequences with "
+                    f"{actual.shape[1]} time steps: {error}") from error
+
+    def _build_module_wrapper(self) -> PangolinnSeq2SeqModuleWrapper:
+        start_time = time.perf_counter()
+        module_wrapper = self.module_wrapper_class()
+        self.module_wrapper_build_time = time.perf_counter() - start_time
+        LOGGER.info(
+            f"Built {self.module_wrapper_class.__name__} in "
+            f"{self.module_wrapper_build_time:.3f}s")
+        return module_wrapper
+
+    def _cached_module_wrapper(self) -> PangolinnSeq2SeqModuleWrapper:
+        cached_wrapper = _MODULE_WRAPPERS_CACHE.get(self.module_wrapper_class)
+        if cached_wrapper is None:
+            module_wrapper = self._build_module_wrapper()
+            _MODULE_WRAPPERS_CACHE[self.module_wrapper_class] = _CachedModuleWrapper(
+                module_wrapper, self.module_wrapper_build_time)
+            return module_wrapper
+        self.module_wrapper_build_time = 0.0
+        return cached_wrapper.restore()
+
+    def tearDown(self) -> None:
+        if hasattr(self, "_test_start_time"):
+            LOGGER.info(
+                f"{self.id()} took {time.perf_counter() - self._test_start_time:.3f}s "
+                f"(excluding {self.module_wrapper_build_time:.3f}s to build the module wrapper)")
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        forward_cache = _FORWARD_OUTPUT_CACHES.get(cls.module_wrapper_class) \
+            if cls.cache_forward_outputs else None
+        if forward_cache is not None:
+            LOGGER.info(
+                f"{cls.__name__}: {forward_cache.hits} hits and {forward_cache.misses} misses "
+                f"so far in the forward output cache of {cls.module_wrapper_class.__name__}")
+        profile = _SUBMODULE_PROFILES.pop(cls, None)
+        if profile is not None:
+            LOGGER.info(f"{cls.__name__}: submodule profile\n{format_profile(profile)}")
+            if cls.profile_output_dir is not None:
+                os.makedirs(cls.profile_output_dir, exist_ok=True)
+                profile.save_json(os.path.join(
+                    cls.profile_output_dir, f"{cls.__module__}.{cls.__name__}.json"))
+
+    def _forward_cache_key(self, x: Tensor, lengths: LongTensor) -> Tuple:
+        module = self.module_wrapper._module
+        # the state is fingerprinted by content, as in-place writes through `.data` are not
+        # tracked by the version counter of the tensors
+        module_state = tuple(
+            (name, tensor.dtype, tuple(tensor.shape), _tensor_digest(tensor))
+            for name, tensor in module.state_dict(keep_vars=True).items())
+        return (
+            module_state,
+            tuple(submodule.training for submodule in module.modules()),
+            x.dtype,
+            tuple(x.shape),
+            _tensor_digest(x),
+            tuple(lengths.tolist()))
+
+    def _forward(self, x: Tensor, lengths: LongTensor) -> Tensor:
+        """
+        Forwards `x` through the wrapped module, reusing the cached output if
+        `cache_forward_outputs` is enabled and the same forward has already been computed.
+
+        :param x: tensor used as input of the module to be tested
+        :param lengths: tensor containing the lengths of each sequence in `x`
+        :return: the output of the forward over the module to be tested, which is detached
+                 from the autograd graph if `cache_forward_outputs` is enabled and `x` does
+                 not require gradients
+        """
+        if not self.cache_forward_outputs or self.diagnose_failures or \
+                (torch.is_grad_enabled() and x.requires_grad):
+            return self.module_wrapper.forward(x, lengths)
+        forward_cache = _FORWARD_OUTPUT_CACHES.setdefault(
+            self.module_wrapper_class, _ForwardOutputCache(self.forward_cache_size))
+        # the cache is shared by the classes using the same wrapper, so it can hold at least
+        # the number of outputs requested by each of them
+        forward_cache.max_size = max(forward_cache.max_size, self.forward_cache_size)
+        module = self.module_wrapper._module
+        key = self._forward_cache_key(x, lengths)
+        output = forward_cache.get(key, module)
+        if output is None:
+            output = self.module_wrapper.forward(x, lengths).detach()
+            forward_cache.put(key, module, output)
+        return output
 
     def _forward_with_expected_shape(
             self, x: Tensor, lengths: LongTensor, expected_shape: List[int]) -> Tensor:
@@ -44,17 +470,105 @@ class BaseTester(unittest.TestCase):
         :param expected_shape: list of the expected dimensions
         :return: the output of the forward over the module to be tested
         """
-        output = self.module_wrapper.forward(x, lengths)
+        output = self._forward(x, lengths)
+        self._assert_expected_shape(output, expected_shape)
+        return output
+
+    def _assert_expected_shape(self, output: Tensor, expected_shape: List[int]):
         self.assertListEqual(
             expected_shape,
             list(output.size()),
             msg=f"Unexpected output shape {output.size()}. Model wrapper should return "
                 "a tensor of shape (batch, seq_len, channels), with expected shape "
                 f"{expected_shape}.")
-        return output
 
-    def _rand_tensor(self, shape: Tuple[int, int, int], dtype: torch.dtype) -> Tensor:
-        if dtype.is_floating_point or dtype.is_complex:
-            return torch.rand(shape, dtype=dtype)
-        else:
-            return torch.randint(self.module_wrapper.max_value_allowed, shape, dtype=dtype)
+    def _rand_tensor(self, shape: Tuple[int, ...], dtype: torch.dtype) -> Tensor:
+        return self._cast_input(rand_tensor(shape, dtype, self.module_wrapper.max_value_allowed))
+
+    def _seeded_input(self, batch_size: int, seq_len: int) -> Tensor:
+        """
+        :return: the first `seq_len` time steps of the first `batch_size` sequences of the
+                 random batch generated with the seed `sweep_seed` for the wrapper class, which
+                 is regenerated (with a size rounded up to a power of 2) when it is too small
+        """
+        key = (self.module_wrapper_class, self.sweep_seed)
+        seeded_input = _SEEDED_INPUTS.get(key)
+        if seeded_input is None or seeded_input.shape[0] < batch_size or \
+                seeded_input.shape[1] < seq_len or \
+                seeded_input.dtype != self.module_wrapper.input_dtype:
+            shape = (
+                1 << (batch_size - 1).bit_length(),
+                1 << (seq_len - 1).bit_length(),
+                self.module_wrapper.num_input_channels)
+            if seeded_input is not None:
+                shape = (max(shape[0], seeded_input.shape[0]),
+                         max(shape[1], seeded_input.shape[1]),
+                         shape[2])
+            with torch.random.fork_rng(devices=[]):
+                torch.manual_seed(self.sweep_seed)
+                seeded_input = rand_tensor(
+                    shape, self.module_wrapper.input_dtype, self.module_wrapper.max_value_allowed)
+            _SEEDED_INPUTS[key] = seeded_input
+        return self._cast_input(seeded_input[:batch_size, :seq_len, :].clone())
+
+    def _rand_input(self, batch_size: int, seq_len: int) -> Tensor:
+        """
+        :param batch_size: the number of sequences of the input
+        :param seq_len: the length of the sequences of the input
+        :return: a random input of shape (batch_size, seq_len, num_input_channels), drawn from
+                 the seeded batch shared by the tests if `cache_forward_outputs` is enabled,
+                 so that its forward can be reused
+        """
+        if self.cache_forward_outputs:
+            return self._seeded_input(batch_size, seq_len)
+        return self._rand_tensor(
+            (batch_size, seq_len, self.module_wrapper.num_input_channels),
+            self.module_wrapper.input_dtype)
+
+    def _rand_padded_batch(self, lengths: LongTensor) -> Tensor:
+        """
+        :param lengths: tensor of shape (batch, ) with the length of each sequence
+        :return: a random input batch of shape (batch, max(lengths), num_input_channels),
+                 whose padding area is set to zero. If `cache_forward_outputs` is enabled,
+                 the batch is drawn from the seeded batch shared by the tests, so that the
+                 same batch is generated for the same lengths and its forward can be reused.
+        """
+        x = self._rand_input(len(lengths), int(lengths.max()))
+        padding_mask = torch.arange(x.shape[1]).unsqueeze(0) >= lengths.unsqueeze(1)
+        return x.masked_fill(padding_mask.unsqueeze(-1), 0)
+
+    def _sweep_lengths(self, max_length: int) -> List[int]:
+        """
+        :param max_length: the maximum sequence length
+        :return: the sequence lengths to test, up to `max_length`
+        """
+        return sweep_lengths(
+            self._downsampling_factor,
+            max_length,
+            self.sweep_num_random_lengths,
+            self.sweep_seed,
+            self.sweep_num_multiples)
+
+    def _assert_with_shrinking(self, check: Callable[[List[int]], None], lengths: List[int]):
+        """
+        Runs `check` over the given configuration of lengths. If it fails, the configuration
+        is shrunk to a minimal failing one, which is added to the error message.
+
+        :param check: function that raises an AssertionError if the test fails for the
+                      configuration of lengths it receives
+        :param lengths: the configuration of lengths to test
+        """
+        try:
+            check(lengths)
+        except AssertionError as error:
+            def fails(candidate_lengths: List[int]) -> bool:
+                try:
+                    check(candidate_lengths)
+                except AssertionError:
+                    return True
+                return False
+
+            minimal_lengths = shrink_lengths(lengths, fails)
+            raise self.failureException(
+                f"{error}\nMinimal failing configuration of lengths: {minimal_lengths}") \
+                from error
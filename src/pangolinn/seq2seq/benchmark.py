@@ -0,0 +1,180 @@
+# Copyright 2023 FBK
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License
+"""
+Throughput and latency benchmark of the modules wrapped by a
+:py:class:`pangolinn.seq2seq.PangolinnSeq2SeqModuleWrapper`, so that the same wrapper
+used in the unit tests can be used to benchmark the module. It can be used either
+programmatically, through :py:func:`benchmark`, or from the command line, e.g.::
+
+    python -m pangolinn.seq2seq.benchmark my_tests.my_module:MyWrapper --batch-sizes 1 8
+"""
+import argparse
+import importlib
+import itertools
+import logging
+import statistics
+from dataclasses import dataclass
+from typing import List, Optional, Sequence
+
+import torch
+from torch import LongTensor
+
+from pangolinn.seq2seq.seq2seq_module_wrapper import PangolinnSeq2SeqModuleWrapper
+from pangolinn.seq2seq.utils import rand_padded_batch, time_forward
+
+
+LOGGER = logging.getLogger(__name__)
+
+
+@dataclass
+class BenchmarkResult:
+    """
+    Timings collected for a configuration of batch size, sequence length and padding ratio.
+    """
+    batch_size: int
+    sequence_length: int
+    padding_ratio: float
+    valid_tokens: int
+    padded_tokens: int
+    latencies: List[float]
+
+    @property
+    def p50_latency(self) -> float:
+        return self._latency_quantile(0.5)
+
+    @property
+    def p99_latency(self) -> float:
+        return self._latency_quantile(0.99)
+
+    @property
+    def tokens_per_second(self) -> float:
+        """
+        Number of valid (i.e. non-padding) input tokens processed per second.
+        """
+        return self.valid_tokens / statistics.mean(self.latencies)
+
+    def _latency_quantile(self, q: float) -> float:
+        return torch.tensor(self.latencies, dtype=torch.double).quantile(q).item()
+
+
+def lengths_for_padding_ratio(
+        batch_size: int, sequence_length: int, padding_ratio: float) -> Optional[LongTensor]:
+    """
+    :param batch_size: number of sequences in the batch
+    :param sequence_length: the length of the longest sequence of the batch
+    :param padding_ratio: the desired fraction of padding tokens in the batch
+    :return: the lengths of a batch where the first sequence has length `sequence_length`
+             and the others have the same length, chosen so that the fraction of padding
+             tokens is the closest to `padding_ratio`, or `None` if the padding ratio
+             cannot be obtained with the given batch size and sequence length.
+    """
+    if batch_size == 1:
+        return LongTensor([sequence_length]) if padding_ratio == 0.0 else None
+    valid_tokens = round((1.0 - padding_ratio) * batch_size * sequence_length)
+    other_lengths = round((valid_tokens - sequence_length) / (batch_size - 1))
+    if other_lengths < 1 or other_lengths > sequence_length:
+        return None
+    return LongTensor([sequence_length] + [other_lengths] * (batch_size - 1))
+
+
+def benchmark(
+        module_wrapper: PangolinnSeq2SeqModuleWrapper,
+        batch_sizes: Sequence[int] = (1, 8, 32),
+        sequence_lengths: Sequence[int] = (32, 128, 512),
+        padding_ratios: Sequence[float] = (0.0, 0.25, 0.5),
+        warmup_runs: int = 3,
+        timed_runs: int = 10) -> List[BenchmarkResult]:
+    """
+    Times the forward of the wrapped module over all the combinations of batch sizes,
+    sequence lengths and padding ratios. Combinations for which the padding ratio cannot be
+    obtained (e.g., a non-zero padding ratio with a batch size of 1) are skipped.
+
+    :param module_wrapper: the wrapper of the module to benchmark
+    :param batch_sizes: the batch sizes to benchmark
+    :param sequence_lengths: the lengths of the longest sequence in the batch to benchmark
+    :param padding_ratios: the fractions of padding tokens in the batch to benchmark
+    :param warmup_runs: number of forwards executed before the timed ones for each combination
+    :param timed_runs: number of timed forwards for each combination
+    :return: the results of each benchmarked combination
+    """
+    results = []
+    for batch_size, sequence_length, padding_ratio in itertools.product(
+            batch_sizes, sequence_lengths, padding_ratios):
+        lengths = lengths_for_padding_ratio(batch_size, sequence_length, padding_ratio)
+        if lengths is None:
+            LOGGER.info(
+                f"Skipping batch_size={batch_size}, sequence_length={sequence_length}, "
+                f"padding_ratio={padding_ratio}: padding ratio not achievable")
+            continue
+        x = rand_padded_batch(module_wrapper, lengths)
+        latencies = time_forward(module_wrapper, x, lengths, warmup_runs, timed_runs)
+        results.append(BenchmarkResult(
+            batch_size=batch_size,
+            sequence_length=sequence_length,
+            padding_ratio=padding_ratio,
+            valid_tokens=int(lengths.sum()),
+            padded_tokens=x.shape[0] * x.shape[1] - int(lengths.sum()),
+            latencies=latencies))
+    return results
+
+
+def format_results(results: List[BenchmarkResult]) -> str:
+    """
+    :param results: the results returned by :py:func:`benchmark`
+    :return: a table reporting the results, one line for each benchmarked combination
+    """
+    lines = [
+        f"{'batch':>6} {'seq_len':>8} {'pad_ratio':>9} {'valid_tok':>10} {'pad_tok':>10} "
+        f"{'tok/s':>12} {'p50 (ms)':>10} {'p99 (ms)':>10}"]
+    for result in results:
+        lines.append(
+            f"{result.batch_size:>6} {result.sequence_length:>8} {result.padding_ratio:>9.2f} "
+            f"{result.valid_tokens:>10} {result.padded_tokens:>10} "
+            f"{result.tokens_per_second:>12.1f} {result.p50_latency * 1000:>10.3f} "
+            f"{result.p99_latency * 1000:>10.3f}")
+    return "\n".join(lines)
+
+
+def load_wrapper_class(qualified_name: str) -> PangolinnSeq2SeqModuleWrapper.__class__:
+    """
+    :param qualified_name: the wrapper class in the format `package.module:ClassName`
+    :return: the wrapper class
+    """
+    module_name, class_name = qualified_name.split(":")
+    return getattr(importlib.import_module(module_name), class_name)
+
+
+def main(args: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(
+        description="Benchmarks the module wrapped by a PangolinnSeq2SeqModuleWrapper.")
+    parser.add_argument(
+        "wrapper", help="the wrapper class in the format package.module:ClassName")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--sequence-lengths", type=int, nargs="+", default=[32, 128, 512])
+    parser.add_argument("--padding-ratios", type=float, nargs="+", default=[0.0, 0.25, 0.5])
+    parser.add_argument("--warmup-runs", type=int, default=3)
+    parser.add_argument("--timed-runs", type=int, default=10)
+    parsed_args = parser.parse_args(args)
+    results = benchmark(
+        load_wrapper_class(parsed_args.wrapper)(),
+        batch_sizes=parsed_args.batch_sizes,
+        sequence_lengths=parsed_args.sequence_lengths,
+        padding_ratios=parsed_args.padding_ratios,
+        warmup_runs=parsed_args.warmup_runs,
+        timed_runs=parsed_args.timed_runs)
+    print(format_results(results))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,276 @@
+# Copyright 2023 FBK
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License
+"""
+Simulation of the batching policies used to serve or train the modules wrapped by a
+:py:class:`pangolinn.seq2seq.PangolinnSeq2SeqModuleWrapper`. Given the lengths of the
+sequences of a corpus and a token budget, the sequences are grouped into batches according to
+different strategies and the wrapped module is timed on the resulting batches, reporting the
+throughput and the fraction of padding of each strategy. Besides the padded strategies, the
+sequences can be packed into padding-free batches, timed with the `forward_packed` of the
+wrapper. As the padding (and packed sequence) tests ensure that the results do not depend on
+how sequences are batched, the strategy with the best throughput can be chosen safely. It can
+be used either programmatically, through :py:func:`simulate`, or from the command line, e.g.::
+
+    python -m pangolinn.seq2seq.bucketing my_tests.my_module:MyWrapper lengths.txt --max-tokens 512
+
+where `lengths.txt` contains the length of a sequence on each line.
+"""
+import argparse
+import bisect
+import logging
+import statistics
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from torch import LongTensor
+
+from pangolinn.seq2seq.benchmark import load_wrapper_class
+from pangolinn.seq2seq.seq2seq_module_wrapper import PangolinnSeq2SeqModuleWrapper
+from pangolinn.seq2seq.utils import pack_sequences, rand_padded_batch, time_forward
+
+
+LOGGER = logging.getLogger(__name__)
+
+
+@dataclass
+class BatchingResult:
+    """
+    Timings collected for the batches built by a batching strategy.
+    """
+    strategy: str
+    num_batches: int
+    valid_tokens: int
+    padded_tokens: int
+    total_time: float
+
+    @property
+    def padding_fraction(self) -> float:
+        """
+        Fraction of the tokens processed by the module that are padding.
+        """
+        return self.padded_tokens / (self.valid_tokens + self.padded_tokens)
+
+    @property
+    def tokens_per_second(self) -> float:
+        """
+        Number of valid (i.e. non-padding) input tokens processed per second.
+        """
+        return self.valid_tokens / self.total_time
+
+
+def _fill_batches(lengths: Sequence[int], max_tokens: int) -> List[List[int]]:
+    """
+    Adds the sequences to the current batch in the given order, starting a new batch when
+    the padded size of the current one would exceed `max_tokens`.
+    """
+    batches: List[List[int]] = []
+    current_batch: List[int] = []
+    for length in lengths:
+        if current_batch and \
+                (len(current_batch) + 1) * max(max(current_batch), length) > max_tokens:
+            batches.append(current_batch)
+            current_batch = []
+        current_batch.append(length)
+    if current_batch:
+        batches.append(current_batch)
+    return batches
+
+
+def unsorted_batches(lengths: Sequence[int], max_tokens: int) -> List[List[int]]:
+    """
+    :param lengths: the lengths of the sequences to batch
+    :param max_tokens: the maximum number of tokens (including padding) in a batch
+    :return: the lengths of the sequences in each batch, built without changing the order of
+             the sequences
+    """
+    return _fill_batches(lengths, max_tokens)
+
+
+def sorted_batches(lengths: Sequence[int], max_tokens: int) -> List[List[int]]:
+    """
+    :param lengths: the lengths of the sequences to batch
+    :param max_tokens: the maximum number of tokens (including padding) in a batch
+    :return: the lengths of the sequences in each batch, built after sorting the sequences
+             by length
+    """
+    return _fill_batches(sorted(lengths), max_tokens)
+
+
+def bucketed_batches(
+        lengths: Sequence[int],
+        max_tokens: int,
+        bucket_boundaries: Optional[Sequence[int]] = None) -> List[List[int]]:
+    """
+    :param lengths: the lengths of the sequences to batch
+    :param max_tokens: the maximum number of tokens (including padding) in a batch
+    :param bucket_boundaries: the (sorted) upper bounds of the length buckets; if not set, the
+                              powers of 2 are used
+    :return: the lengths of the sequences in each batch, where each batch contains only
+             sequences of the same bucket, in the original order
+    """
+    if bucket_boundaries is None:
+        bucket_boundaries = [2 ** i for i in range(max(lengths).bit_length() + 1)]
+    buckets: Dict[int, List[int]] = {}
+    for length in lengths:
+        buckets.setdefault(bisect.bisect_left(bucket_boundaries, length), []).append(length)
+    batches = []
+    for bucket_idx in sorted(buckets):
+        batches.extend(_fill_batches(buckets[bucket_idx], max_tokens))
+    return batches
+
+
+def packed_batches(lengths: Sequence[int], max_tokens: int) -> List[List[int]]:
+    """
+    Groups the sequences for a padding-free forward (see
+    :py:meth:`pangolinn.seq2seq.PangolinnSeq2SeqModuleWrapper.forward_packed`), where the
+    sequences of a batch are concatenated, so the cost of a batch is the sum of the lengths of
+    its sequences instead of its padded size.
+
+    :param lengths: the lengths of the sequences to batch
+    :param max_tokens: the maximum number of tokens in a batch, with no padding
+    :return: the lengths of the sequences in each batch, built by adding each sequence, from
+             the longest to the shortest, to the batch with the least room left that can still
+             contain it (best-fit decreasing)
+    """
+    batches: List[List[int]] = []
+    # (room left, index of the batch) of each batch, sorted to find the best fit by bisection
+    rooms: List[Tuple[int, int]] = []
+    for length in sorted(lengths, reverse=True):
+        room_idx = bisect.bisect_left(rooms, (length, -1))
+        if room_idx < len(rooms):
+            room, batch_idx = rooms.pop(room_idx)
+            batches[batch_idx].append(length)
+        else:
+            room, batch_idx = max_tokens, len(batches)
+            batches.append([length])
+        bisect.insort(rooms, (room - length, batch_idx))
+    return batches
+
+
+STRATEGIES: Dict[str, Callable[[Sequence[int], int], List[List[int]]]] = {
+    "unsorted": unsorted_batches,
+    "sorted": sorted_batches,
+    "bucketed": bucketed_batches,
+    "packed": packed_batches,
+}
+# strategies whose batches are processed without padding by the `forward_packed` of the wrapper
+PADDING_FREE_STRATEGIES = {"packed"}
+
+
+def simulate(
+        module_wrapper: PangolinnSeq2SeqModuleWrapper,
+        lengths: Sequence[int],
+        max_tokens: int,
+        strategies: Sequence[str] = tuple(STRATEGIES.keys()),
+        warmup_runs: int = 1,
+        timed_runs: int = 3) -> List[BatchingResult]:
+    """
+    Groups the sequences into batches with each of the given strategies and times the forward
+    of the wrapped module on all the resulting batches.
+
+    :param module_wrapper: the wrapper of the module to time
+    :param lengths: the lengths of the sequences to batch (e.g. the ones of a corpus)
+    :param max_tokens: the maximum number of tokens in a batch (including padding, unless the
+                       strategy is in :py:data:`PADDING_FREE_STRATEGIES`)
+    :param strategies: the names of the strategies in :py:data:`STRATEGIES` to simulate; the
+                       ones in :py:data:`PADDING_FREE_STRATEGIES` are skipped if the wrapper
+                       does not implement `forward_packed`
+    :param warmup_runs: number of forwards executed before the timed ones for each batch
+    :param timed_runs: number of timed forwards for each batch, whose median is used as the
+                       time of the batch
+    :return: the results of each strategy
+    """
+    results = []
+    for strategy in strategies:
+        batches = STRATEGIES[strategy](lengths, max_tokens)
+        padding_free = strategy in PADDING_FREE_STRATEGIES
+        valid_tokens, padded_tokens, total_time = 0, 0, 0.0
+        try:
+            for batch in batches:
+                batch_lengths = LongTensor(batch)
+                x = rand_padded_batch(module_wrapper, batch_lengths)
+                if padding_free:
+                    latencies = time_forward(
+                        module_wrapper, pack_sequences(x, batch_lengths), batch_lengths,
+                        warmup_runs, timed_runs, forward_fn=module_wrapper.forward_packed)
+                else:
+                    latencies = time_forward(
+                        module_wrapper, x, batch_lengths, warmup_runs, timed_runs)
+                    padded_tokens += len(batch) * max(batch) - sum(batch)
+                total_time += statistics.median(latencies)
+                valid_tokens += sum(batch)
+        except NotImplementedError:
+            if not padding_free:
+                raise
+            LOGGER.warning(
+                f"Skipping strategy {strategy} as the wrapper does not implement forward_packed")
+            continue
+        result = BatchingResult(
+            strategy=strategy,
+            num_batches=len(batches),
+            valid_tokens=valid_tokens,
+            padded_tokens=padded_tokens,
+            total_time=total_time)
+        LOGGER.info(
+            f"Strategy {strategy}: {result.num_batches} batches, "
+            f"{result.tokens_per_second:.1f} tok/s, padding {result.padding_fraction:.2%}")
+        results.append(result)
+    return results
+
+
+def format_results(results: List[BatchingResult]) -> str:
+    """
+    :param results: the results returned by :py:func:`simulate`
+    :return: a table reporting the results, one line for each strategy
+    """
+    lines = [
+        f"{'strategy':>10} {'batches':>8} {'valid_tok':>10} {'pad_tok':>10} {'pad_frac':>9} "
+        f"{'tok/s':>12} {'time (s)':>10}"]
+    for result in results:
+        lines.append(
+            f"{result.strategy:>10} {result.num_batches:>8} {result.valid_tokens:>10} "
+            f"{result.padded_tokens:>10} {result.padding_fraction:>9.3f} "
+            f"{result.tokens_per_second:>12.1f} {result.total_time:>10.3f}")
+    return "\n".join(lines)
+
+
+def main(args: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(
+        description="Simulates batching strategies on the module wrapped by a "
+                    "PangolinnSeq2SeqModuleWrapper.")
+    parser.add_argument(
+        "wrapper", help="the wrapper class in the format package.module:ClassName")
+    parser.add_argument(
+        "lengths_file", help="file containing the length of a sequence on each line")
+    parser.add_argument("--max-tokens", type=int, required=True)
+    parser.add_argument(
+        "--strategies", nargs="+", choices=list(STRATEGIES.keys()),
+        default=list(STRATEGIES.keys()))
+    parser.add_argument("--warmup-runs", type=int, default=1)
+    parser.add_argument("--timed-runs", type=int, default=3)
+    parsed_args = parser.parse_args(args)
+    with open(parsed_args.lengths_file) as lengths_file:
+        lengths = [int(line) for line in lengths_file if line.strip()]
+    results = simulate(
+        load_wrapper_class(parsed_args.wrapper)(),
+        lengths,
+        parsed_args.max_tokens,
+        strategies=parsed_args.strategies,
+        warmup_runs=parsed_args.warmup_runs,
+        timed_runs=parsed_args.timed_runs)
+    print(format_results(results))
+
+
+if __name__ == "__main__":
+    main()
@@ -11,9 +11,13 @@
 # WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 # See the License for the specific language governing permissions and
 # limitations under the License
+from typing import Optional
+
 import torch
 
 from pangolinn.seq2seq.base_tester import BaseTester
+from pangolinn.seq2seq.length_sweep import log_spaced_lengths
+from pangolinn.seq2seq.utils import default_tolerances
 
 
 class CausalTestCase(BaseTester):
@@ -28,17 +32,44 @@ class CausalTestCase(BaseTester):
      2. create test class that extends `CausalTestCase`;
      3. in your test class, override the class attribute `module_wrapper_class` by setting it to
         the **class** of your wrapper (e.g., `module_wrapper_class = MyWrapper`);
+
+    The class attributes `dependency_matrix_sequence_length` and `dependency_matrix_chunk_size`
+    control the length of the sequence used by `test_dependency_matrix_is_causal` and how many
+    output elements are backpropagated together (`None` means all of them in a single pass).
+    The tests based on gradients are skipped for modules with integer inputs (e.g., token ids),
+    which are covered by `test_future_perturbation_does_not_affect_past`.
+
+    To check long sequences, where bugs in relative positional encodings may appear only
+    beyond a certain length, set `stress_sequence_length`:
+    `test_long_sequence_not_looking_at_the_future` then compares the output over a sequence
+    of that length with the outputs over `stress_num_prefixes` of its prefixes, with
+    log-spaced lengths, `stress_chunk_size` time steps at a time and without tracking
+    gradients, so that runtime and memory stay bounded.
     """
+    dependency_matrix_sequence_length: int = 10
+    dependency_matrix_chunk_size: Optional[int] = None
+    perturbation_sequence_length: int = 20
+    stress_sequence_length: Optional[int] = None
+    stress_num_prefixes: int = 8
+    stress_chunk_size: int = 512
+
     def setUp(self) -> None:
         self._wrapper_setup(CausalTestCase)
 
+    def _skip_if_not_differentiable(self):
+        if not self.module_wrapper.input_dtype.is_floating_point:
+            self.skipTest(
+                "gradients cannot be computed with respect to inputs of type "
+                f"{self.module_wrapper.input_dtype}: causality is checked by "
+                "test_future_perturbation_does_not_affect_past")
+
     def test_gradient_not_flowing_from_future(self):
         """
         Checks that the gradient is not backpropagated to future input time steps, which should not
         be used to compute the output.
         """
-        x = self._rand_tensor(
-            (1, 10, self.module_wrapper.num_input_channels), self.module_wrapper.input_dtype)
+        self._skip_if_not_differentiable()
+        x = self._rand_input(1, 10)
         x.requires_grad = True
         expected_shape = [
             1,
@@ -60,21 +91,117 @@ class CausalTestCase(BaseTester):
         Tests that the module masks future elements and it does not look at them.
         """
         test_len = 20
-        x = self._rand_tensor(
-            (5, test_len, self.module_wrapper.num_input_channels), self.module_wrapper.input_dtype)
+        x = self._rand_input(5, test_len)
         batch_lens = torch.LongTensor([test_len] * 5)
         expected_shape = [
             5,
             self.module_wrapper.output_sequence_length(test_len),
             self.module_wrapper.num_output_channels]
-        output = self._forward_with_expected_shape(x, batch_lens, expected_shape)
-        for j in range(1, 19):
-            # Checks that for each of the 20 elements we obtain the same prefix in the
-            # results when feeding the model with the full input sequences and the input
+        with self._recording_activations() as full_activations:
+            output = self._forward_with_expected_shape(x, batch_lens, expected_shape)
+        # all the prefixes are checked, as their forwards are cheap, together with the
+        # boundary lengths of the sweep
+        prefix_lengths = sorted(set(range(1, test_len)).union(self._sweep_lengths(test_len - 1)))
+        for j in prefix_lengths:
+            # Checks that for each of the tested prefix lengths we obtain the same prefix in
+            # the results when feeding the model with the full input sequences and the input
             # prefix truncated at that element.
             partial_lens = torch.LongTensor([j] * 5)
-            partial_output = self.module_wrapper.forward(x[:, :j, :], partial_lens)
+            with self._recording_activations() as prefix_activations:
+                partial_output = self._forward(x[:, :j, :], partial_lens)
             partial_output_len = partial_output.shape[1]
-            torch.testing.assert_close(
+            self._assert_close_diagnosed(
                 partial_output,
-                output[:, :partial_output_len, :])
+                output[:, :partial_output_len, :],
+                full_activations,
+                prefix_activations,
+                torch.arange(5))
+
+    def test_long_sequence_not_looking_at_the_future(self):
+        """
+        Tests that the module does not look at future elements of a long sequence, checking
+        a few log-spaced prefixes. Skipped if `stress_sequence_length` is not set.
+        """
+        if self.stress_sequence_length is None:
+            self.skipTest("stress_sequence_length is not set")
+        test_len = self.stress_sequence_length
+        x = self._rand_input(1, test_len)
+        expected_shape = [
+            1,
+            self.module_wrapper.output_sequence_length(test_len),
+            self.module_wrapper.num_output_channels]
+        with torch.no_grad():
+            output = self._forward_with_expected_shape(
+                x, torch.LongTensor([test_len]), expected_shape)
+            for j in log_spaced_lengths(1, test_len - 1, self.stress_num_prefixes):
+                partial_output = self._forward(x[:, :j, :], torch.LongTensor([j]))
+                self._assert_close_chunked(
+                    partial_output,
+                    output[:, :partial_output.shape[1], :],
+                    self.stress_chunk_size)
+
+    def test_dependency_matrix_is_causal(self):
+        """
+        Computes the dependency matrix between output and input time steps in a single batched
+        backward pass and checks that it is lower-triangular according to
+        `output_sequence_length`, i.e. that the j-th output element does not depend on any
+        input element `i` such that `output_sequence_length(i) > j`. All the offending
+        (output, input) pairs are reported.
+
+        Instead of the full Jacobian, whose size grows with the square of both the sequence
+        length and the number of channels, the output channels are contracted with a random
+        vector and only the vector-Jacobian products of the single output time steps are
+        computed, so that the memory grows as `seq_len * seq_len * in_channels`. As the vector
+        is random, a dependency is missed only if it cancels out exactly, which has
+        probability zero.
+        """
+        self._skip_if_not_differentiable()
+        test_len = self.dependency_matrix_sequence_length
+        x = self._rand_input(1, test_len)
+        lengths = torch.LongTensor([test_len])
+        expected_shape = [
+            1,
+            self.module_wrapper.output_sequence_length(test_len),
+            self.module_wrapper.num_output_channels]
+        output, vjp_fn = torch.func.vjp(lambda inp: self.module_wrapper.forward(inp, lengths), x)
+        self._assert_expected_shape(output, expected_shape)
+        channels_projection = torch.randn(output.shape[-1], dtype=output.dtype)
+        # one cotangent per output time step, with shape (out_len, 1, out_len, out_channels)
+        cotangents = torch.eye(output.shape[1], dtype=output.dtype)[:, None, :, None] * \
+            channels_projection
+        vjps = torch.func.vmap(vjp_fn, chunk_size=self.dependency_matrix_chunk_size)(cotangents)
+        # vjps[0] has shape (out_len, 1, test_len, in_channels)
+        dependencies = vjps[0].abs().sum(dim=(1, 3))
+        output_positions = torch.arange(dependencies.shape[0]).unsqueeze(1)
+        first_dependent_output = torch.LongTensor(
+            [self.module_wrapper.output_sequence_length(i) for i in range(test_len)])
+        future_mask = output_positions < first_dependent_output.unsqueeze(0)
+        # gradients below the tolerance used to compare the outputs (relative to the largest
+        # dependency) are numerical noise of the precision in use, not actual dependencies
+        rtol, atol = default_tolerances(dependencies.dtype, **self._tolerances())
+        threshold = atol + rtol * dependencies.max()
+        offending_pairs = ((dependencies > threshold) & future_mask).nonzero().tolist()
+        self.assertEqual(
+            0,
+            len(offending_pairs),
+            msg=f"{len(offending_pairs)} (output, input) position pairs in which the output "
+                f"depends on future input elements: {offending_pairs}")
+
+    def test_future_perturbation_does_not_affect_past(self):
+        """
+        Tests that changing the input at a given time step does not change the output elements
+        that precede it. A single batch is built, where the first element is a random sequence
+        and each of the other elements is the same sequence with a different time step altered,
+        so that all the time steps are checked with a single forward. As no gradient is
+        involved, this test works also for integer inputs (e.g., token ids), whose values are
+        altered within `max_value_allowed`.
+        """
+        test_len = self.perturbation_sequence_length
+        first_dependent_output = torch.LongTensor(
+            [self.module_wrapper.output_sequence_length(p) for p in range(test_len)])
+        offending_pairs = self._perturbation_offending_pairs(test_len, first_dependent_output)
+        self.assertEqual(
+            0,
+            len(offending_pairs),
+            msg=f"{len(offending_pairs)} (output, input) position pairs in which the output "
+                f"changes when altering future input elements: {offending_pairs}")
@@ -0,0 +1,151 @@
+# Copyright 2023 FBK
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License
+import logging
+import statistics
+from contextlib import contextmanager
+from typing import Iterator, Optional, Sequence
+
+import torch
+from torch import LongTensor, nn
+
+from pangolinn.seq2seq.base_tester import BaseTester
+from pangolinn.seq2seq.utils import time_forward
+
+
+LOGGER = logging.getLogger(__name__)
+
+
+class CompiledModuleTestCase(BaseTester):
+    """
+    This class provides unit tests to enforce that the module to be tested can be served with
+    `torch.compile`, i.e. that the compiled module returns the same results as the eager one
+    and that variable-length batches do not trigger a recompilation for each new shape.
+
+    To use it to test your network:
+
+     1. create a `PangolinnSeq2SeqModuleWrapper` that wraps your module (e.g. `MyWrapper`);
+     2. create test class that extends `CompiledModuleTestCase`;
+     3. in your test class, override the class attribute `module_wrapper_class` by setting it to
+        the **class** of your wrapper (e.g., `module_wrapper_class = MyWrapper`);
+
+    As the wrapped module is replaced by its compiled version before each test, the padding and
+    causal tests can be executed over the compiled module by extending also the corresponding
+    test case, e.g.
+    `class MyCompiledTestCase(seq2seq.CompiledModuleTestCase, seq2seq.EncoderPaddingTestCase)`.
+
+    The module is compiled with the backend `compile_backend` and the `dynamic` setting
+    `compile_dynamic`. `test_recompilations` fails if running the module over all the
+    combinations of `compile_sweep_batch_sizes` and the lengths generated up to
+    `compile_sweep_max_length` requires more than `max_compilations` compilations. With the
+    default automatic dynamic shapes, a few compilations are expected: one with static shapes,
+    then one when the sequence length and one when the batch size change, in addition to
+    the specialization for sizes equal to 1.
+    The speedup of the compiled module over the eager one is logged and, if
+    `min_compiled_speedup` is set, checked by `test_compiled_speedup`.
+    """
+    compile_backend: str = "inductor"
+    compile_dynamic: Optional[bool] = None
+    max_compilations: int = 4
+    compile_sweep_batch_sizes: Sequence[int] = (1, 2, 5)
+    compile_sweep_max_length: int = 27
+    min_compiled_speedup: Optional[float] = None
+
+    def setUp(self) -> None:
+        self._wrapper_setup(CompiledModuleTestCase)
+        self._compile_module()
+
+    def _compile_module(self):
+        if not hasattr(torch, "compile"):
+            self.skipTest("torch.compile is not available in this version of PyTorch")
+        torch._dynamo.reset()
+        self.num_compilations = 0
+        backend = torch._dynamo.lookup_backend(self.compile_backend)
+
+        def counting_backend(graph_module, example_inputs):
+            self.num_compilations += 1
+            return backend(graph_module, example_inputs)
+
+        self.eager_module: nn.Module = self.module_wrapper._module
+        self.compiled_module = torch.compile(
+            self.eager_module, backend=counting_backend, dynamic=self.compile_dynamic)
+        self.module_wrapper._module = self.compiled_module
+
+    def tearDown(self) -> None:
+        if hasattr(self, "eager_module"):
+            self.module_wrapper._module = self.eager_module
+        super().tearDown()
+
+    @contextmanager
+    def _eager_forward(self) -> Iterator[None]:
+        """
+        Within this context, the wrapper uses the eager module instead of the compiled one.
+        """
+        self.module_wrapper._module = self.eager_module
+        try:
+            yield
+        finally:
+            self.module_wrapper._module = self.compiled_module
+
+    def test_compiled_matches_eager(self):
+        """
+        Tests that the compiled module returns the same results as the eager one.
+        """
+        lengths = LongTensor([self.compile_sweep_max_length, self.compile_sweep_max_length // 2])
+        x = self._rand_padded_batch(lengths)
+        with torch.no_grad():
+            compiled_output = self.module_wrapper.forward(x, lengths)
+            with self._eager_forward():
+                eager_output = self.module_wrapper.forward(x, lengths)
+        self._assert_close(compiled_output, eager_output)
+
+    def test_recompilations(self):
+        """
+        Tests that running the compiled module over batches with different sizes and sequence
+        lengths does not require more than `max_compilations` compilations.
+        """
+        shapes = [
+            (batch_size, length)
+            for batch_size in self.compile_sweep_batch_sizes
+            for length in self._sweep_lengths(self.compile_sweep_max_length)]
+        with torch.no_grad():
+            for batch_size, length in shapes:
+                x = self._rand_input(batch_size, length)
+                self.module_wrapper.forward(x, LongTensor([length] * batch_size))
+        LOGGER.info(f"{self.id()}: {self.num_compilations} compilations for {len(shapes)} shapes")
+        self.assertLessEqual(
+            self.num_compilations,
+            self.max_compilations,
+            msg=f"The module has been compiled {self.num_compilations} times when processing "
+                f"{len(shapes)} batches with different shapes, while at most "
+                f"{self.max_compilations} compilations are allowed.")
+
+    def test_compiled_speedup(self):
+        """
+        Logs the speedup of the compiled module over the eager one and, if
+        `min_compiled_speedup` is set, checks that it is at least `min_compiled_speedup`.
+        """
+        lengths = LongTensor([self.compile_sweep_max_length] * max(self.compile_sweep_batch_sizes))
+        x = self._rand_padded_batch(lengths)
+        compiled_latency = statistics.median(time_forward(self.module_wrapper, x, lengths))
+        with self._eager_forward():
+            eager_latency = statistics.median(time_forward(self.module_wrapper, x, lengths))
+        speedup = eager_latency / compiled_latency
+        LOGGER.info(
+            f"{self.id()}: eager {eager_latency * 1000:.3f}ms, compiled "
+            f"{compiled_latency * 1000:.3f}ms, speedup {speedup:.2f}x")
+        if self.min_compiled_speedup is not None:
+            self.assertGreaterEqual(
+                speedup,
+                self.min_compiled_speedup,
+                msg=f"The compiled module is only {speedup:.2f}x faster than the eager one.")
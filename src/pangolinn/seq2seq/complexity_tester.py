@@ -0,0 +1,127 @@
+# Copyright 2023 FBK
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License
+import logging
+import math
+from typing import List, Optional, Sequence
+
+import torch
+from torch import LongTensor
+
+from pangolinn.seq2seq.base_tester import BaseTester
+from pangolinn.seq2seq.memory import PeakMemoryTracker
+from pangolinn.seq2seq.utils import time_forward
+
+
+LOGGER = logging.getLogger(__name__)
+
+
+def scaling_exponent(sequence_lengths: Sequence[int], measures: Sequence[float]) -> float:
+    """
+    :param sequence_lengths: the sequence lengths at which the measures have been taken
+    :param measures: the measures (e.g., time or memory) taken for each sequence length
+    :return: the exponent `k` that best fits (in the least squares sense over the log-log
+             space) the relation `measure = c * sequence_length ** k`
+    """
+    log_lengths = [math.log(length) for length in sequence_lengths]
+    log_measures = [math.log(max(measure, 1e-12)) for measure in measures]
+    mean_length = sum(log_lengths) / len(log_lengths)
+    mean_measure = sum(log_measures) / len(log_measures)
+    covariance = sum(
+        (length - mean_length) * (measure - mean_measure)
+        for length, measure in zip(log_lengths, log_measures))
+    variance = sum((length - mean_length) ** 2 for length in log_lengths)
+    return covariance / variance
+
+
+class ComplexityTestCase(BaseTester):
+    """
+    This class provides unit tests to enforce that the time and the memory required by the
+    module to be tested do not grow with the sequence length more than expected (e.g., that
+    a convolutional block is linear and does not become quadratic because of an accidental
+    dense mask). The scaling exponent is estimated by running the module over a geometric
+    range of sequence lengths (`complexity_sequence_lengths`).
+
+    To use it to test your network:
+
+     1. create a `PangolinnSeq2SeqModuleWrapper` that wraps your module (e.g. `MyWrapper`);
+     2. create test class that extends `ComplexityTestCase`;
+     3. in your test class, override the class attribute `module_wrapper_class` by setting it to
+        the **class** of your wrapper (e.g., `module_wrapper_class = MyWrapper`);
+     4. in your test class, set the class attributes `expected_time_complexity` and/or
+        `expected_memory_complexity` to the expected exponent (e.g.,
+        `ComplexityTestCase.LINEAR` or `ComplexityTestCase.QUADRATIC`).
+
+    The tests fail if the measured exponent exceeds the expected one by more than
+    `complexity_tolerance`. Wall time is measured as the fastest of `complexity_timed_runs`
+    forwards, while memory is the peak memory allocated by the forward as measured by
+    :py:class:`pangolinn.seq2seq.memory.PeakMemoryTracker`.
+    """
+    LINEAR = 1.0
+    QUADRATIC = 2.0
+
+    expected_time_complexity: Optional[float] = None
+    expected_memory_complexity: Optional[float] = None
+    complexity_tolerance: float = 0.3
+    complexity_sequence_lengths: Sequence[int] = (64, 128, 256, 512, 1024)
+    complexity_timed_runs: int = 5
+
+    def setUp(self) -> None:
+        self._wrapper_setup(ComplexityTestCase)
+
+    def _assert_scaling(self, name: str, measures: List[float], expected_exponent: float):
+        exponent = scaling_exponent(self.complexity_sequence_lengths, measures)
+        LOGGER.info(
+            f"{self.id()}: {name} scales with exponent {exponent:.2f} over lengths "
+            f"{list(self.complexity_sequence_lengths)} (measures: {measures})")
+        self.assertLessEqual(
+            exponent,
+            expected_exponent + self.complexity_tolerance,
+            msg=f"The {name} of the module scales with exponent {exponent:.2f} with respect to "
+                f"the sequence length, while {expected_exponent} is expected. Measures over "
+                f"lengths {list(self.complexity_sequence_lengths)}: {measures}")
+
+    def test_time_complexity(self):
+        """
+        Tests that the wall time of the forward does not scale worse than expected.
+        """
+        if self.expected_time_complexity is None:
+            self.skipTest("expected_time_complexity is not set")
+        latencies = []
+        for seq_len in self.complexity_sequence_lengths:
+            x = self._rand_tensor(
+                (1, seq_len, self.module_wrapper.num_input_channels),
+                self.module_wrapper.input_dtype)
+            latencies.append(min(time_forward(
+                self.module_wrapper,
+                x,
+                LongTensor([seq_len]),
+                warmup_runs=1,
+                timed_runs=self.complexity_timed_runs)))
+        self._assert_scaling("wall time", latencies, self.expected_time_complexity)
+
+    def test_memory_complexity(self):
+        """
+        Tests that the peak memory allocated by the forward does not scale worse than expected.
+        """
+        if self.expected_memory_complexity is None:
+            self.skipTest("expected_memory_complexity is not set")
+        peak_memory = []
+        for seq_len in self.complexity_sequence_lengths:
+            x = self._rand_tensor(
+                (1, seq_len, self.module_wrapper.num_input_channels),
+                self.module_wrapper.input_dtype)
+            with torch.no_grad(), PeakMemoryTracker() as memory_tracker:
+                self.module_wrapper.forward(x, LongTensor([seq_len]))
+            peak_memory.append(float(memory_tracker.peak_bytes))
+        self._assert_scaling("peak memory", peak_memory, self.expected_memory_complexity)
@@ -0,0 +1,135 @@
+# Copyright 2023 FBK
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License
+"""
+Localization of the submodule that causes a test failure. The activations of all the
+submodules are recorded through forward hooks (see
+:py:func:`pangolinn.seq2seq.hooks.submodule_hooks`) during a forward over a batch and during
+a forward over a part of it (e.g., some of its items without padding, or a prefix of its
+sequences), and the first submodule (in execution order) whose output differs between the
+two forwards is reported.
+"""
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Any, Iterator, List, Optional, Tuple
+
+from torch import LongTensor, Tensor, nn
+
+from pangolinn.seq2seq.hooks import submodule_hooks
+from pangolinn.seq2seq.utils import isclose
+
+
+def _first_tensor(output: Any) -> Optional[Tensor]:
+    if isinstance(output, Tensor):
+        return output
+    if isinstance(output, (tuple, list)):
+        for item in output:
+            tensor = _first_tensor(item)
+            if tensor is not None:
+                return tensor
+    return None
+
+
+class ActivationRecorder:
+    """
+    Records the output of each submodule of a module (the first tensor, if the output is a
+    tuple or a list, as e.g. for LSTMs) in the order in which their forwards end.
+    """
+    def __init__(self):
+        self.activations: List[Tuple[str, Tensor]] = []
+
+    def _forward_hook(self, name: str, module: nn.Module, inputs: Any, outputs: Any):
+        tensor = _first_tensor(outputs)
+        if tensor is not None:
+            self.activations.append((name, tensor.detach().clone()))
+
+    @contextmanager
+    def record(self, module: nn.Module) -> Iterator["ActivationRecorder"]:
+        """
+        Within this context, the activations of the module and of its submodules are recorded.
+        """
+        with submodule_hooks(module, forward_hook=self._forward_hook):
+            yield self
+
+
+@dataclass
+class Divergence:
+    """
+    The first submodule whose output differs between two forwards, with the positions
+    (as indexes of its output over the whole batch) where the outputs differ.
+    """
+    submodule: str
+    positions: List[Tuple[int, ...]]
+
+    def __str__(self) -> str:
+        max_positions = 10
+        positions = ", ".join(str(position) for position in self.positions[:max_positions])
+        if len(self.positions) > max_positions:
+            positions += f", ... ({len(self.positions)} positions in total)"
+        return f"The first submodule whose output diverges is '{self.submodule}', " \
+               f"at positions {positions}"
+
+
+def _valid_region(full: Tensor, partial: Tensor, items_idx: LongTensor) -> Optional[Tensor]:
+    """
+    :return: the region of the activation over the whole batch that corresponds to the
+             activation over a part of it, i.e. the selected items and the leading elements
+             of each dimension, or `None` if the two activations cannot be matched
+    """
+    if full.dim() != partial.dim() or full.dim() == 0 or full.shape[0] <= items_idx.max():
+        return None
+    region = full[items_idx]
+    for dim in range(1, full.dim()):
+        if region.shape[dim] < partial.shape[dim]:
+            return None
+        region = region.narrow(dim, 0, partial.shape[dim])
+    return region
+
+
+def first_divergence(
+        full_activations: ActivationRecorder,
+        partial_activations: ActivationRecorder,
+        items_idx: LongTensor,
+        rtol: Optional[float] = None,
+        atol: Optional[float] = None) -> Optional[Divergence]:
+    """
+    Compares the activations recorded during a forward over a batch with the ones recorded
+    during a forward over a part of it, which contains the items `items_idx` of the batch,
+    possibly restricted to a prefix of the sequences (e.g., without padding).
+
+    :param full_activations: the activations recorded during the forward over the batch
+    :param partial_activations: the activations recorded during the forward over the part
+                                of the batch
+    :param items_idx: the indexes of the items of the batch contained in the part
+    :param rtol: the relative tolerance (defaults to the one of
+                 `torch.testing.assert_close` for the dtype of the activations)
+    :param atol: the absolute tolerance (defaults to the one of
+                 `torch.testing.assert_close` for the dtype of the activations)
+    :return: the first submodule whose activations differ, or `None` if none differs or
+             the activations cannot be matched (e.g., if the submodules are executed in a
+             different order)
+    """
+    for (full_name, full), (partial_name, partial) in zip(
+            full_activations.activations, partial_activations.activations):
+        if full_name != partial_name:
+            return None
+        region = _valid_region(full, partial, items_idx)
+        if region is None:
+            continue
+        mismatches = ~isclose(partial, region, rtol, atol)
+        if mismatches.any():
+            positions = mismatches.nonzero()
+            # maps the indexes of the items back to the ones in the whole batch
+            positions[:, 0] = items_idx[positions[:, 0]]
+            return Divergence(full_name, [tuple(position) for position in positions.tolist()])
+    return None
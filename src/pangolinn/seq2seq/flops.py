@@ -0,0 +1,111 @@
+# Copyright 2023 FBK
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License
+"""
+Accounting of the floating point operations (FLOPs) that a module wrapped by a
+:py:class:`pangolinn.seq2seq.PangolinnSeq2SeqModuleWrapper` spends on padding, i.e. on
+positions whose results are then discarded. FLOPs are counted with
+:py:class:`torch.utils.flop_counter.FlopCounterMode`, which considers only the operations
+it supports (e.g., matrix multiplications and convolutions).
+"""
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Dict
+
+import torch
+from torch import LongTensor, Tensor
+from torch.utils.flop_counter import FlopCounterMode
+
+from pangolinn.seq2seq.seq2seq_module_wrapper import PangolinnSeq2SeqModuleWrapper
+from pangolinn.seq2seq.utils import rand_padded_batch
+
+
+@dataclass
+class PaddingFlopReport:
+    """
+    FLOPs per submodule (as named by :py:class:`torch.utils.flop_counter.FlopCounterMode`,
+    where `Global` is the total) spent when processing a padded batch and when processing its
+    items without padding.
+    """
+    padded_flops: Dict[str, int]
+    unpadded_flops: Dict[str, int]
+
+    @property
+    def wasted_flops(self) -> Dict[str, int]:
+        return {
+            name: flops - self.unpadded_flops.get(name, 0)
+            for name, flops in self.padded_flops.items()}
+
+    @property
+    def wasted_ratio(self) -> Dict[str, float]:
+        """
+        Fraction of the FLOPs of each submodule spent on padding.
+        """
+        return {
+            name: wasted / self.padded_flops[name] if self.padded_flops[name] > 0 else 0.0
+            for name, wasted in self.wasted_flops.items()}
+
+    @property
+    def total_wasted_ratio(self) -> float:
+        return self.wasted_ratio.get("Global", 0.0)
+
+
+def _count_flops(
+        module_wrapper: PangolinnSeq2SeqModuleWrapper,
+        x: Tensor,
+        lengths: LongTensor) -> Dict[str, int]:
+    flop_counter = FlopCounterMode(display=False)
+    with torch.no_grad(), flop_counter:
+        module_wrapper.forward(x, lengths)
+    return {
+        name: sum(op_flops.values())
+        for name, op_flops in flop_counter.get_flop_counts().items()}
+
+
+def padding_flop_report(
+        module_wrapper: PangolinnSeq2SeqModuleWrapper,
+        lengths: LongTensor) -> PaddingFlopReport:
+    """
+    Counts the FLOPs spent by the wrapped module on a random padded batch with the given
+    lengths and on the same items without padding. Items with the same length are processed
+    together, as no padding is needed to batch them.
+
+    :param module_wrapper: the wrapper of the module to analyze
+    :param lengths: tensor of shape (batch, ) with the length of each sequence in the batch
+    :return: the FLOPs per submodule with and without padding
+    """
+    x = rand_padded_batch(module_wrapper, lengths)
+    padded_flops = _count_flops(module_wrapper, x, lengths)
+    unpadded_flops: Dict[str, int] = defaultdict(int)
+    for item_len in lengths.unique().tolist():
+        items_idx = (lengths == item_len).nonzero().squeeze(1)
+        items_flops = _count_flops(
+            module_wrapper, x[items_idx, :item_len, :], LongTensor([item_len] * len(items_idx)))
+        for name, flops in items_flops.items():
+            unpadded_flops[name] += flops
+    return PaddingFlopReport(padded_flops=padded_flops, unpadded_flops=dict(unpadded_flops))
+
+
+def format_report(report: PaddingFlopReport) -> str:
+    """
+    :param report: the report returned by :py:func:`padding_flop_report`
+    :return: a table with the padded, unpadded and wasted FLOPs of each submodule,
+             sorted by the amount of wasted FLOPs
+    """
+    lines = [f"{'submodule':<40} {'padded':>14} {'unpadded':>14} {'wasted':>14} {'ratio':>7}"]
+    wasted_ratio = report.wasted_ratio
+    for name, wasted in sorted(report.wasted_flops.items(), key=lambda kv: -kv[1]):
+        lines.append(
+            f"{name:<40} {report.padded_flops[name]:>14} "
+            f"{report.unpadded_flops.get(name, 0):>14} {wasted:>14} {wasted_ratio[name]:>7.2%}")
+    return "\n".join(lines)
@@ -0,0 +1,199 @@
+# Copyright 2023 FBK
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Tuple
+
+import torch
+from torch import LongTensor, Tensor, nn
+from torch.func import functional_call, grad, vmap
+
+from pangolinn.seq2seq.base_tester import BaseTester
+from pangolinn.seq2seq.seq2seq_module_wrapper import PangolinnSeq2SeqModuleWrapper
+
+
+class _ModuleWrapperAdapter(nn.Module):
+    """
+    Exposes the forward of a wrapper as the forward of a module, so that it can be called
+    with the parameters given to :py:func:`torch.func.functional_call`.
+    """
+    def __init__(self, module_wrapper: PangolinnSeq2SeqModuleWrapper):
+        super().__init__()
+        self.module_wrapper = module_wrapper
+        self.module = module_wrapper._module
+
+    def forward(self, x: Tensor, lengths: LongTensor) -> Tensor:
+        return self.module_wrapper.forward(x, lengths)
+
+
+class PaddingGradientTestCase(BaseTester):
+    """
+    This class provides unit tests to enforce that padding does not leak through the backward
+    pass of the module to be tested (e.g., through unmasked attention or normalizations),
+    which would corrupt the training even if the forward pass is not affected.
+
+    To use it to test your network:
+
+     1. create a `PangolinnSeq2SeqModuleWrapper` that wraps your module (e.g. `MyWrapper`);
+     2. create test class that extends `PaddingGradientTestCase`;
+     3. in your test class, override the class attribute `module_wrapper_class` by setting it to
+        the **class** of your wrapper (e.g., `module_wrapper_class = MyWrapper`);
+
+    The gradients are computed with a single backward pass over a padded batch containing two
+    sequences for each of the lengths generated by
+    :py:func:`pangolinn.seq2seq.length_sweep.sweep_lengths` up to `sweep_max_length`, using
+    as loss a random projection of the valid region of the output. The backward pass is
+    executed with the batch normalization layers in training mode, so that statistics computed
+    also over the padding are detected, while the rest of the module (e.g., dropout) stays in
+    evaluation mode. On this backward pass, the test checks that the padded input positions
+    receive no gradient (for floating point inputs) and that the gradients of the parameters
+    are the sum of the ones of each item without padding. The gradients of each item are
+    computed with :py:func:`torch.func.vmap` over the items with the same length, so the
+    forward of the wrapper has to support `vmap` (e.g., it cannot use data-dependent control
+    flow on the input values). As batch normalization legitimately pools its statistics over
+    the items of the batch, the gradients of the parameters are not compared for modules
+    containing batch normalization layers. When the test fails, the lengths of the batch are
+    shrunk to a minimal failing configuration, which is reported in the error message.
+    """
+    sweep_max_length: int = 27
+
+    def setUp(self) -> None:
+        self._wrapper_setup(PaddingGradientTestCase)
+
+    def _batch_lengths(self) -> List[int]:
+        return sorted(self._sweep_lengths(self.sweep_max_length) * 2)
+
+    @contextmanager
+    def _batch_norm_train_mode(self) -> Iterator[List[nn.Module]]:
+        """
+        Within this context, the batch normalization layers of the module are in training
+        mode, so that they normalize with the statistics of the batch.
+
+        :return: the batch normalization layers of the module
+        """
+        batch_norms = [
+            module for module in self.module_wrapper._module.modules()
+            if isinstance(module, nn.modules.batchnorm._BatchNorm)]
+        training = [batch_norm.training for batch_norm in batch_norms]
+        for batch_norm in batch_norms:
+            batch_norm.train()
+        try:
+            yield batch_norms
+        finally:
+            for batch_norm, was_training in zip(batch_norms, training):
+                batch_norm.train(was_training)
+
+    def _padded_batch_gradients(
+            self, lengths: List[int]) -> Tuple[Tensor, Tensor, Dict[str, Tensor], Tensor]:
+        """
+        :return: the padded batch, the weights of the random projection used as loss, and the
+                 gradients of the loss with respect to the parameters and to the padded batch
+                 (`None` for integer inputs)
+        """
+        batch_lens = LongTensor(lengths)
+        x = self._rand_padded_batch(batch_lens)
+        differentiable = x.dtype.is_floating_point
+        if differentiable:
+            x.requires_grad_()
+        output = self.module_wrapper.forward(x, batch_lens)
+        out_lens = LongTensor([
+            self.module_wrapper.output_sequence_length(item_len) for item_len in lengths])
+        padding_mask = torch.arange(output.shape[1]).unsqueeze(0) >= out_lens.unsqueeze(1)
+        loss_weights = torch.rand(output.shape, dtype=output.dtype).masked_fill(
+            padding_mask.unsqueeze(-1), 0.0)
+        params = {
+            name: param for name, param in self.module_wrapper._module.named_parameters()
+            if param.requires_grad}
+        inputs = list(params.values()) + ([x] if differentiable else [])
+        grads = torch.autograd.grad(
+            (output * loss_weights).sum(), inputs, allow_unused=True)
+        param_grads = {
+            name: torch.zeros_like(param) if param_grad is None else param_grad
+            for (name, param), param_grad in zip(params.items(), grads)}
+        input_grad = grads[-1] if differentiable else None
+        return x.detach(), loss_weights, param_grads, input_grad
+
+    def _per_item_param_gradients(
+            self, x: Tensor, loss_weights: Tensor, lengths: List[int]) -> Dict[str, Tensor]:
+        """
+        :return: the sum of the gradients with respect to the parameters of the loss of each
+                 item of the batch processed without padding
+        """
+        adapter = _ModuleWrapperAdapter(self.module_wrapper)
+        params = {
+            name: param.detach() for name, param in adapter.named_parameters()
+            if param.requires_grad}
+
+        def item_loss(
+                item_params: Dict[str, Tensor],
+                item_x: Tensor,
+                item_loss_weights: Tensor,
+                item_lengths: LongTensor) -> Tensor:
+            output = functional_call(
+                adapter, item_params, (item_x.unsqueeze(0), item_lengths))
+            return (output * item_loss_weights.unsqueeze(0)).sum()
+
+        per_item_grads = vmap(grad(item_loss), in_dims=(None, 0, 0, None))
+        summed_grads = {name: torch.zeros_like(param) for name, param in params.items()}
+        batch_lens = LongTensor(lengths)
+        for item_len in batch_lens.unique().tolist():
+            items_idx = (batch_lens == item_len).nonzero().squeeze(1)
+            item_out_len = self.module_wrapper.output_sequence_length(item_len)
+            grads = per_item_grads(
+                params,
+                x[items_idx, :item_len, :],
+                loss_weights[items_idx, :item_out_len, :],
+                LongTensor([item_len]))
+            for name, item_grads in grads.items():
+                summed_grads[name] += item_grads.sum(dim=0)
+        # removes the prefix of the adapter from the names of the parameters
+        return {
+            name[len("module."):]: summed_grad for name, summed_grad in summed_grads.items()}
+
+    def _check_padding_does_not_leak_through_backward(self, lengths: List[int]):
+        with self._batch_norm_train_mode() as batch_norms:
+            if len(batch_norms) > 0 and len(lengths) * max(lengths) == 1:
+                # the statistics of batch normalization cannot be computed over a single value
+                # (this configuration can be reached when shrinking a failing batch)
+                return
+            x, loss_weights, param_grads, input_grad = self._padded_batch_gradients(lengths)
+        if input_grad is not None:
+            for i, item_len in enumerate(lengths):
+                padding_grad = input_grad[i, item_len:, :]
+                self.assertTrue(
+                    torch.all(padding_grad == 0),
+                    f"non-zero gradient in the padding area of the sequence with length "
+                    f"{item_len} in a batch with lengths {lengths}: {padding_grad}")
+        if len(batch_norms) > 0:
+            return
+        expected_grads = self._per_item_param_gradients(x, loss_weights, lengths)
+        mismatches = []
+        for name, param_grad in param_grads.items():
+            try:
+                self._assert_close(param_grad, expected_grads[name])
+            except AssertionError:
+                mismatches.append(name)
+        self.assertEqual(
+            0,
+            len(mismatches),
+            msg=f"The gradients of the parameters {mismatches} over the batch with lengths "
+                f"{lengths} differ from the sum of the gradients of its items without padding.")
+
+    def test_padding_does_not_leak_through_backward(self):
+        """
+        Tests, with a single backward pass over a padded batch, that the padded positions of
+        the input receive no gradient (for floating point inputs) and that the gradients of the
+        parameters are the sum of the gradients computed over each item without padding.
+        """
+        self._assert_with_shrinking(
+            self._check_padding_does_not_leak_through_backward, self._batch_lengths())
@@ -0,0 +1,51 @@
+# Copyright 2023 FBK
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License
+from contextlib import contextmanager
+from typing import Any, Callable, Iterator, Optional
+
+from torch import nn
+
+
+@contextmanager
+def submodule_hooks(
+        module: nn.Module,
+        forward_hook: Optional[Callable[[str, nn.Module, Any, Any], None]] = None,
+        forward_pre_hook: Optional[Callable[[str, nn.Module, Any], None]] = None
+) -> Iterator[None]:
+    """
+    Registers the given hooks on the module and all its submodules for the duration of the
+    context. Differently from the hooks registered with PyTorch APIs, the hooks receive as
+    first argument the name of the submodule (as returned by `named_modules`, with the
+    name of the class for the root module).
+
+    :param module: the module whose submodules are hooked
+    :param forward_hook: called after the forward of each submodule with the name of the
+                         submodule, the submodule, its input, and its output
+    :param forward_pre_hook: called before the forward of each submodule with the name of the
+                             submodule, the submodule, and its input
+    """
+    handles = []
+    try:
+        for name, submodule in module.named_modules():
+            name = name or module.__class__.__name__
+            if forward_pre_hook is not None:
+                handles.append(submodule.register_forward_pre_hook(
+                    lambda mod, inp, name=name: forward_pre_hook(name, mod, inp)))
+            if forward_hook is not None:
+                handles.append(submodule.register_forward_hook(
+                    lambda mod, inp, out, name=name: forward_hook(name, mod, inp, out)))
+        yield
+    finally:
+        for handle in handles:
+            handle.remove()
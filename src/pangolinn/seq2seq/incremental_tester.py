@@ -0,0 +1,123 @@
+# Copyright 2023 FBK
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License
+import logging
+import statistics
+import time
+from typing import List, Optional, Tuple
+
+import torch
+from torch import Tensor
+
+from pangolinn.seq2seq.base_tester import BaseTester
+
+
+LOGGER = logging.getLogger(__name__)
+
+
+class IncrementalDecodingTestCase(BaseTester):
+    """
+    This class provides unit tests to enforce that the module to be tested returns the same
+    results when it is fed with the whole sequence at once and when it processes the sequence
+    one time step at a time using an incremental state (e.g., the key/value cache of
+    Transformer decoders), as done at inference time.
+
+    To use it to test your network:
+
+     1. create a `PangolinnSeq2SeqModuleWrapper` that wraps your module (e.g. `MyWrapper`) and
+        implements the `forward_step` method;
+     2. create test class that extends `IncrementalDecodingTestCase`;
+     3. in your test class, override the class attribute `module_wrapper_class` by setting it to
+        the **class** of your wrapper (e.g., `module_wrapper_class = MyWrapper`);
+
+    The latency of each step is recorded and logged. If the class attribute
+    `max_step_latency_growth` is set, `test_step_latency_does_not_grow` checks that the median
+    latency of the last steps is at most `max_step_latency_growth` times the median latency of
+    the first ones, i.e. that the cost of a step does not grow with the length of the prefix.
+    """
+    incremental_sequence_length: int = 20
+    max_step_latency_growth: Optional[float] = None
+
+    def setUp(self) -> None:
+        self._wrapper_setup(IncrementalDecodingTestCase)
+        self.assertEqual(
+            1,
+            self.module_wrapper.sequence_downsampling_factor,
+            msg="Incremental decoding can be tested only for modules that do not downsample "
+                "the input sequence.")
+
+    def _decode_incrementally(self, x: Tensor) -> Tuple[Tensor, List[float]]:
+        """
+        :param x: the input tensor with shape (batch, seq_len, channels)
+        :return: the concatenation of the outputs of each step, and the latency
+                 (in seconds) of each step
+        """
+        state = None
+        step_outputs = []
+        step_latencies = []
+        with torch.no_grad():
+            for t in range(x.shape[1]):
+                start_time = time.perf_counter()
+                step_output, state = self.module_wrapper.forward_step(x[:, t:t + 1, :], state)
+                step_latencies.append(time.perf_counter() - start_time)
+                self.assertListEqual(
+                    [x.shape[0], 1, self.module_wrapper.num_output_channels],
+                    list(step_output.size()),
+                    msg=f"Unexpected output shape {step_output.size()} at step {t}. "
+                        "forward_step should return a tensor of shape (batch, 1, channels).")
+                step_outputs.append(step_output)
+        return torch.cat(step_outputs, dim=1), step_latencies
+
+    def test_incremental_decoding_matches_full_forward(self):
+        """
+        Tests that feeding the time steps one at a time produces the same outputs as the
+        forward over the whole sequence.
+        """
+        test_len = self.incremental_sequence_length
+        x = self._rand_input(5, test_len)
+        expected_shape = [5, test_len, self.module_wrapper.num_output_channels]
+        with torch.no_grad():
+            output = self._forward_with_expected_shape(
+                x, torch.LongTensor([test_len] * 5), expected_shape)
+        incremental_output, step_latencies = self._decode_incrementally(x)
+        LOGGER.info(
+            f"{self.id()}: step latencies (ms) "
+            f"{[round(latency * 1000, 3) for latency in step_latencies]}")
+        self._assert_close(incremental_output, output)
+
+    def test_step_latency_does_not_grow(self):
+        """
+        Tests that the latency of the last steps is not significantly higher than the latency
+        of the first steps.
+        """
+        if self.max_step_latency_growth is None:
+            self.skipTest("max_step_latency_growth is not set")
+        test_len = self.incremental_sequence_length
+        self.assertGreaterEqual(
+            test_len, 8, msg="incremental_sequence_length should be at least 8 to compare "
+                             "the latency of the first and last steps.")
+        x = self._rand_input(1, test_len)
+        _, step_latencies = self._decode_incrementally(x)
+        # the first step is excluded as it is often slower (e.g., for memory allocations)
+        quarter = test_len // 4
+        first_steps_latency = statistics.median(step_latencies[1:quarter + 1])
+        last_steps_latency = statistics.median(step_latencies[-quarter:])
+        LOGGER.info(
+            f"{self.id()}: median step latency {first_steps_latency * 1000:.3f}ms on the "
+            f"first steps, {last_steps_latency * 1000:.3f}ms on the last steps")
+        self.assertLessEqual(
+            last_steps_latency,
+            first_steps_latency * self.max_step_latency_growth,
+            msg=f"Step latency grows with the prefix length: median latency "
+                f"{last_steps_latency * 1000:.3f}ms on the last steps and "
+                f"{first_steps_latency * 1000:.3f}ms on the first steps.")
@@ -0,0 +1,113 @@
+# Copyright 2023 FBK
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License
+"""
+Inference of the function that maps the length of the input sequence of a module to the
+length of its output sequence. Any stack of (possibly strided) convolutions and poolings
+maps an input length `L` to `(L + offset) // stride + bias` for some integers `stride`,
+`offset` and `bias`, which are found by probing the module with a range of lengths.
+"""
+import logging
+from dataclasses import dataclass
+from typing import Dict, Iterable, Optional, Type
+
+import torch
+from torch import LongTensor
+
+from pangolinn.seq2seq.seq2seq_module_wrapper import PangolinnSeq2SeqModuleWrapper
+from pangolinn.seq2seq.utils import rand_tensor
+
+
+LOGGER = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class LengthMapping:
+    """
+    Maps an input length `L` to the output length `(L + offset) // stride + bias`.
+    """
+    stride: int
+    offset: int
+    bias: int
+
+    def __call__(self, input_sequence_len: int) -> int:
+        return (input_sequence_len + self.offset) // self.stride + self.bias
+
+
+def probe_output_lengths(
+        module_wrapper: PangolinnSeq2SeqModuleWrapper,
+        lengths: Iterable[int]) -> Dict[int, int]:
+    """
+    :param module_wrapper: the wrapper of the module to probe
+    :param lengths: the input lengths to probe
+    :return: the output length returned by the module for each input length. Input lengths
+             for which the forward fails (e.g., because they are shorter than the kernel of
+             a convolution) are not included.
+    """
+    output_lengths = {}
+    with torch.no_grad():
+        for length in lengths:
+            x = rand_tensor(
+                (1, length, module_wrapper.num_input_channels),
+                module_wrapper.input_dtype,
+                module_wrapper.max_value_allowed)
+            try:
+                output = module_wrapper.forward(x, LongTensor([length]))
+            except RuntimeError as e:
+                LOGGER.info(f"Probing length {length} failed: {e}")
+                continue
+            output_lengths[length] = output.shape[1]
+    return output_lengths
+
+
+def fit_length_mapping(
+        output_lengths: Dict[int, int], max_stride: int = 64) -> Optional[LengthMapping]:
+    """
+    :param output_lengths: the output length observed for each input length
+    :param max_stride: the maximum stride considered
+    :return: the mapping with the smallest stride that is consistent with all the observed
+             lengths, or `None` if there is no such mapping
+    """
+    for stride in range(1, max_stride + 1):
+        for offset in range(stride):
+            first_len = min(output_lengths)
+            bias = output_lengths[first_len] - (first_len + offset) // stride
+            mapping = LengthMapping(stride, offset, bias)
+            if all(mapping(in_len) == out_len for in_len, out_len in output_lengths.items()):
+                return mapping
+    return None
+
+
+_LENGTH_MAPPINGS_CACHE: Dict[Type, Optional[LengthMapping]] = {}
+
+
+def probe_length_mapping(
+        module_wrapper: PangolinnSeq2SeqModuleWrapper,
+        lengths: Iterable[int] = range(1, 65)) -> Optional[LengthMapping]:
+    """
+    Probes the wrapped module and fits its length mapping. The result is cached per wrapper
+    class, so that the module is probed only once.
+
+    :param module_wrapper: the wrapper of the module to probe
+    :param lengths: the input lengths to probe, which should span at least two times the
+                    expected downsampling factor
+    :return: the length mapping of the module, or `None` if none is consistent with the
+             observed output lengths
+    """
+    wrapper_class = module_wrapper.__class__
+    if wrapper_class not in _LENGTH_MAPPINGS_CACHE:
+        output_lengths = probe_output_lengths(module_wrapper, lengths)
+        mapping = fit_length_mapping(output_lengths) if output_lengths else None
+        LOGGER.info(f"Length mapping of {wrapper_class.__name__}: {mapping}")
+        _LENGTH_MAPPINGS_CACHE[wrapper_class] = mapping
+    return _LENGTH_MAPPINGS_CACHE[wrapper_class]
@@ -0,0 +1,103 @@
+# Copyright 2023 FBK
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License
+import math
+import random
+from typing import Callable, List
+
+
+def sweep_lengths(
+        downsampling_factor: int,
+        max_length: int,
+        num_random_lengths: int = 0,
+        seed: int = 0,
+        num_multiples: int = 2) -> List[int]:
+    """
+    Generates the sequence lengths to be tested, focusing on the boundary cases of modules
+    that downsample the input sequence. Only a few multiples of the downsampling factor are
+    used, so that the number of lengths (and of forwards of the tests) does not grow with
+    `max_length`.
+
+    :param downsampling_factor: the downsampling factor of the module
+    :param max_length: the maximum length to generate (always included in the result)
+    :param num_random_lengths: number of additional lengths randomly drawn in [1, max_length]
+                               among the ones that are not boundary lengths
+    :param seed: the seed used to draw the random lengths
+    :param num_multiples: number of multiples of the downsampling factor, evenly spaced
+                          between the smallest and the largest one, whose neighbours are
+                          used as boundary lengths
+    :return: the sorted list of unique lengths, containing length 1, `max_length`, the selected
+             multiples of the downsampling factor and the lengths immediately before and after
+             them, together with the random lengths
+    """
+    lengths = {1, max_length}
+    multiples = list(range(downsampling_factor, max_length + 1, downsampling_factor))
+    if multiples and num_multiples > 0:
+        step = (len(multiples) - 1) / max(1, num_multiples - 1)
+        for i in range(min(num_multiples, len(multiples))):
+            multiple = multiples[round(i * step)]
+            lengths.update({multiple - 1, multiple, multiple + 1})
+    lengths = {length for length in lengths if 1 <= length <= max_length}
+    rng = random.Random(seed)
+    candidates = sorted(set(range(1, max_length + 1)) - lengths)
+    lengths.update(rng.sample(candidates, min(num_random_lengths, len(candidates))))
+    return sorted(lengths)
+
+
+def log_spaced_lengths(min_length: int, max_length: int, num_lengths: int) -> List[int]:
+    """
+    Generates lengths spaced logarithmically, so that long sequences can be checked at a few
+    positions, which are denser at the beginning of the sequence.
+
+    :param min_length: the minimum length to generate (always included in the result)
+    :param max_length: the maximum length to generate (always included in the result)
+    :param num_lengths: the number of lengths to generate
+    :return: the sorted list of unique lengths, which can be less than `num_lengths` if
+             `max_length - min_length + 1` is lower than `num_lengths`
+    """
+    if num_lengths < 2 or min_length == max_length:
+        return [max_length]
+    log_step = (math.log(max_length) - math.log(min_length)) / (num_lengths - 1)
+    lengths = {
+        round(math.exp(math.log(min_length) + i * log_step)) for i in range(num_lengths)}
+    lengths.update({min_length, max_length})
+    return sorted(length for length in lengths if min_length <= length <= max_length)
+
+
+def shrink_lengths(lengths: List[int], fails: Callable[[List[int]], bool]) -> List[int]:
+    """
+    Greedily shrinks a failing configuration of lengths to a minimal one, by removing
+    sequences and reducing their lengths as long as the configuration keeps failing.
+
+    :param lengths: the lengths of a failing configuration
+    :param fails: returns whether a configuration of lengths fails
+    :return: a failing configuration that cannot be shrunk further
+    """
+    lengths = list(lengths)
+    shrunk = True
+    while shrunk:
+        shrunk = False
+        for i in range(len(lengths)):
+            if len(lengths) > 1 and fails(lengths[:i] + lengths[i + 1:]):
+                lengths = lengths[:i] + lengths[i + 1:]
+                shrunk = True
+                break
+            for candidate in sorted({1, lengths[i] // 2, lengths[i] - 1}):
+                if 1 <= candidate < lengths[i] and \
+                        fails(lengths[:i] + [candidate] + lengths[i + 1:]):
+                    lengths[i] = candidate
+                    shrunk = True
+                    break
+            if shrunk:
+                break
+    return lengths
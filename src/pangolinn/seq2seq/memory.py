@@ -0,0 +1,82 @@
+# Copyright 2023 FBK
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License
+import weakref
+from typing import Dict, Set, Tuple
+
+import torch
+from torch.utils._python_dispatch import TorchDispatchMode
+from torch.utils._pytree import tree_flatten
+
+
+class PeakMemoryTracker(TorchDispatchMode):
+    """
+    Tracks the memory allocated for the tensors produced by the operations executed within
+    its context, and records the peak of the memory that is alive at the same time. It works
+    on any device, as it does not rely on the statistics of the allocator: the memory of a
+    storage is counted from the creation of the first tensor that uses it until all the
+    tracked tensors that use it are garbage collected. Tensors created outside the context
+    (e.g., the input and the parameters of the module) are not counted.
+
+    Example::
+
+        with PeakMemoryTracker() as memory_tracker:
+            module_wrapper.forward(x, lengths)
+        print(memory_tracker.peak_bytes)
+    """
+    def __init__(self):
+        super().__init__()
+        self.current_bytes = 0
+        self.peak_bytes = 0
+        # data pointer of the storage -> (storage size in bytes, number of tensors using it)
+        self._storages: Dict[int, Tuple[int, int]] = {}
+        self._tracked_tensors: Set[int] = set()
+
+    def _track(self, tensor: torch.Tensor):
+        if id(tensor) in self._tracked_tensors:
+            # in-place operations return their input
+            return
+        storage = tensor.untyped_storage()
+        key = storage.data_ptr()
+        if key in self._storages:
+            nbytes, num_tensors = self._storages[key]
+            self._storages[key] = (nbytes, num_tensors + 1)
+        else:
+            self._storages[key] = (storage.nbytes(), 1)
+            self.current_bytes += storage.nbytes()
+            self.peak_bytes = max(self.peak_bytes, self.current_bytes)
+        self._tracked_tensors.add(id(tensor))
+        weakref.finalize(tensor, self._release, id(tensor), key)
+
+    def _release(self, tensor_id: int, key: int):
+        self._tracked_tensors.discard(tensor_id)
+        nbytes, num_tensors = self._storages[key]
+        if num_tensors == 1:
+            del self._storages[key]
+            self.current_bytes -= nbytes
+        else:
+            self._storages[key] = (nbytes, num_tensors - 1)
+
+    def __torch_dispatch__(self, func, types, args=(), kwargs=None):
+        out = func(*args, **(kwargs or {}))
+        # views and in-place operations over tensors created outside the context
+        # do not allocate new memory
+        external_storages = {
+            tensor.untyped_storage().data_ptr()
+            for tensor in tree_flatten((args, kwargs))[0]
+            if isinstance(tensor, torch.Tensor)} - self._storages.keys()
+        for tensor in tree_flatten(out)[0]:
+            if isinstance(tensor, torch.Tensor) and \
+                    tensor.untyped_storage().data_ptr() not in external_storages:
+                self._track(tensor)
+        return out
@@ -0,0 +1,111 @@
+# Copyright 2023 FBK
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License
+import logging
+from collections import defaultdict
+from typing import Dict, Sequence, Tuple
+
+import torch
+from torch import LongTensor, Tensor
+from torch.utils._pytree import tree_flatten
+
+from pangolinn.seq2seq.base_tester import BaseTester
+from pangolinn.seq2seq.hooks import submodule_hooks
+from pangolinn.seq2seq.memory import PeakMemoryTracker
+
+
+LOGGER = logging.getLogger(__name__)
+
+
+class MemoryTestCase(BaseTester):
+    """
+    This class provides unit tests to enforce that the peak memory required by the module to be
+    tested on a batch containing a few long sequences and many short ones
+    (`memory_batch_lengths`) is in line with the memory predicted from the lengths of the
+    sequences, where the prediction is obtained by summing the peak memory required by each
+    sequence when processed alone, without padding.
+
+    To use it to test your network:
+
+     1. create a `PangolinnSeq2SeqModuleWrapper` that wraps your module (e.g. `MyWrapper`);
+     2. create test class that extends `MemoryTestCase`;
+     3. in your test class, override the class attribute `module_wrapper_class` by setting it to
+        the **class** of your wrapper (e.g., `module_wrapper_class = MyWrapper`);
+
+    By default, the memory is predicted from the padded lengths, i.e. as if all the sequences
+    had the length of the longest one, which is what happens for modules that process padded
+    tensors. If your module avoids computation over padding (e.g., it packs the sequences),
+    set the class attribute `memory_follows_valid_lengths` to `True` to predict the memory
+    from the actual lengths of the sequences. The test fails if the measured peak memory
+    exceeds the predicted one by more than a factor `memory_tolerance`.
+
+    The activation memory of each submodule and the memory per valid token, useful to size
+    batches according to a token budget, are logged.
+    """
+    memory_batch_lengths: Sequence[int] = (256, 256) + (32, ) * 14
+    memory_follows_valid_lengths: bool = False
+    memory_tolerance: float = 1.2
+
+    def setUp(self) -> None:
+        self._wrapper_setup(MemoryTestCase)
+
+    def _peak_memory(self, x: Tensor, lengths: LongTensor) -> Tuple[int, Dict[str, int]]:
+        """
+        :return: the peak memory allocated by the forward, and the memory of the activations
+                 (outputs) of each submodule
+        """
+        activation_memory: Dict[str, int] = defaultdict(int)
+
+        def record_activation_memory(name, module, inp, out):
+            for tensor in tree_flatten(out)[0]:
+                if isinstance(tensor, Tensor):
+                    activation_memory[name] += tensor.numel() * tensor.element_size()
+
+        with torch.no_grad(), \
+                submodule_hooks(self.module_wrapper._module, record_activation_memory), \
+                PeakMemoryTracker() as memory_tracker:
+            self.module_wrapper.forward(x, lengths)
+        return memory_tracker.peak_bytes, dict(activation_memory)
+
+    def test_peak_memory_follows_lengths(self):
+        """
+        Tests that the peak memory of the forward over the padded batch does not exceed the
+        memory predicted from the lengths of its sequences.
+        """
+        lengths = LongTensor(self.memory_batch_lengths)
+        max_len = int(lengths.max())
+        x = self._rand_padded_batch(lengths)
+        measured_memory, activation_memory = self._peak_memory(x, lengths)
+        item_memory = {}
+        for item_len in lengths.unique().tolist():
+            item_idx = int((lengths == item_len).nonzero()[0])
+            item_memory[item_len], _ = self._peak_memory(
+                x[item_idx:item_idx + 1, :item_len, :], LongTensor([item_len]))
+        valid_lengths_memory = sum(item_memory[item_len] for item_len in lengths.tolist())
+        padded_lengths_memory = len(lengths) * item_memory[max_len]
+        num_valid_tokens = int(lengths.sum())
+        LOGGER.info(
+            f"{self.id()}: peak memory {measured_memory} bytes "
+            f"({measured_memory / num_valid_tokens:.1f} bytes per valid token), predicted "
+            f"{valid_lengths_memory} bytes from valid lengths and {padded_lengths_memory} bytes "
+            f"from padded lengths. Activation memory per submodule: {activation_memory}")
+        if self.memory_follows_valid_lengths:
+            predicted_memory, prediction_name = valid_lengths_memory, "valid"
+        else:
+            predicted_memory, prediction_name = padded_lengths_memory, "padded"
+        self.assertLessEqual(
+            measured_memory,
+            predicted_memory * self.memory_tolerance,
+            msg=f"Peak memory of {measured_memory} bytes exceeds the {predicted_memory} bytes "
+                f"predicted from the {prediction_name} lengths {lengths.tolist()}. "
+                f"Activation memory per submodule: {activation_memory}")
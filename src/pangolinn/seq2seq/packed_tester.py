@@ -0,0 +1,129 @@
+# Copyright 2023 FBK
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License
+import logging
+import statistics
+from typing import List, Optional, Sequence
+
+import torch
+from torch import LongTensor
+
+from pangolinn.seq2seq.base_tester import BaseTester
+from pangolinn.seq2seq.benchmark import lengths_for_padding_ratio
+from pangolinn.seq2seq.utils import pack_sequences, time_forward
+
+
+LOGGER = logging.getLogger(__name__)
+
+
+class PackedSequenceTestCase(BaseTester):
+    """
+    This class provides unit tests to enforce that the padding-free execution of the module to
+    be tested, where the sequences are concatenated along the time dimension instead of being
+    padded (e.g., to use variable-length attention kernels), returns the same results as the
+    forward over the padded batch.
+
+    To use it to test your network:
+
+     1. create a `PangolinnSeq2SeqModuleWrapper` that wraps your module (e.g. `MyWrapper`) and
+        implements the `forward_packed` method;
+     2. create test class that extends `PackedSequenceTestCase`;
+     3. in your test class, override the class attribute `module_wrapper_class` by setting it to
+        the **class** of your wrapper (e.g., `module_wrapper_class = MyWrapper`);
+
+    The outputs are compared over a batch containing sequences with all the lengths generated
+    by :py:func:`pangolinn.seq2seq.length_sweep.sweep_lengths` up to `sweep_max_length`,
+    restricting the padded outputs to the valid region defined by `output_sequence_length`.
+    The speedup of the padding-free execution is logged for each of the
+    `packed_padding_ratios` and, if `min_packed_speedup` is set, it is checked for the
+    highest of them.
+    """
+    sweep_max_length: int = 27
+    packed_batch_size: int = 8
+    packed_sequence_length: int = 128
+    packed_padding_ratios: Sequence[float] = (0.0, 0.25, 0.5, 0.75)
+    min_packed_speedup: Optional[float] = None
+
+    def setUp(self) -> None:
+        self._wrapper_setup(PackedSequenceTestCase)
+
+    def _check_packed_matches_padded(self, lengths: List[int]):
+        batch_lens = LongTensor(lengths)
+        x = self._rand_padded_batch(batch_lens)
+        out_lens = LongTensor([
+            self.module_wrapper.output_sequence_length(item_len) for item_len in lengths])
+        with torch.no_grad():
+            output = self.module_wrapper.forward(x, batch_lens)
+            packed_output = self.module_wrapper.forward_packed(
+                pack_sequences(x, batch_lens), batch_lens)
+        self.assertListEqual(
+            [int(out_lens.sum()), self.module_wrapper.num_output_channels],
+            list(packed_output.shape),
+            msg="forward_packed should return a tensor of shape "
+                "(sum(output_sequence_length(lengths)), channels).")
+        expected_output = pack_sequences(output, out_lens)
+        mismatches = []
+        for item_len, expected, actual in zip(
+                lengths, expected_output.split(out_lens.tolist()),
+                packed_output.split(out_lens.tolist())):
+            try:
+                self._assert_close(actual, expected)
+            except AssertionError:
+                mismatches.append(item_len)
+        self.assertEqual(
+            0,
+            len(mismatches),
+            msg=f"The padding-free output differs from the padded one for the sequences with "
+                f"lengths {mismatches} in a batch with lengths {lengths}.")
+
+    def test_packed_matches_padded(self):
+        """
+        Tests that the output of `forward_packed` matches the valid region of the output of
+        `forward` on the same sequences.
+        """
+        lengths = self._sweep_lengths(self.sweep_max_length)
+        self._assert_with_shrinking(self._check_packed_matches_padded, lengths)
+
+    def test_packed_speedup(self):
+        """
+        Logs the speedup of `forward_packed` over `forward` for each padding ratio in
+        `packed_padding_ratios` and, if `min_packed_speedup` is set, checks that the speedup
+        at the highest padding ratio is at least `min_packed_speedup`.
+        """
+        speedups = {}
+        for padding_ratio in self.packed_padding_ratios:
+            lengths = lengths_for_padding_ratio(
+                self.packed_batch_size, self.packed_sequence_length, padding_ratio)
+            if lengths is None:
+                LOGGER.info(f"{self.id()}: padding ratio {padding_ratio} not achievable")
+                continue
+            x = self._rand_padded_batch(lengths)
+            padded_latency = statistics.median(time_forward(self.module_wrapper, x, lengths))
+            packed_latency = statistics.median(time_forward(
+                self.module_wrapper,
+                pack_sequences(x, lengths),
+                lengths,
+                forward_fn=self.module_wrapper.forward_packed))
+            speedups[padding_ratio] = padded_latency / packed_latency
+            LOGGER.info(
+                f"{self.id()}: padding ratio {padding_ratio:.2f}, padded "
+                f"{padded_latency * 1000:.3f}ms, packed {packed_latency * 1000:.3f}ms, "
+                f"speedup {speedups[padding_ratio]:.2f}x")
+        if self.min_packed_speedup is not None:
+            self.assertGreater(len(speedups), 0, msg="No padding ratio is achievable.")
+            max_padding_ratio = max(speedups)
+            self.assertGreaterEqual(
+                speedups[max_padding_ratio],
+                self.min_packed_speedup,
+                msg=f"The padding-free execution is only {speedups[max_padding_ratio]:.2f}x "
+                    f"faster than the padded one with padding ratio {max_padding_ratio:.2f}.")
@@ -11,10 +11,14 @@
 # WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 # See the License for the specific language governing permissions and
 # limitations under the License
+import math
+from typing import List, Optional, Tuple
+
 import torch
-from torch import LongTensor
+from torch import LongTensor, Tensor
 
 from pangolinn.seq2seq.base_tester import BaseTester
+from pangolinn.seq2seq.length_sweep import log_spaced_lengths
 
 
 class EncoderPaddingTestCase(BaseTester):
@@ -29,10 +33,67 @@ class EncoderPaddingTestCase(BaseTester):
      2. create test class that extends `EncoderPaddingTestCase`;
      3. in your test class, override the class attribute `module_wrapper_class` by setting it to
         the **class** of your wrapper (e.g., `module_wrapper_class = MyWrapper`);
+
+    The tests are executed over two batches containing sequences with all the lengths generated
+    by :py:func:`pangolinn.seq2seq.length_sweep.sweep_lengths` up to `sweep_max_length` and up
+    to the largest multiple of the downsampling factor (and of 4) not exceeding it. When a
+    test fails, the lengths of the batch are shrunk to a minimal failing configuration, which
+    is reported in the error message.
+
+    To check long sequences (e.g., the thousands of frames of speech encoders), where bugs in
+    positional encodings may appear only beyond a certain length, set
+    `stress_sequence_length`: `test_long_sequences` then checks a batch containing
+    `stress_num_lengths` sequences with lengths log-spaced up to `stress_sequence_length`,
+    comparing outputs `stress_chunk_size` time steps at a time and without tracking
+    gradients, so that memory stays bounded.
     """
+    sweep_max_length: int = 27
+    stress_sequence_length: Optional[int] = None
+    stress_num_lengths: int = 3
+    stress_chunk_size: int = 512
+
     def setUp(self) -> None:
         self._wrapper_setup(EncoderPaddingTestCase)
 
+    def _forward_padded_batch(self, lengths: List[int]) -> Tuple[Tensor, LongTensor, Tensor]:
+        batch_lens = LongTensor(lengths)
+        rand_batch = self._rand_padded_batch(batch_lens)
+        expected_shape = [
+            len(lengths),
+            self.module_wrapper.output_sequence_length(max(lengths)),
+            self.module_wrapper.num_output_channels]
+        output = self._forward_with_expected_shape(rand_batch, batch_lens, expected_shape)
+        return rand_batch, batch_lens, output
+
+    def _batches_lengths(self) -> List[List[int]]:
+        """
+        :return: the lengths of the batches used by the tests, which are the same for all of
+                 them so that, if `cache_forward_outputs` is enabled, their forwards are
+                 reused. The longest sequence of the first batch has length `sweep_max_length`
+                 and the one of the second batch has the largest length up to it that is a
+                 multiple of both the downsampling factor and 4, as many systems have a 2x or
+                 4x downsampling factor.
+        """
+        multiple = self._downsampling_factor * 4 // math.gcd(self._downsampling_factor, 4)
+        max_lengths = [self.sweep_max_length]
+        if self.sweep_max_length % multiple != 0 and self.sweep_max_length > multiple:
+            max_lengths.append(self.sweep_max_length // multiple * multiple)
+        batches_lengths = []
+        for max_length in max_lengths:
+            lengths = self._sweep_lengths(max_length)
+            # multiple padded elements of same len
+            batches_lengths.append(lengths + [lengths[len(lengths) // 2]] * 2)
+        return batches_lengths
+
+    def _check_padding_area(self, lengths: List[int]):
+        _, _, output = self._forward_padded_batch(lengths)
+        for i, item_len in enumerate(lengths):
+            padding_area = output[i, self.module_wrapper.output_sequence_length(item_len):, :]
+            self.assertTrue(
+                torch.all(padding_area == 0),
+                f"non-zero entries in the padding area of the sequence with length {item_len} "
+                f"in a batch with lengths {lengths}: {padding_area}")
+
     def test_padding_area_is_zero(self):
         """
         Tests that the padding area of the output contains all zeroes.
@@ -40,51 +101,63 @@ class EncoderPaddingTestCase(BaseTester):
         on its own, elaborations (e.g., convolutions) on top of non-zero-padded tensors
         might cause issues.
         """
-        # test both with multipliers of 4 and not, as many systems
-        # may have a 2x or 4x downsampling factor, so we test both when
-        # seq_len is divisible or not by the downsampling factor
-        for max_batch_seq_len, shorter_seq_len in [(27, 13), (24, 16)]:
-            rand_batch = self._rand_tensor(
-                (2, max_batch_seq_len, self.module_wrapper.num_input_channels),
-                self.module_wrapper.input_dtype)
-            rand_batch[1, shorter_seq_len:, :] = 0
-            batch_lens = torch.LongTensor([max_batch_seq_len, shorter_seq_len])
-            expected_shape = [
-                2,
-                self.module_wrapper.output_sequence_length(max_batch_seq_len),
-                self.module_wrapper.num_output_channels]
-            output = self._forward_with_expected_shape(rand_batch, batch_lens, expected_shape)
-            expected_shorter_seq_len = self.module_wrapper.output_sequence_length(shorter_seq_len)
-            padding_area = output[1, expected_shorter_seq_len:, :]
-            self.assertGreater(padding_area.numel(), 0)
-            self.assertTrue(torch.all(padding_area == 0), f"non-zero entries in {padding_area}")
+        # the lengths include both multiples of the downsampling factor and not, and the
+        # longest sequence of the batches is either divisible or not by the downsampling factor
+        for lengths in self._batches_lengths():
+            max_output_len = self.module_wrapper.output_sequence_length(max(lengths))
+            self.assertTrue(
+                any(self.module_wrapper.output_sequence_length(item_len) < max_output_len
+                    for item_len in lengths),
+                "No sequence has a padding area in the output: increase sweep_max_length.")
+            self._assert_with_shrinking(self._check_padding_area, lengths)
+
+    def _check_batch_size_does_not_matter(self, lengths: List[int]):
+        with self._recording_activations() as batch_activations:
+            rand_batch, batch_lens, output = self._forward_padded_batch(lengths)
+        # items with the same length are processed together in a single forward,
+        # as no padding is needed to batch them
+        for item_len in batch_lens.unique().tolist():
+            items_idx = (batch_lens == item_len).nonzero().squeeze(1)
+            items_valid_tokens = rand_batch[items_idx, :item_len, :]
+            with self._recording_activations() as items_activations:
+                output_wo_padding = self._forward(
+                    items_valid_tokens, LongTensor([item_len] * len(items_idx)))
+            item_out_len = self.module_wrapper.output_sequence_length(item_len)
+            self._assert_close_diagnosed(
+                output[items_idx, :item_out_len, :],
+                output_wo_padding,
+                batch_activations,
+                items_activations,
+                items_idx)
 
     def test_batch_size_does_not_matter(self):
         """
         Tests that for the same input we get the same output regardless of the amount of padding.
         """
-        for max_batch_seq_len, shorter_seq_len in [(27, 13), (24, 16)]:
-            rand_batch = self._rand_tensor(
-                (5, max_batch_seq_len, self.module_wrapper.num_input_channels),
-                self.module_wrapper.input_dtype)
-            # multiple padded elements of same len
-            for b_idx in [1, 2, 3]:
-                rand_batch[b_idx, shorter_seq_len:, :] = 0
-            # sequence of len 1
-            rand_batch[4, 1:, :] = 0
-            batch_lens = torch.LongTensor([
-                max_batch_seq_len, shorter_seq_len, shorter_seq_len, shorter_seq_len, 1])
-            expected_shape = [
-                5,
-                self.module_wrapper.output_sequence_length(max_batch_seq_len),
-                self.module_wrapper.num_output_channels]
-            output = self._forward_with_expected_shape(rand_batch, batch_lens, expected_shape)
-            for i in range(5):
-                item_len = batch_lens[i].item()
-                item_valid_tokens = rand_batch[i, :item_len, :].unsqueeze(0)
-                output_wo_padding = self.module_wrapper.forward(
-                    item_valid_tokens, LongTensor([item_len]))
+        for lengths in self._batches_lengths():
+            self._assert_with_shrinking(self._check_batch_size_does_not_matter, lengths)
+
+    def test_long_sequences(self):
+        """
+        Tests that the padding area of the output contains all zeroes and that the output
+        does not depend on padding for long sequences. Skipped if `stress_sequence_length`
+        is not set.
+        """
+        if self.stress_sequence_length is None:
+            self.skipTest("stress_sequence_length is not set")
+        lengths = log_spaced_lengths(
+            max(1, self.stress_sequence_length // 8),
+            self.stress_sequence_length,
+            self.stress_num_lengths)
+        with torch.no_grad():
+            rand_batch, _, output = self._forward_padded_batch(lengths)
+            for i, item_len in enumerate(lengths):
                 item_out_len = self.module_wrapper.output_sequence_length(item_len)
-                torch.testing.assert_close(
-                        output[i, :item_out_len, :],
-                        output_wo_padding[0, :, :])
+                self.assertTrue(
+                    torch.all(output[i, item_out_len:, :] == 0),
+                    f"non-zero entries in the padding area of the sequence with length "
+                    f"{item_len} in a batch with lengths {lengths}")
+                output_wo_padding = self._forward(
+                    rand_batch[i:i + 1, :item_len, :], LongTensor([item_len]))
+                self._assert_close_chunked(
+                    output[i:i + 1, :item_out_len, :], output_wo_padding, self.stress_chunk_size)
@@ -0,0 +1,86 @@
+# Copyright 2023 FBK
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License
+"""
+Per-submodule timing of the modules wrapped by a
+:py:class:`pangolinn.seq2seq.PangolinnSeq2SeqModuleWrapper`, collected through forward hooks
+(see :py:func:`pangolinn.seq2seq.hooks.submodule_hooks`). The time of a submodule includes
+the time of its children.
+"""
+import json
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List
+
+from torch import nn
+
+from pangolinn.seq2seq.hooks import submodule_hooks
+
+
+class SubmoduleProfile:
+    """
+    Wall time and number of calls of the forward of each submodule, accumulated over all the
+    forwards executed within :py:meth:`record`.
+    """
+    def __init__(self):
+        self.calls: Dict[str, int] = defaultdict(int)
+        self.total_time: Dict[str, float] = defaultdict(float)
+        self._start_times: Dict[str, List[float]] = defaultdict(list)
+
+    def _forward_pre_hook(self, name: str, module: nn.Module, inputs: Any):
+        self._start_times[name].append(time.perf_counter())
+
+    def _forward_hook(self, name: str, module: nn.Module, inputs: Any, outputs: Any):
+        # start times are kept in a stack as a submodule can be called recursively
+        self.total_time[name] += time.perf_counter() - self._start_times[name].pop()
+        self.calls[name] += 1
+
+    @contextmanager
+    def record(self, module: nn.Module) -> Iterator["SubmoduleProfile"]:
+        """
+        Within this context, the forwards of the module and of its submodules are timed.
+        """
+        with submodule_hooks(module, self._forward_hook, self._forward_pre_hook):
+            yield self
+
+    def to_records(self) -> List[Dict[str, Any]]:
+        """
+        :return: the calls and the total and mean time (in seconds) of each submodule, sorted
+                 by decreasing total time
+        """
+        return [
+            {
+                "submodule": name,
+                "calls": self.calls[name],
+                "total_time": total_time,
+                "mean_time": total_time / self.calls[name]}
+            for name, total_time in sorted(self.total_time.items(), key=lambda kv: -kv[1])]
+
+    def save_json(self, path: str):
+        with open(path, "w") as json_file:
+            json.dump(self.to_records(), json_file, indent=2)
+
+
+def format_profile(profile: SubmoduleProfile) -> str:
+    """
+    :param profile: the profile to report
+    :return: a table with the calls and the total and mean time of each submodule, sorted by
+             decreasing total time
+    """
+    lines = [f"{'submodule':<40} {'calls':>8} {'total (ms)':>12} {'mean (ms)':>12}"]
+    for entry in profile.to_records():
+        lines.append(
+            f"{entry['submodule']:<40} {entry['calls']:>8} "
+            f"{entry['total_time'] * 1000:>12.3f} {entry['mean_time'] * 1000:>12.3f}")
+    return "\n".join(lines)
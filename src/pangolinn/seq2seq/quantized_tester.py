@@ -0,0 +1,128 @@
+# Copyright 2023 FBK
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License
+import logging
+import statistics
+from contextlib import contextmanager
+from typing import Iterator, Optional, Set, Type
+
+import torch
+from torch import LongTensor, nn
+
+from pangolinn.seq2seq.base_tester import BaseTester
+from pangolinn.seq2seq.utils import time_forward
+
+
+LOGGER = logging.getLogger(__name__)
+
+
+class QuantizedModuleTestCase(BaseTester):
+    """
+    This class provides unit tests to enforce that the module to be tested can be served after
+    dynamic quantization (`torch.ao.quantization.quantize_dynamic`), i.e. that the quantized
+    module returns results close to the ones of the floating point module.
+
+    To use it to test your network:
+
+     1. create a `PangolinnSeq2SeqModuleWrapper` that wraps your module (e.g. `MyWrapper`);
+     2. create test class that extends `QuantizedModuleTestCase`;
+     3. in your test class, override the class attribute `module_wrapper_class` by setting it to
+        the **class** of your wrapper (e.g., `module_wrapper_class = MyWrapper`);
+
+    As the wrapped module is replaced by its quantized version before each test, the padding and
+    causal tests can be executed over the quantized module by extending also the corresponding
+    test case, e.g.
+    `class MyQuantizedTestCase(seq2seq.QuantizedModuleTestCase, seq2seq.EncoderPaddingTestCase)`.
+    In this case, outputs are compared with the quantization tolerances `rtol` and `atol`,
+    as the scale of the activations is computed over the whole batch and therefore depends on
+    padding, and the tests based on gradients are skipped, as quantized operators do not
+    support autograd.
+
+    The layers in `quantized_layer_types` are quantized to `quantization_dtype`. The latency
+    of the quantized module and of the floating point one is logged and, if
+    `min_quantized_speedup` is set, the speedup is checked by `test_quantized_speedup`.
+    """
+    quantized_layer_types: Set[Type[nn.Module]] = {nn.Linear, nn.LSTM}
+    quantization_dtype: torch.dtype = torch.qint8
+    min_quantized_speedup: Optional[float] = None
+    rtol = 5e-2
+    atol = 5e-2
+
+    def setUp(self) -> None:
+        self._wrapper_setup(QuantizedModuleTestCase)
+        self._quantize_module()
+
+    def _quantize_module(self):
+        self.float_module: nn.Module = self.module_wrapper._module
+        # quantize_dynamic swaps only the children of the given module, so the wrapped module
+        # is nested in a container to quantize it also when it is a single layer
+        self.quantized_module = torch.ao.quantization.quantize_dynamic(
+            nn.Sequential(self.float_module),
+            self.quantized_layer_types,
+            dtype=self.quantization_dtype)[0]
+        self.module_wrapper._module = self.quantized_module
+
+    def tearDown(self) -> None:
+        if hasattr(self, "float_module"):
+            self.module_wrapper._module = self.float_module
+        super().tearDown()
+
+    def _skip_if_not_differentiable(self):
+        self.skipTest("quantized modules do not support autograd")
+
+    @contextmanager
+    def _float_forward(self) -> Iterator[None]:
+        """
+        Within this context, the wrapper uses the floating point module instead of the
+        quantized one.
+        """
+        self.module_wrapper._module = self.float_module
+        try:
+            yield
+        finally:
+            self.module_wrapper._module = self.quantized_module
+
+    def test_quantized_matches_float(self):
+        """
+        Tests that the quantized module returns the same results as the floating point one,
+        within the quantization tolerances.
+        """
+        lengths = LongTensor([27, 13])
+        x = self._rand_padded_batch(lengths)
+        with torch.no_grad():
+            quantized_output = self.module_wrapper.forward(x, lengths)
+            with self._float_forward():
+                float_output = self.module_wrapper.forward(x, lengths)
+        self._assert_close(quantized_output, float_output)
+
+    def test_quantized_speedup(self):
+        """
+        Logs the CPU latency of the quantized module and of the floating point one and, if
+        `min_quantized_speedup` is set, checks that the speedup is at least
+        `min_quantized_speedup`.
+        """
+        lengths = LongTensor([64] * 8)
+        x = self._rand_padded_batch(lengths)
+        quantized_latency = statistics.median(time_forward(self.module_wrapper, x, lengths))
+        with self._float_forward():
+            float_latency = statistics.median(time_forward(self.module_wrapper, x, lengths))
+        speedup = float_latency / quantized_latency
+        LOGGER.info(
+            f"{self.id()}: floating point {float_latency * 1000:.3f}ms, quantized "
+            f"{quantized_latency * 1000:.3f}ms, speedup {speedup:.2f}x")
+        if self.min_quantized_speedup is not None:
+            self.assertGreaterEqual(
+                speedup,
+                self.min_quantized_speedup,
+                msg=f"The quantized module is only {speedup:.2f}x faster than the floating "
+                    "point one.")
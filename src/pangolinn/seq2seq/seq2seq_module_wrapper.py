@@ -11,6 +11,8 @@
 # WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 # See the License for the specific language governing permissions and
 # limitations under the License
+from typing import Any, Optional, Tuple
+
 import torch
 from torch import nn, LongTensor, Tensor
 
@@ -70,6 +72,77 @@ class PangolinnSeq2SeqModuleWrapper:
         raise NotImplementedError(
             "Please implement forward to return the output of the wrapped module to be tested")
 
+    def forward_step(self, x: Tensor, state: Optional[Any]) -> Tuple[Tensor, Any]:
+        """
+        Processes a single time step with the wrapped module, reusing the incremental state
+        (e.g., the key/value cache of attention layers) produced by the previous steps.
+        This method has to be overridden only to use `IncrementalDecodingTestCase`.
+
+        :param x: the tensor containing the current time step with shape (batch, 1, channels)
+        :param state: the incremental state returned by the previous call of this method,
+                      or `None` for the first time step.
+        :return: a tuple containing the output for the current time step with shape
+                 (batch, 1, channels) and the updated incremental state.
+        """
+        raise NotImplementedError(
+            "Please implement forward_step to process a single time step of the wrapped module "
+            "with an incremental state")
+
+    def forward_packed(self, x: Tensor, lengths: LongTensor) -> Tensor:
+        """
+        Processes the sequences in `x` with the wrapped module without padding, i.e. with
+        the sequences concatenated along the time dimension (as done by padding-free kernels).
+        This method has to be overridden only to use `PackedSequenceTestCase`.
+
+        :param x: the tensor containing the concatenation of the valid tokens of all the
+                  sequences with shape (sum(lengths), channels)
+        :param lengths: tensor of shape (batch, ) that contains the length of each of the
+                        sequences concatenated in `x`.
+        :return: the concatenation of the valid output tokens of all the sequences with shape
+                 (sum(output_sequence_length(lengths)), channels)
+        """
+        raise NotImplementedError(
+            "Please implement forward_packed to process the concatenation of the sequences "
+            "without padding with the wrapped module")
+
+    def forward_chunk(self, x: Tensor, state: Optional[Any]) -> Tuple[Tensor, Any]:
+        """
+        Processes a chunk of the input sequence with the wrapped module in streaming mode,
+        reusing the state (e.g., cached activations of the previous chunks) produced by the
+        previous chunks. This method has to be overridden only to use
+        `StreamingEncoderTestCase`.
+
+        :param x: the tensor containing the current chunk of `streaming_chunk_size` time
+                  steps followed by the `streaming_lookahead` time steps of right context
+                  (or less, at the end of the sequence) with shape (batch, seq_len, channels)
+        :param state: the state returned by the previous call of this method, or `None`
+                      for the first chunk.
+        :return: a tuple containing the output for the current chunk (excluding the
+                 lookahead) with shape (batch, seq_len, channels) and the updated state.
+        """
+        raise NotImplementedError(
+            "Please implement forward_chunk to process a chunk of the sequence with the "
+            "wrapped module in streaming mode")
+
+    @property
+    def streaming_chunk_size(self) -> int:
+        """
+        This property has to be overridden only to use `StreamingEncoderTestCase`.
+
+        :return: the number of input time steps in each chunk processed in streaming mode.
+        """
+        raise NotImplementedError(
+            "Please implement streaming_chunk_size to return the number of input time steps "
+            "in each chunk")
+
+    @property
+    def streaming_lookahead(self) -> int:
+        """
+        :return: the number of input time steps after the end of a chunk (right context)
+                 that can be used to compute the output of the chunk. Defaults to 0.
+        """
+        return 0
+
     @property
     def sequence_downsampling_factor(self) -> int:
         """
@@ -0,0 +1,151 @@
+# Copyright 2023 FBK
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License
+import logging
+import statistics
+import time
+from typing import List, Optional, Tuple
+
+import torch
+from torch import LongTensor, Tensor
+
+from pangolinn.seq2seq.base_tester import BaseTester
+
+
+LOGGER = logging.getLogger(__name__)
+
+
+class StreamingEncoderTestCase(BaseTester):
+    """
+    This class provides unit tests to enforce that the module to be tested can be used as a
+    chunk-based streaming encoder (e.g., for simultaneous speech translation), i.e. that the
+    output of each chunk depends only on the input up to the end of the chunk plus a bounded
+    right context (lookahead), and that processing the sequence chunk by chunk returns the
+    same results as the forward over the whole sequence.
+
+    To use it to test your network:
+
+     1. create a `PangolinnSeq2SeqModuleWrapper` that wraps your module (e.g. `MyWrapper`) and
+        implements `streaming_chunk_size`, `forward_chunk` and, if the module uses a right
+        context, `streaming_lookahead`;
+     2. create test class that extends `StreamingEncoderTestCase`;
+     3. in your test class, override the class attribute `module_wrapper_class` by setting it to
+        the **class** of your wrapper (e.g., `module_wrapper_class = MyWrapper`);
+
+    The tests use sequences of `streaming_num_chunks` chunks. The latency of the computation
+    of each chunk is logged and, if the class attribute `max_chunk_latency` (in seconds) is
+    set, `test_chunk_latency` checks that no chunk (excluding the first one, which is often
+    slower, e.g. for memory allocations) exceeds it.
+    """
+    streaming_num_chunks: int = 8
+    max_chunk_latency: Optional[float] = None
+
+    def setUp(self) -> None:
+        self._wrapper_setup(StreamingEncoderTestCase)
+        self._chunk_size = self.module_wrapper.streaming_chunk_size
+        self._lookahead = self.module_wrapper.streaming_lookahead
+        self.assertEqual(
+            0,
+            self._chunk_size % self._downsampling_factor,
+            msg=f"The chunk size ({self._chunk_size}) should be a multiple of the "
+                f"downsampling factor ({self._downsampling_factor}).")
+
+    def _decode_chunks(self, x: Tensor) -> Tuple[Tensor, List[float]]:
+        """
+        :param x: the input tensor with shape (batch, seq_len, channels)
+        :return: the concatenation of the outputs of each chunk, and the latency
+                 (in seconds) of each chunk
+        """
+        state = None
+        chunk_outputs = []
+        chunk_latencies = []
+        with torch.no_grad():
+            for start in range(0, x.shape[1], self._chunk_size):
+                end = min(start + self._chunk_size, x.shape[1])
+                start_time = time.perf_counter()
+                chunk_output, state = self.module_wrapper.forward_chunk(
+                    x[:, start:end + self._lookahead, :], state)
+                chunk_latencies.append(time.perf_counter() - start_time)
+                expected_len = \
+                    self.module_wrapper.output_sequence_length(end) - \
+                    self.module_wrapper.output_sequence_length(start)
+                self.assertListEqual(
+                    [x.shape[0], expected_len, self.module_wrapper.num_output_channels],
+                    list(chunk_output.size()),
+                    msg=f"Unexpected output shape {chunk_output.size()} for the chunk "
+                        f"[{start}, {end}). forward_chunk should return a tensor of shape "
+                        "(batch, seq_len, channels) without the lookahead.")
+                chunk_outputs.append(chunk_output)
+        return torch.cat(chunk_outputs, dim=1), chunk_latencies
+
+    def test_chunked_matches_full_forward(self):
+        """
+        Tests that processing the sequence chunk by chunk produces the same outputs as the
+        forward over the whole sequence.
+        """
+        test_len = self.streaming_num_chunks * self._chunk_size
+        x = self._rand_input(2, test_len)
+        expected_shape = [
+            2,
+            self.module_wrapper.output_sequence_length(test_len),
+            self.module_wrapper.num_output_channels]
+        with torch.no_grad():
+            output = self._forward_with_expected_shape(
+                x, LongTensor([test_len] * 2), expected_shape)
+        chunked_output, _ = self._decode_chunks(x)
+        self._assert_close(chunked_output, output)
+
+    def test_output_depends_only_on_chunk_and_lookahead(self):
+        """
+        Tests that changing the input at a given time step does not change the outputs of the
+        chunks that end (including their lookahead) before it. As in
+        :py:meth:`pangolinn.seq2seq.CausalTestCase.test_future_perturbation_does_not_affect_past`,
+        a single batch is built, where the first element is a random sequence and each of the
+        other elements is the same sequence with a different time step altered.
+        """
+        test_len = self.streaming_num_chunks * self._chunk_size
+        # the p-th input can be seen by the chunks whose end plus the lookahead is after it,
+        # so the first output element that can depend on it is the first one of the first
+        # of these chunks
+        first_dependent_chunk = [
+            max(0, (p - self._lookahead) // self._chunk_size) for p in range(test_len)]
+        first_dependent_output = LongTensor([
+            self.module_wrapper.output_sequence_length(chunk * self._chunk_size)
+            for chunk in first_dependent_chunk])
+        offending_pairs = self._perturbation_offending_pairs(test_len, first_dependent_output)
+        self.assertEqual(
+            0,
+            len(offending_pairs),
+            msg=f"{len(offending_pairs)} (output, input) position pairs in which the output "
+                f"changes when altering input elements after the end of its chunk (of "
+                f"{self._chunk_size} elements) plus the lookahead (of {self._lookahead} "
+                f"elements): {offending_pairs}")
+
+    def test_chunk_latency(self):
+        """
+        Logs the latency of the computation of each chunk and, if `max_chunk_latency` is
+        set, checks that it is not exceeded by any chunk but the first one.
+        """
+        x = self._rand_input(1, self.streaming_num_chunks * self._chunk_size)
+        _, chunk_latencies = self._decode_chunks(x)
+        LOGGER.info(
+            f"{self.id()}: chunk latencies (ms) "
+            f"{[round(latency * 1000, 3) for latency in chunk_latencies]}, median "
+            f"{statistics.median(chunk_latencies) * 1000:.3f}ms")
+        if self.max_chunk_latency is not None:
+            worst_latency = max(chunk_latencies[1:], default=chunk_latencies[0])
+            self.assertLessEqual(
+                worst_latency,
+                self.max_chunk_latency,
+                msg=f"The computation of a chunk took {worst_latency * 1000:.3f}ms, more than "
+                    f"the maximum latency of {self.max_chunk_latency * 1000:.3f}ms.")
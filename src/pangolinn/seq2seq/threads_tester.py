@@ -0,0 +1,121 @@
+# Copyright 2023 FBK
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License
+import logging
+import statistics
+from contextlib import contextmanager
+from typing import Iterator, Optional, Sequence
+
+import torch
+from torch import LongTensor
+
+from pangolinn.seq2seq.base_tester import BaseTester
+from pangolinn.seq2seq.utils import time_forward
+
+
+LOGGER = logging.getLogger(__name__)
+
+
+@contextmanager
+def num_threads(threads: int) -> Iterator[None]:
+    """
+    Within this context, PyTorch uses `threads` threads for intra-op parallelism.
+    """
+    previous_threads = torch.get_num_threads()
+    torch.set_num_threads(threads)
+    try:
+        yield
+    finally:
+        torch.set_num_threads(previous_threads)
+
+
+class ThreadScalingTestCase(BaseTester):
+    """
+    This class provides unit tests to enforce that the results of the module to be tested do
+    not depend on the number of threads used by PyTorch for intra-op parallelism (e.g., as it
+    happens with reductions whose order depends on how the work is split among threads), and
+    measures how its throughput scales with the number of threads.
+
+    To use it to test your network:
+
+     1. create a `PangolinnSeq2SeqModuleWrapper` that wraps your module (e.g. `MyWrapper`);
+     2. create test class that extends `ThreadScalingTestCase`;
+     3. in your test class, override the class attribute `module_wrapper_class` by setting it to
+        the **class** of your wrapper (e.g., `module_wrapper_class = MyWrapper`);
+
+    The forward is executed with each of the `thread_counts` over a batch containing sequences
+    with all the lengths generated by :py:func:`pangolinn.seq2seq.length_sweep.sweep_lengths`
+    up to the longest of `thread_batch_lengths`, which are the lengths of the batch used to
+    measure the throughput. The outputs are required to be
+    bitwise identical if `bitwise_thread_determinism` is `True`, or close within the
+    tolerances `rtol` and `atol` otherwise. The throughput obtained with each number of
+    threads is logged and, if `min_thread_scaling` is set, the throughput with the highest
+    number of threads is checked to be at least `min_thread_scaling` times the one with the
+    lowest number of threads.
+    """
+    thread_counts: Sequence[int] = (1, 2, 4)
+    bitwise_thread_determinism: bool = False
+    min_thread_scaling: Optional[float] = None
+    thread_batch_lengths: Sequence[int] = (64, ) * 8
+
+    def setUp(self) -> None:
+        self._wrapper_setup(ThreadScalingTestCase)
+
+    def test_outputs_do_not_depend_on_thread_count(self):
+        """
+        Tests that the outputs obtained with each of the `thread_counts` are the same.
+        """
+        lengths = LongTensor(self._sweep_lengths(max(self.thread_batch_lengths)))
+        x = self._rand_padded_batch(lengths)
+        outputs = {}
+        with torch.no_grad():
+            for threads in self.thread_counts:
+                with num_threads(threads):
+                    outputs[threads] = self.module_wrapper.forward(x, lengths)
+        reference_threads = self.thread_counts[0]
+        for threads in self.thread_counts[1:]:
+            if self.bitwise_thread_determinism:
+                self.assertTrue(
+                    torch.equal(outputs[threads], outputs[reference_threads]),
+                    msg=f"The output with {threads} threads is not bitwise identical to the "
+                        f"one with {reference_threads} threads: max absolute difference "
+                        f"{(outputs[threads] - outputs[reference_threads]).abs().max()}.")
+            else:
+                self._assert_close(outputs[threads], outputs[reference_threads])
+
+    def test_thread_scaling(self):
+        """
+        Logs the throughput obtained with each of the `thread_counts` and, if
+        `min_thread_scaling` is set, checks that the throughput grows by at least
+        `min_thread_scaling` from the lowest to the highest number of threads.
+        """
+        lengths = LongTensor(self.thread_batch_lengths)
+        x = self._rand_padded_batch(lengths)
+        tokens_per_second = {}
+        for threads in self.thread_counts:
+            with num_threads(threads):
+                latency = statistics.median(time_forward(self.module_wrapper, x, lengths))
+            tokens_per_second[threads] = int(lengths.sum()) / latency
+        LOGGER.info(
+            f"{self.id()}: tokens per second by number of threads " + ", ".join(
+                f"{threads}: {throughput:.1f}"
+                for threads, throughput in sorted(tokens_per_second.items())))
+        if self.min_thread_scaling is not None:
+            scaling = \
+                tokens_per_second[max(self.thread_counts)] / \
+                tokens_per_second[min(self.thread_counts)]
+            self.assertGreaterEqual(
+                scaling,
+                self.min_thread_scaling,
+                msg=f"The throughput with {max(self.thread_counts)} threads is only "
+                    f"{scaling:.2f}x the one with {min(self.thread_counts)} threads.")
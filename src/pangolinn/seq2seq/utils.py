@@ -0,0 +1,139 @@
+# Copyright 2023 FBK
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+import torch
+from torch import LongTensor, Tensor
+
+from pangolinn.seq2seq.seq2seq_module_wrapper import PangolinnSeq2SeqModuleWrapper
+
+
+# defaults of torch.testing.assert_close, used when no tolerance is set
+_DEFAULT_TOLERANCES: Dict[torch.dtype, Tuple[float, float]] = {
+    torch.float16: (1e-3, 1e-5),
+    torch.bfloat16: (1.6e-2, 1e-5),
+    torch.float32: (1.3e-6, 1e-5),
+    torch.float64: (1e-7, 1e-7),
+}
+
+
+def default_tolerances(
+        dtype: torch.dtype,
+        rtol: Optional[float] = None,
+        atol: Optional[float] = None) -> Tuple[float, float]:
+    """
+    :param dtype: the dtype of the tensors to compare
+    :param rtol: the relative tolerance, if set
+    :param atol: the absolute tolerance, if set
+    :return: the given `rtol` and `atol`, replacing the ones that are not set with the
+             defaults of `torch.testing.assert_close` for `dtype`
+    """
+    default_rtol, default_atol = _DEFAULT_TOLERANCES.get(dtype, (0.0, 0.0))
+    return default_rtol if rtol is None else rtol, default_atol if atol is None else atol
+
+
+def isclose(
+        actual: Tensor,
+        expected: Tensor,
+        rtol: Optional[float] = None,
+        atol: Optional[float] = None) -> Tensor:
+    """
+    Element-wise version of `torch.testing.assert_close`.
+
+    :param actual: the tensor to compare
+    :param expected: the reference tensor, whose dtype `actual` is cast to
+    :param rtol: the relative tolerance (defaults to the one of `torch.testing.assert_close`
+                 for the dtype of `actual`)
+    :param atol: the absolute tolerance (defaults to the one of `torch.testing.assert_close`
+                 for the dtype of `actual`)
+    :return: a boolean tensor that is True where `actual` and `expected` are close
+    """
+    rtol, atol = default_tolerances(actual.dtype, rtol, atol)
+    return torch.isclose(actual.to(expected.dtype), expected, rtol=rtol, atol=atol)
+
+
+def rand_tensor(shape: Tuple[int, ...], dtype: torch.dtype, max_value_allowed: int) -> Tensor:
+    """
+    :param shape: the shape of the tensor to generate
+    :param dtype: the dtype of the tensor to generate
+    :param max_value_allowed: the (exclusive) upper bound of the values generated
+                              for integer dtypes
+    :return: a random tensor with values in [0, 1) for floating point and complex dtypes,
+             and in [0, max_value_allowed) for integer dtypes.
+    """
+    if dtype.is_floating_point or dtype.is_complex:
+        return torch.rand(shape, dtype=dtype)
+    else:
+        return torch.randint(max_value_allowed, shape, dtype=dtype)
+
+
+def rand_padded_batch(
+        module_wrapper: PangolinnSeq2SeqModuleWrapper, lengths: LongTensor) -> Tensor:
+    """
+    :param module_wrapper: the wrapper of the module that is fed with the batch
+    :param lengths: tensor of shape (batch, ) with the length of each sequence in the batch
+    :return: a random input for the wrapped module with shape
+             (batch, max(lengths), num_input_channels), whose padding area is set to zero
+    """
+    batch = rand_tensor(
+        (len(lengths), int(lengths.max()), module_wrapper.num_input_channels),
+        module_wrapper.input_dtype,
+        module_wrapper.max_value_allowed)
+    padding_mask = torch.arange(batch.shape[1]).unsqueeze(0) >= lengths.unsqueeze(1)
+    return batch.masked_fill(padding_mask.unsqueeze(-1), 0)
+
+
+def pack_sequences(x: Tensor, lengths: LongTensor) -> Tensor:
+    """
+    :param x: a padded batch with shape (batch, seq_len, channels)
+    :param lengths: tensor of shape (batch, ) with the length of each sequence in `x`
+    :return: the concatenation of the valid tokens of the sequences in `x`, with shape
+             (sum(lengths), channels)
+    """
+    valid_mask = torch.arange(x.shape[1]).unsqueeze(0) < lengths.unsqueeze(1)
+    return x[valid_mask]
+
+
+def time_forward(
+        module_wrapper: PangolinnSeq2SeqModuleWrapper,
+        x: Tensor,
+        lengths: LongTensor,
+        warmup_runs: int = 3,
+        timed_runs: int = 10,
+        forward_fn: Optional[Callable[[Tensor, LongTensor], Tensor]] = None) -> List[float]:
+    """
+    Measures the wall-clock time of the forward of the wrapped module, without tracking
+    gradients.
+
+    :param module_wrapper: the wrapper of the module to time
+    :param x: the input of the forward with shape (batch, seq_len, channels)
+    :param lengths: tensor of shape (batch, ) with the length of each sequence in `x`
+    :param warmup_runs: number of forwards executed (and discarded) before the timed ones
+    :param timed_runs: number of timed forwards
+    :param forward_fn: the function to time, if different from the `forward` of the
+                       wrapper (e.g., its `forward_packed`)
+    :return: the latency in seconds of each of the timed forwards
+    """
+    if forward_fn is None:
+        forward_fn = module_wrapper.forward
+    latencies = []
+    with torch.no_grad():
+        for _ in range(warmup_runs):
+            forward_fn(x, lengths)
+        for _ in range(timed_runs):
+            start_time = time.perf_counter()
+            forward_fn(x, lengths)
+            latencies.append(time.perf_counter() - start_time)
+    return latencies
@@ -0,0 +1,88 @@
+# Copyright 2023 FBK
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License
+import contextlib
+import io
+import unittest
+
+import torch
+from torch import Tensor, LongTensor, nn
+
+from pangolinn import seq2seq
+from pangolinn.seq2seq import benchmark
+
+
+class LinearWrapper(seq2seq.PangolinnSeq2SeqModuleWrapper):
+    """
+    Wrapper of a linear layer used for benchmarking.
+    """
+    def build_module(self) -> nn.Module:
+        return nn.Linear(self.num_input_channels, self.num_output_channels)
+
+    @property
+    def num_input_channels(self) -> int:
+        return 4
+
+    def forward(self, x: Tensor, lengths: LongTensor) -> Tensor:
+        padding_mask = torch.arange(x.shape[1]).unsqueeze(0) >= lengths.unsqueeze(1)
+        return self._module(x).masked_fill(padding_mask.unsqueeze(-1), 0.0)
+
+
+class BenchmarkTestCase(unittest.TestCase):
+    def test_lengths_for_padding_ratio(self):
+        self.assertListEqual(
+            [16, 8, 8, 8], benchmark.lengths_for_padding_ratio(4, 16, 0.375).tolist())
+        self.assertListEqual([16], benchmark.lengths_for_padding_ratio(1, 16, 0.0).tolist())
+        self.assertIsNone(benchmark.lengths_for_padding_ratio(1, 16, 0.25))
+        self.assertIsNone(benchmark.lengths_for_padding_ratio(2, 16, 0.75))
+
+    def test_benchmark_sweep(self):
+        results = benchmark.benchmark(
+            LinearWrapper(),
+            batch_sizes=[1, 3],
+            sequence_lengths=[8, 16],
+            padding_ratios=[0.0, 0.5],
+            warmup_runs=1,
+            timed_runs=3)
+        # padding ratio 0.5 is not achievable with batch size 1
+        self.assertEqual(6, len(results))
+        for result in results:
+            self.assertEqual(3, len(result.latencies))
+            self.assertGreater(result.tokens_per_second, 0.0)
+            self.assertLessEqual(result.p50_latency, result.p99_latency)
+            self.assertEqual(
+                result.batch_size * result.sequence_length,
+                result.valid_tokens + result.padded_tokens)
+        last_result = results[-1]
+        self.assertEqual((3, 16, 0.5), (
+            last_result.batch_size, last_result.sequence_length, last_result.padding_ratio))
+        self.assertEqual(24, last_result.valid_tokens)
+        self.assertEqual(24, last_result.padded_tokens)
+
+    def test_main(self):
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            benchmark.main([
+                f"{__name__}:LinearWrapper",
+                "--batch-sizes", "2",
+                "--sequence-lengths", "8",
+                "--padding-ratios", "0.25",
+                "--timed-runs", "2"])
+        lines = output.getvalue().strip().split("\n")
+        self.assertEqual(2, len(lines))
+        self.assertIn("tok/s", lines[0])
+        self.assertListEqual(["2", "8", "0.25", "12", "4"], lines[1].split()[:5])
+
+
+if __name__ == '__main__':
+    unittest.main()
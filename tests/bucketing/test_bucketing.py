@@ -0,0 +1,136 @@
+# Copyright 2023 FBK
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License
+import contextlib
+import io
+import os
+import tempfile
+import unittest
+
+import torch
+from torch import Tensor, LongTensor, nn
+
+from pangolinn import seq2seq
+from pangolinn.seq2seq import bucketing
+
+
+class LinearWrapper(seq2seq.PangolinnSeq2SeqModuleWrapper):
+    """
+    Wrapper of a linear layer used for the batching simulation.
+    """
+    def build_module(self) -> nn.Module:
+        return nn.Linear(self.num_input_channels, self.num_output_channels)
+
+    @property
+    def num_input_channels(self) -> int:
+        return 4
+
+    def forward(self, x: Tensor, lengths: LongTensor) -> Tensor:
+        padding_mask = torch.arange(x.shape[1]).unsqueeze(0) >= lengths.unsqueeze(1)
+        return self._module(x).masked_fill(padding_mask.unsqueeze(-1), 0.0)
+
+
+class PackedLinearWrapper(LinearWrapper):
+    """
+    Wrapper of a linear layer that supports also padding-free batches.
+    """
+    def forward_packed(self, x: Tensor, lengths: LongTensor) -> Tensor:
+        return self._module(x)
+
+
+class BucketingTestCase(unittest.TestCase):
+    lengths = [3, 17, 5, 16, 4, 9, 2, 15]
+
+    def test_strategies_respect_token_budget(self):
+        for name, strategy in bucketing.STRATEGIES.items():
+            with self.subTest(strategy=name):
+                batches = strategy(self.lengths, 32)
+                self.assertListEqual(
+                    sorted(self.lengths), sorted(length for b in batches for length in b))
+                for batch in batches:
+                    if name in bucketing.PADDING_FREE_STRATEGIES:
+                        self.assertLessEqual(sum(batch), 32)
+                    else:
+                        self.assertLessEqual(len(batch) * max(batch), 32)
+
+    def test_longer_sequences_than_budget(self):
+        for name, strategy in bucketing.STRATEGIES.items():
+            with self.subTest(strategy=name):
+                self.assertListEqual([[40], [2]], sorted(strategy([40, 2], 32), reverse=True))
+
+    def test_batches(self):
+        self.assertListEqual(
+            [[3], [17], [5, 16], [4, 9, 2], [15]], bucketing.unsorted_batches(self.lengths, 32))
+        self.assertListEqual(
+            [[2, 3, 4, 5], [9, 15], [16], [17]], bucketing.sorted_batches(self.lengths, 32))
+        self.assertListEqual(
+            [[2], [3, 4], [5], [16, 9], [15], [17]],
+            bucketing.bucketed_batches(self.lengths, 32))
+        self.assertListEqual(
+            [[2, 3], [10, 20]], bucketing.bucketed_batches([2, 10, 3, 20], 64, [4, 32]))
+        self.assertListEqual(
+            [[17, 15], [16, 9, 5, 2], [4, 3]], bucketing.packed_batches(self.lengths, 32))
+
+    def test_simulate(self):
+        results = bucketing.simulate(
+            LinearWrapper(), self.lengths, 32, strategies=["unsorted", "sorted"], timed_runs=2)
+        self.assertListEqual(["unsorted", "sorted"], [r.strategy for r in results])
+        unsorted_result, sorted_result = results
+        self.assertEqual(5, unsorted_result.num_batches)
+        self.assertEqual(sum(self.lengths), unsorted_result.valid_tokens)
+        self.assertEqual(sum(self.lengths), sorted_result.valid_tokens)
+        self.assertEqual(4, sorted_result.num_batches)
+        self.assertEqual(23, unsorted_result.padded_tokens)
+        self.assertEqual(12, sorted_result.padded_tokens)
+        for result in results:
+            self.assertGreater(result.tokens_per_second, 0.0)
+            self.assertAlmostEqual(
+                result.padded_tokens / (result.valid_tokens + result.padded_tokens),
+                result.padding_fraction)
+
+    def test_simulate_packed(self):
+        results = bucketing.simulate(
+            PackedLinearWrapper(), self.lengths, 32, strategies=["sorted", "packed"],
+            timed_runs=2)
+        self.assertListEqual(["sorted", "packed"], [r.strategy for r in results])
+        packed_result = results[1]
+        self.assertEqual(3, packed_result.num_batches)
+        self.assertEqual(sum(self.lengths), packed_result.valid_tokens)
+        self.assertEqual(0, packed_result.padded_tokens)
+        self.assertEqual(0.0, packed_result.padding_fraction)
+        results = bucketing.simulate(
+            LinearWrapper(), self.lengths, 32, strategies=["sorted", "packed"],
+            timed_runs=2)
+        self.assertListEqual(["sorted"], [r.strategy for r in results])
+
+    def test_main(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            lengths_file = os.path.join(tmp_dir, "lengths.txt")
+            with open(lengths_file, "w") as f:
+                f.write("\n".join(str(length) for length in self.lengths) + "\n")
+            output = io.StringIO()
+            with contextlib.redirect_stdout(output):
+                bucketing.main([
+                    f"{__name__}:PackedLinearWrapper",
+                    lengths_file,
+                    "--max-tokens", "32",
+                    "--timed-runs", "2"])
+        lines = output.getvalue().strip().split("\n")
+        self.assertEqual(5, len(lines))
+        self.assertIn("pad_frac", lines[0])
+        self.assertListEqual(
+            ["unsorted", "sorted", "bucketed", "packed"], [line.split()[0] for line in lines[1:]])
+
+
+if __name__ == '__main__':
+    unittest.main()
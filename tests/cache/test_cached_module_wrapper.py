@@ -0,0 +1,80 @@
+# Copyright 2023 FBK
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License
+import unittest
+
+import torch
+from torch import Tensor, LongTensor, nn
+
+from pangolinn import seq2seq
+
+
+class CountingEmbeddingsWrapper(seq2seq.PangolinnSeq2SeqModuleWrapper):
+    """
+    Wrapper of an Embeddings layer that counts how many times its module has been built.
+    """
+    num_builds = 0
+
+    def build_module(self) -> nn.Module:
+        CountingEmbeddingsWrapper.num_builds += 1
+        return nn.Embedding(self.max_value_allowed, self.num_output_channels, padding_idx=0)
+
+    @property
+    def num_input_channels(self) -> int:
+        return 1
+
+    @property
+    def input_dtype(self) -> torch.dtype:
+        return torch.int
+
+    @property
+    def num_output_channels(self) -> int:
+        return 4
+
+    def forward(self, x: Tensor, lengths: LongTensor) -> Tensor:
+        return self._module(x.squeeze(-1))
+
+
+class CachedEmbeddingsTestCase(seq2seq.EncoderPaddingTestCase):
+    module_wrapper_class = CountingEmbeddingsWrapper
+    cache_module_wrapper = True
+
+    def test_module_built_once(self):
+        module_wrapper = self.module_wrapper
+        self.setUp()
+        self.assertIs(module_wrapper, self.module_wrapper)
+        self.assertEqual(0.0, self.module_wrapper_build_time)
+        self.assertEqual(1, CountingEmbeddingsWrapper.num_builds)
+
+    def test_state_restored_between_tests(self):
+        original_weight = self.module_wrapper._module.weight.detach().clone()
+        with torch.no_grad():
+            self.module_wrapper._module.weight.add_(1.0)
+        self.module_wrapper._module.train()
+        self.setUp()
+        torch.testing.assert_close(self.module_wrapper._module.weight, original_weight)
+        self.assertFalse(self.module_wrapper._module.training)
+
+    def test_state_written_through_data_restored(self):
+        original_weight = self.module_wrapper._module.weight.detach().clone()
+        # writes through `.data` do not increase the version counter of the tensor
+        self.module_wrapper._module.weight.data.add_(1.0)
+        self.setUp()
+        torch.testing.assert_close(self.module_wrapper._module.weight, original_weight)
+        self.module_wrapper._module.weight.data.copy_(torch.zeros_like(original_weight))
+        self.setUp()
+        torch.testing.assert_close(self.module_wrapper._module.weight, original_weight)
+
+
+if __name__ == '__main__':
+    unittest.main()
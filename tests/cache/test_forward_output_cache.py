@@ -0,0 +1,168 @@
+# Copyright 2023 FBK
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License
+import unittest
+from typing import Callable
+
+import torch
+from torch import Tensor, LongTensor, nn
+
+from pangolinn import seq2seq
+from pangolinn.seq2seq.base_tester import _FORWARD_OUTPUT_CACHES
+
+
+class CountingLinearWrapper(seq2seq.PangolinnSeq2SeqModuleWrapper):
+    """
+    Wrapper of a linear layer followed by a cumulative sum over time, which is causal and
+    padding-safe, that counts the number of forwards.
+    """
+    num_forwards = 0
+
+    def build_module(self) -> nn.Module:
+        return nn.Linear(self.num_input_channels, self.num_output_channels)
+
+    @property
+    def num_input_channels(self) -> int:
+        return 4
+
+    def forward(self, x: Tensor, lengths: LongTensor) -> Tensor:
+        CountingLinearWrapper.num_forwards += 1
+        padding_mask = torch.arange(x.shape[1]).unsqueeze(0) >= lengths.unsqueeze(1)
+        return self._module(x).cumsum(dim=1).masked_fill(padding_mask.unsqueeze(-1), 0.0)
+
+
+class ForwardOutputCacheTestCase(seq2seq.EncoderPaddingTestCase, seq2seq.CausalTestCase):
+    module_wrapper_class = CountingLinearWrapper
+    cache_module_wrapper = True
+    cache_forward_outputs = True
+    forward_cache_size = 4
+
+    def _num_forwards(self, x: Tensor, lengths: LongTensor) -> int:
+        num_forwards = CountingLinearWrapper.num_forwards
+        self._forward(x, lengths)
+        return CountingLinearWrapper.num_forwards - num_forwards
+
+    def test_same_input_reuses_output(self):
+        lengths = LongTensor([5, 3])
+        x = self._rand_padded_batch(lengths)
+        torch.testing.assert_close(x, self._rand_padded_batch(lengths))
+        self.assertEqual(1, self._num_forwards(x, lengths))
+        self.assertEqual(0, self._num_forwards(x.clone(), lengths))
+        self.assertEqual(1, self._num_forwards(x, LongTensor([5, 2])))
+        self.assertEqual(1, self._num_forwards(x + 1, lengths))
+        forward_cache = _FORWARD_OUTPUT_CACHES[self.module_wrapper_class]
+        self.assertGreaterEqual(forward_cache.hits, 1)
+
+    def test_altered_module_is_not_reused(self):
+        lengths = LongTensor([5, 3])
+        x = self._rand_padded_batch(lengths)
+        self.assertEqual(1, self._num_forwards(x, lengths))
+        with torch.no_grad():
+            self.module_wrapper._module.weight.add_(1.0)
+        self.assertEqual(1, self._num_forwards(x, lengths))
+
+    def test_module_altered_through_data_is_not_reused(self):
+        lengths = LongTensor([5, 3])
+        x = self._rand_padded_batch(lengths)
+        cached_output = self._forward(x, lengths)
+        # writes through `.data` do not increase the version counter of the tensor
+        self.module_wrapper._module.weight.data.add_(1.0)
+        self.assertEqual(1, self._num_forwards(x, lengths))
+        self.assertFalse(torch.allclose(cached_output, self._forward(x, lengths)))
+        torch.testing.assert_close(
+            self._forward(x, lengths), self.module_wrapper.forward(x, lengths))
+
+    def test_training_mode_is_not_reused(self):
+        lengths = LongTensor([5, 3])
+        x = self._rand_padded_batch(lengths)
+        self._num_forwards(x, lengths)
+        self.module_wrapper._module.train()
+        self.assertEqual(1, self._num_forwards(x, lengths))
+        self.module_wrapper._module.eval()
+        self.assertEqual(0, self._num_forwards(x, lengths))
+
+    def test_inputs_requiring_gradients_are_not_cached(self):
+        lengths = LongTensor([5, 3])
+        x = self._rand_padded_batch(lengths).requires_grad_()
+        self.assertEqual(1, self._num_forwards(x, lengths))
+        self.assertEqual(1, self._num_forwards(x, lengths))
+
+    def test_least_recently_used_outputs_are_evicted(self):
+        inputs = [self._rand_padded_batch(LongTensor([length])) for length in range(1, 7)]
+        for x in inputs:
+            self._num_forwards(x, LongTensor([x.shape[1]]))
+        self.assertEqual(0, self._num_forwards(inputs[-1], LongTensor([6])))
+        self.assertEqual(1, self._num_forwards(inputs[0], LongTensor([1])))
+
+
+class SharedCountingLinearWrapper(CountingLinearWrapper):
+    """
+    Same as :py:class:`CountingLinearWrapper`, with a forward output cache of its own.
+    """
+    pass
+
+
+class SharedForwardOutputsTestCase(seq2seq.EncoderPaddingTestCase, seq2seq.CausalTestCase):
+    module_wrapper_class = SharedCountingLinearWrapper
+    cache_module_wrapper = True
+    cache_forward_outputs = True
+
+    def _num_forwards(self, test: Callable[[], None]) -> int:
+        num_forwards = CountingLinearWrapper.num_forwards
+        test()
+        return CountingLinearWrapper.num_forwards - num_forwards
+
+    def test_tests_reuse_forwards(self):
+        # the outputs cached by the other tests of the class are discarded
+        _FORWARD_OUTPUT_CACHES.pop(self.module_wrapper_class, None)
+        self.assertGreater(self._num_forwards(self.test_padding_area_is_zero), 0)
+        # the padded batches are the same of test_padding_area_is_zero, so only the forwards
+        # over the items without padding are computed, once for each distinct input
+        items_without_padding = {
+            (tuple(i for i, length in enumerate(lengths) if length == item_len), item_len)
+            for lengths in self._batches_lengths() for item_len in lengths}
+        self.assertEqual(
+            len(items_without_padding),
+            self._num_forwards(self.test_batch_size_does_not_matter))
+        torch.testing.assert_close(self._rand_input(5, 20), self._rand_input(5, 20))
+        self.assertGreater(self._num_forwards(self.test_not_looking_at_the_future), 0)
+        self.assertEqual(0, self._num_forwards(self.test_not_looking_at_the_future))
+
+    def test_input_hash_does_not_depend_on_views(self):
+        x = self._rand_input(4, 8)
+        self.assertEqual(
+            self._forward_cache_key(x[1:3], LongTensor([8, 8])),
+            self._forward_cache_key(x[1:3].clone(), LongTensor([8, 8])))
+        self.assertNotEqual(
+            self._forward_cache_key(x[1:3], LongTensor([8, 8])),
+            self._forward_cache_key(x[2:4], LongTensor([8, 8])))
+
+
+class ForwardOutputCacheWithoutSharedModuleTestCase(seq2seq.EncoderPaddingTestCase):
+    module_wrapper_class = CountingLinearWrapper
+    cache_forward_outputs = True
+
+    def setUp(self) -> None:
+        with self.assertRaises(AssertionError) as ae:
+            super().setUp()
+        self.assertIn("requires `cache_module_wrapper`", str(ae.exception))
+
+    def test_padding_area_is_zero(self):
+        pass
+
+    def test_batch_size_does_not_matter(self):
+        pass
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,78 @@
+# Copyright 2023 FBK
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License
+import unittest
+
+import torch
+from torch import Tensor, LongTensor, nn
+
+from pangolinn import seq2seq
+
+
+class EmbeddingsCumsumWrapper(seq2seq.PangolinnSeq2SeqModuleWrapper):
+    """
+    Wrapper of an Embeddings layer followed by a cumulative sum over time, which is causal.
+    """
+    def build_module(self) -> nn.Module:
+        return nn.Embedding(self.max_value_allowed, self.num_output_channels)
+
+    @property
+    def num_input_channels(self) -> int:
+        return 1
+
+    @property
+    def input_dtype(self) -> torch.dtype:
+        return torch.long
+
+    @property
+    def num_output_channels(self) -> int:
+        return 4
+
+    def forward(self, x: Tensor, lengths: LongTensor) -> Tensor:
+        return self._module(x.squeeze(-1)).cumsum(dim=1)
+
+
+class EmbeddingsCumsumTestCase(seq2seq.CausalTestCase):
+    module_wrapper_class = EmbeddingsCumsumWrapper
+
+
+class EmbeddingsReverseCumsumWrapper(EmbeddingsCumsumWrapper):
+    """
+    Wrapper of an Embeddings layer followed by a cumulative sum over time in reverse order,
+    so that each output element depends on the future input elements.
+    """
+    def forward(self, x: Tensor, lengths: LongTensor) -> Tensor:
+        return self._module(x.squeeze(-1)).flip(1).cumsum(dim=1).flip(1)
+
+
+class EmbeddingsReverseCumsumTestCase(seq2seq.CausalTestCase):
+    module_wrapper_class = EmbeddingsReverseCumsumWrapper
+    perturbation_sequence_length = 5
+
+    def test_not_looking_at_the_future(self):
+        with self.assertRaises(AssertionError) as ae:
+            super().test_not_looking_at_the_future()
+        self.assertIn("Tensor-likes are not close", str(ae.exception))
+
+    def test_future_perturbation_does_not_affect_past(self):
+        with self.assertRaises(AssertionError) as ae:
+            super().test_future_perturbation_does_not_affect_past()
+        self.assertIn(
+            "10 (output, input) position pairs in which the output changes when altering "
+            "future input elements: [[0, 1], [0, 2], [1, 2], [0, 3], [1, 3], [2, 3], [0, 4], "
+            "[1, 4], [2, 4], [3, 4]]",
+            str(ae.exception))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -50,5 +50,27 @@ class CausalDecoderTestCase(seq2seq.CausalTestCase):
     module_wrapper_class = TransformerDecoderWrapper
 
 
+class WideCumsumWrapper(seq2seq.PangolinnSeq2SeqModuleWrapper):
+    """
+    Wrapper of a wide linear layer followed by a cumulative sum over time, which is causal.
+    """
+    def build_module(self) -> nn.Module:
+        return nn.Linear(self.num_input_channels, self.num_output_channels)
+
+    @property
+    def num_input_channels(self) -> int:
+        return 256
+
+    def forward(self, x: Tensor, lengths: LongTensor) -> Tensor:
+        return self._module(x).cumsum(dim=1)
+
+
+class LongWideDependencyMatrixTestCase(seq2seq.CausalTestCase):
+    # the full Jacobian of the output with respect to the input would require about 23GB
+    # with this sequence length and number of channels
+    module_wrapper_class = WideCumsumWrapper
+    dependency_matrix_sequence_length = 300
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -47,6 +47,73 @@ class NonCausalModuleTestCase(seq2seq.CausalTestCase):
             super().test_gradient_not_flowing_from_future()
         self.assertIn("within 7 places", str(ae.exception))
 
+    def test_dependency_matrix_is_causal(self):
+        with self.assertRaises(AssertionError) as ae:
+            super().test_dependency_matrix_is_causal()
+        self.assertIn(
+            "45 (output, input) position pairs in which the output depends on future input",
+            str(ae.exception))
+        self.assertIn("[0, 1], [0, 2]", str(ae.exception))
+
+    def test_future_perturbation_does_not_affect_past(self):
+        with self.assertRaises(AssertionError) as ae:
+            super().test_future_perturbation_does_not_affect_past()
+        self.assertIn(
+            "190 (output, input) position pairs in which the output changes when altering "
+            "future input elements",
+            str(ae.exception))
+
+
+class SmallLeakWrapper(seq2seq.PangolinnSeq2SeqModuleWrapper):
+    """
+    Wrapper of a linear layer whose output depends slightly on the future input elements.
+    """
+    def build_module(self) -> nn.Module:
+        return nn.Linear(self.num_input_channels, self.num_output_channels)
+
+    @property
+    def num_input_channels(self) -> int:
+        return 4
+
+    def forward(self, x: Tensor, lengths: LongTensor) -> Tensor:
+        return self._module(x + 1e-3 * x.flip(1))
+
+
+class SmallLeakTestCase(seq2seq.CausalTestCase):
+    module_wrapper_class = SmallLeakWrapper
+
+    def test_dependency_matrix_is_causal(self):
+        with self.assertRaises(AssertionError) as ae:
+            super().test_dependency_matrix_is_causal()
+        self.assertIn(
+            "5 (output, input) position pairs in which the output depends on future input "
+            "elements: [[0, 9], [1, 8], [2, 7], [3, 6], [4, 5]]",
+            str(ae.exception))
+
+    def test_gradient_not_flowing_from_future(self):
+        with self.assertRaises(AssertionError):
+            super().test_gradient_not_flowing_from_future()
+
+    def test_not_looking_at_the_future(self):
+        with self.assertRaises(AssertionError):
+            super().test_not_looking_at_the_future()
+
+    def test_future_perturbation_does_not_affect_past(self):
+        with self.assertRaises(AssertionError):
+            super().test_future_perturbation_does_not_affect_past()
+
+
+class SmallLeakWithinTolerancesTestCase(seq2seq.CausalTestCase):
+    # the dependencies on the future are below the tolerances used to compare the outputs
+    module_wrapper_class = SmallLeakWrapper
+    rtol = 1e-2
+    atol = 1e-2
+
+    def test_gradient_not_flowing_from_future(self):
+        # the gradients are checked to be exactly zero, regardless of the tolerances
+        with self.assertRaises(AssertionError):
+            super().test_gradient_not_flowing_from_future()
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,98 @@
+# Copyright 2023 FBK
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License
+import unittest
+
+import torch
+from torch import Tensor, LongTensor, nn
+
+from pangolinn import seq2seq
+
+
+class LinearPaddingSafeWrapper(seq2seq.PangolinnSeq2SeqModuleWrapper):
+    """
+    Wrapper of a linear layer that masks the padding area.
+    """
+    def build_module(self) -> nn.Module:
+        return nn.Linear(self.num_input_channels, self.num_output_channels)
+
+    @property
+    def num_input_channels(self) -> int:
+        return 4
+
+    def forward(self, x: Tensor, lengths: LongTensor) -> Tensor:
+        padding_mask = torch.arange(x.shape[1]).unsqueeze(0) >= lengths.unsqueeze(1)
+        return self._module(x).masked_fill(padding_mask.unsqueeze(-1), 0.0)
+
+
+# The eager backend keeps these tests fast: graphs are still captured (and counted)
+# by dynamo, but they are not optimized.
+class CompiledLinearPaddingTestCase(
+        seq2seq.CompiledModuleTestCase, seq2seq.EncoderPaddingTestCase):
+    module_wrapper_class = LinearPaddingSafeWrapper
+    compile_backend = "eager"
+
+
+class LinearCumsumWrapper(LinearPaddingSafeWrapper):
+    """
+    Wrapper of a linear layer followed by a cumulative sum over time, which is causal.
+    """
+    def forward(self, x: Tensor, lengths: LongTensor) -> Tensor:
+        return self._module(x).cumsum(dim=1)
+
+
+class CompiledLinearCausalTestCase(seq2seq.CompiledModuleTestCase, seq2seq.CausalTestCase):
+    module_wrapper_class = LinearCumsumWrapper
+    compile_backend = "eager"
+
+
+class StaticShapesTestCase(seq2seq.CompiledModuleTestCase):
+    module_wrapper_class = LinearPaddingSafeWrapper
+    compile_backend = "eager"
+    compile_dynamic = False
+
+    def test_recompilations(self):
+        with self.assertRaises(AssertionError) as ae:
+            super().test_recompilations()
+        self.assertIn("while at most 4 compilations are allowed", str(ae.exception))
+
+
+def inductor_available() -> bool:
+    """
+    Whether the inductor backend can compile on this machine (e.g., it requires a C++
+    compiler for the CPU kernels).
+    """
+    if not hasattr(torch, "compile"):
+        return False
+    try:
+        torch.compile(lambda x: x * 2, backend="inductor")(torch.ones(2))
+    except Exception:
+        return False
+    finally:
+        torch._dynamo.reset()
+    return True
+
+
+# The default inductor backend, which generates and compiles the optimized kernels.
+class InductorLinearPaddingTestCase(seq2seq.CompiledModuleTestCase):
+    module_wrapper_class = LinearPaddingSafeWrapper
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        if not inductor_available():
+            raise unittest.SkipTest("the inductor backend is not available")
+        super().setUpClass()
+
+
+if __name__ == '__main__':
+    unittest.main()
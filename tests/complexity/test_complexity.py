@@ -0,0 +1,81 @@
+# Copyright 2023 FBK
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License
+import unittest
+
+from torch import Tensor, LongTensor, nn
+
+from pangolinn import seq2seq
+
+
+class LinearWrapper(seq2seq.PangolinnSeq2SeqModuleWrapper):
+    """
+    Wrapper of a linear layer, whose cost is linear in the sequence length.
+    """
+    def build_module(self) -> nn.Module:
+        return nn.Linear(self.num_input_channels, self.num_output_channels)
+
+    @property
+    def num_input_channels(self) -> int:
+        return 16
+
+    def forward(self, x: Tensor, lengths: LongTensor) -> Tensor:
+        return self._module(x)
+
+
+class LinearComplexityTestCase(seq2seq.ComplexityTestCase):
+    module_wrapper_class = LinearWrapper
+    expected_time_complexity = seq2seq.ComplexityTestCase.LINEAR
+    expected_memory_complexity = seq2seq.ComplexityTestCase.LINEAR
+
+
+class SelfAttentionWrapper(seq2seq.PangolinnSeq2SeqModuleWrapper):
+    """
+    Wrapper of a dot-product self-attention, whose cost is quadratic in the sequence length.
+    """
+    def build_module(self) -> nn.Module:
+        return nn.Linear(self.num_input_channels, self.num_output_channels)
+
+    @property
+    def num_input_channels(self) -> int:
+        return 16
+
+    def forward(self, x: Tensor, lengths: LongTensor) -> Tensor:
+        x = self._module(x)
+        return (x @ x.transpose(1, 2)).softmax(-1) @ x
+
+
+class SelfAttentionComplexityTestCase(seq2seq.ComplexityTestCase):
+    module_wrapper_class = SelfAttentionWrapper
+    expected_memory_complexity = seq2seq.ComplexityTestCase.QUADRATIC
+
+
+class SelfAttentionNotLinearTestCase(seq2seq.ComplexityTestCase):
+    module_wrapper_class = SelfAttentionWrapper
+    expected_time_complexity = seq2seq.ComplexityTestCase.LINEAR
+    expected_memory_complexity = seq2seq.ComplexityTestCase.LINEAR
+    complexity_sequence_lengths = (256, 512, 1024, 2048)
+
+    def test_time_complexity(self):
+        with self.assertRaises(AssertionError) as ae:
+            super().test_time_complexity()
+        self.assertIn("The wall time of the module scales with exponent", str(ae.exception))
+
+    def test_memory_complexity(self):
+        with self.assertRaises(AssertionError) as ae:
+            super().test_memory_complexity()
+        self.assertIn("The peak memory of the module scales with exponent", str(ae.exception))
+
+
+if __name__ == '__main__':
+    unittest.main()
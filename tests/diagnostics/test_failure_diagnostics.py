@@ -0,0 +1,158 @@
+# Copyright 2023 FBK
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License
+import unittest
+
+import torch
+from torch import Tensor, LongTensor, nn
+
+from pangolinn import seq2seq
+from pangolinn.seq2seq.utils import default_tolerances, isclose
+
+
+class AddTimeMean(nn.Module):
+    """
+    Adds to each time step the mean over the whole sequence, including padding and future
+    time steps.
+    """
+    def forward(self, x: Tensor) -> Tensor:
+        return x + x.mean(dim=1, keepdim=True)
+
+
+class LeakingStackWrapper(seq2seq.PangolinnSeq2SeqModuleWrapper):
+    """
+    Wrapper of a stack of layers where only the middle one looks at padding and future
+    time steps.
+    """
+    def build_module(self) -> nn.Module:
+        return nn.Sequential(
+            nn.Linear(self.num_input_channels, 8),
+            AddTimeMean(),
+            nn.Linear(8, self.num_output_channels))
+
+    @property
+    def num_input_channels(self) -> int:
+        return 4
+
+    def forward(self, x: Tensor, lengths: LongTensor) -> Tensor:
+        padding_mask = torch.arange(x.shape[1]).unsqueeze(0) >= lengths.unsqueeze(1)
+        return self._module(x).masked_fill(padding_mask.unsqueeze(-1), 0.0)
+
+
+class LeakingStackPaddingTestCase(seq2seq.EncoderPaddingTestCase):
+    module_wrapper_class = LeakingStackWrapper
+    diagnose_failures = True
+
+    def test_batch_size_does_not_matter(self):
+        with self.assertRaises(AssertionError) as ae:
+            super().test_batch_size_does_not_matter()
+        self.assertIn("The first submodule whose output diverges is '1'", str(ae.exception))
+        self.assertIn("at positions (0, 0, 0), (0, 0, 1)", str(ae.exception))
+
+
+class LeakingStackCausalTestCase(seq2seq.CausalTestCase):
+    module_wrapper_class = LeakingStackWrapper
+    diagnose_failures = True
+
+    def test_not_looking_at_the_future(self):
+        with self.assertRaises(AssertionError) as ae:
+            super().test_not_looking_at_the_future()
+        self.assertIn("The first submodule whose output diverges is '1'", str(ae.exception))
+
+    def test_gradient_not_flowing_from_future(self):
+        with self.assertRaises(AssertionError):
+            super().test_gradient_not_flowing_from_future()
+
+    def test_dependency_matrix_is_causal(self):
+        with self.assertRaises(AssertionError):
+            super().test_dependency_matrix_is_causal()
+
+    def test_future_perturbation_does_not_affect_past(self):
+        with self.assertRaises(AssertionError):
+            super().test_future_perturbation_does_not_affect_past()
+
+
+class CumsumStackWrapper(LeakingStackWrapper):
+    """
+    Wrapper of a stack of layers that is causal and padding-safe.
+    """
+    def build_module(self) -> nn.Module:
+        return nn.Sequential(
+            nn.Linear(self.num_input_channels, 8),
+            nn.ReLU(),
+            nn.Linear(8, self.num_output_channels))
+
+    def forward(self, x: Tensor, lengths: LongTensor) -> Tensor:
+        padding_mask = torch.arange(x.shape[1]).unsqueeze(0) >= lengths.unsqueeze(1)
+        return self._module(x).cumsum(dim=1).masked_fill(padding_mask.unsqueeze(-1), 0.0)
+
+
+class CumsumStackTestCase(seq2seq.EncoderPaddingTestCase, seq2seq.CausalTestCase):
+    module_wrapper_class = CumsumStackWrapper
+    diagnose_failures = True
+
+
+class AddScaledTimeMean(AddTimeMean):
+    """
+    Adds to each time step a small fraction of the mean over the whole sequence.
+    """
+    def forward(self, x: Tensor) -> Tensor:
+        return x + 1e-2 * x.mean(dim=1, keepdim=True)
+
+
+class SmallLeakStackWrapper(LeakingStackWrapper):
+    """
+    Wrapper of a stack of layers where the first layer that looks at padding and future time
+    steps adds a difference within the tolerances of bfloat16, and the second one does not.
+    """
+    def build_module(self) -> nn.Module:
+        return nn.Sequential(
+            nn.Linear(self.num_input_channels, 8),
+            AddScaledTimeMean(),
+            AddTimeMean(),
+            nn.Linear(8, self.num_output_channels))
+
+
+class SmallLeakStackBFloat16PaddingTestCase(seq2seq.EncoderPaddingTestCase):
+    module_wrapper_class = SmallLeakStackWrapper
+    diagnose_failures = True
+    precision_dtype = torch.bfloat16
+
+    def test_batch_size_does_not_matter(self):
+        # the diagnosis uses the same tolerances of the failing check
+        with self.assertRaises(AssertionError) as ae:
+            super().test_batch_size_does_not_matter()
+        self.assertIn("The first submodule whose output diverges is '2'", str(ae.exception))
+
+
+class IsCloseTestCase(unittest.TestCase):
+    def test_assert_close_default_tolerances(self):
+        expected = torch.zeros(3)
+        # differences within the defaults of torch.testing.assert_close for float32, but
+        # not within the ones of torch.isclose
+        actual = expected + torch.tensor([0.0, 5e-6, 1e-3])
+        self.assertListEqual([True, True, False], isclose(actual, expected).tolist())
+        self.assertListEqual(
+            [True, False, False], isclose(actual, expected, rtol=0.0, atol=0.0).tolist())
+        self.assertListEqual(
+            [True, True], isclose(torch.LongTensor([2, 3]), torch.LongTensor([2, 3])).tolist())
+
+    def test_default_tolerances(self):
+        self.assertTupleEqual((1.3e-6, 1e-5), default_tolerances(torch.float32))
+        self.assertTupleEqual((1.6e-2, 1e-5), default_tolerances(torch.bfloat16))
+        self.assertTupleEqual((5e-2, 1e-5), default_tolerances(torch.bfloat16, rtol=5e-2))
+        self.assertTupleEqual((0.0, 0.0), default_tolerances(torch.long))
+
+
+if __name__ == '__main__':
+    unittest.main()
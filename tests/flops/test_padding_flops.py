@@ -0,0 +1,63 @@
+# Copyright 2023 FBK
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License
+import unittest
+
+import torch
+from torch import Tensor, LongTensor, nn
+
+from pangolinn import seq2seq
+from pangolinn.seq2seq import flops
+
+
+class LinearConvWrapper(seq2seq.PangolinnSeq2SeqModuleWrapper):
+    """
+    Wrapper of a linear layer followed by a convolution.
+    """
+    def build_module(self) -> nn.Module:
+        return nn.ModuleDict({
+            "linear": nn.Linear(self.num_input_channels, self.num_output_channels),
+            "conv": nn.Conv1d(
+                self.num_output_channels, self.num_output_channels, kernel_size=3, padding=1)})
+
+    @property
+    def num_input_channels(self) -> int:
+        return 4
+
+    def forward(self, x: Tensor, lengths: LongTensor) -> Tensor:
+        padding_mask = (torch.arange(x.shape[1]).unsqueeze(0) >= lengths.unsqueeze(1))
+        x = self._module["linear"](x).masked_fill(padding_mask.unsqueeze(-1), 0.0)
+        x = self._module["conv"](x.transpose(1, 2)).transpose(1, 2)
+        return x.masked_fill(padding_mask.unsqueeze(-1), 0.0)
+
+
+class PaddingFlopsTestCase(unittest.TestCase):
+    def test_wasted_flops(self):
+        report = flops.padding_flop_report(LinearConvWrapper(), LongTensor([16, 8, 8, 4]))
+        # 64 padded tokens, of which 36 are valid
+        self.assertAlmostEqual(28 / 64, report.total_wasted_ratio)
+        self.assertEqual(2 * 64 * 4 * 4, report.padded_flops["Linear"])
+        self.assertEqual(2 * 36 * 4 * 4, report.unpadded_flops["Linear"])
+        self.assertEqual(2 * 28 * 4 * 4 * 3, report.wasted_flops["Conv1d"])
+        self.assertAlmostEqual(28 / 64, report.wasted_ratio["Conv1d"])
+
+    def test_no_padding(self):
+        report = flops.padding_flop_report(LinearConvWrapper(), LongTensor([8, 8]))
+        self.assertEqual(0.0, report.total_wasted_ratio)
+        self.assertTrue(all(wasted == 0 for wasted in report.wasted_flops.values()))
+        table = flops.format_report(report)
+        self.assertIn("Conv1d", table)
+
+
+if __name__ == '__main__':
+    unittest.main()
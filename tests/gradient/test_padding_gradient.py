@@ -0,0 +1,170 @@
+# Copyright 2023 FBK
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License
+import unittest
+
+import torch
+from torch import Tensor, LongTensor, nn
+
+from pangolinn import seq2seq
+
+
+class MLPPaddingSafeWrapper(seq2seq.PangolinnSeq2SeqModuleWrapper):
+    """
+    Wrapper of a two-layer feed-forward network that masks the padding area.
+    """
+    def build_module(self) -> nn.Module:
+        return nn.Sequential(
+            nn.Linear(self.num_input_channels, 8),
+            nn.Tanh(),
+            nn.Linear(8, self.num_output_channels))
+
+    @property
+    def num_input_channels(self) -> int:
+        return 4
+
+    def forward(self, x: Tensor, lengths: LongTensor) -> Tensor:
+        padding_mask = torch.arange(x.shape[1]).unsqueeze(0) >= lengths.unsqueeze(1)
+        return self._module(x).masked_fill(padding_mask.unsqueeze(-1), 0.0)
+
+
+class MLPPaddingGradientTestCase(seq2seq.PaddingGradientTestCase):
+    module_wrapper_class = MLPPaddingSafeWrapper
+
+
+class ConvPaddingSafeWrapper(MLPPaddingSafeWrapper):
+    """
+    Wrapper of a strided convolution that masks its input and output padding.
+    """
+    def build_module(self) -> nn.Module:
+        return nn.Conv1d(self.num_input_channels, self.num_output_channels, 3, 2, padding=1)
+
+    @property
+    def sequence_downsampling_factor(self) -> int:
+        return 2
+
+    def forward(self, x: Tensor, lengths: LongTensor) -> Tensor:
+        padding_mask = torch.arange(x.shape[1]).unsqueeze(0) >= lengths.unsqueeze(1)
+        x = x.masked_fill(padding_mask.unsqueeze(-1), 0.0)
+        out = self._module(x.transpose(1, 2)).transpose(1, 2)
+        out_lens = (lengths - 1) // 2 + 1
+        out_padding_mask = torch.arange(out.shape[1]).unsqueeze(0) >= out_lens.unsqueeze(1)
+        return out.masked_fill(out_padding_mask.unsqueeze(-1), 0.0)
+
+
+class ConvPaddingGradientTestCase(seq2seq.PaddingGradientTestCase):
+    module_wrapper_class = ConvPaddingSafeWrapper
+
+
+class EmbeddingsWrapper(seq2seq.PangolinnSeq2SeqModuleWrapper):
+    """
+    Wrapper of an Embeddings layer, whose padding index does not receive gradients.
+    """
+    def build_module(self) -> nn.Module:
+        return nn.Embedding(self.max_value_allowed, self.num_output_channels, padding_idx=0)
+
+    @property
+    def num_input_channels(self) -> int:
+        return 1
+
+    @property
+    def input_dtype(self) -> torch.dtype:
+        return torch.long
+
+    @property
+    def num_output_channels(self) -> int:
+        return 4
+
+    def forward(self, x: Tensor, lengths: LongTensor) -> Tensor:
+        return self._module(x.squeeze(-1))
+
+
+class EmbeddingsPaddingGradientTestCase(seq2seq.PaddingGradientTestCase):
+    module_wrapper_class = EmbeddingsWrapper
+
+
+class SequenceNormWrapper(MLPPaddingSafeWrapper):
+    """
+    Wrapper that normalizes each sequence by statistics computed over all the time steps,
+    including padding, and masks the output padding: the forward output over the padding
+    area is zero, but padding affects both the output and the gradients.
+    """
+    def forward(self, x: Tensor, lengths: LongTensor) -> Tensor:
+        x = self._module(x)
+        x = x - x.mean(dim=1, keepdim=True)
+        padding_mask = torch.arange(x.shape[1]).unsqueeze(0) >= lengths.unsqueeze(1)
+        return x.masked_fill(padding_mask.unsqueeze(-1), 0.0)
+
+
+class SequenceNormGradientTestCase(seq2seq.PaddingGradientTestCase):
+    module_wrapper_class = SequenceNormWrapper
+
+    def test_padding_does_not_leak_through_backward(self):
+        with self.assertRaises(AssertionError) as ae:
+            super().test_padding_does_not_leak_through_backward()
+        self.assertIn("non-zero gradient in the padding area", str(ae.exception))
+        self.assertIn("Minimal failing configuration of lengths: [1, 2]", str(ae.exception))
+
+
+class MaskedInputSequenceNormWrapper(MLPPaddingSafeWrapper):
+    """
+    Wrapper that masks its input, so that the padding receives no gradient, but then
+    normalizes each sequence by statistics computed over all the time steps, including the
+    padding, where the output of the feed-forward network is not zero.
+    """
+    def forward(self, x: Tensor, lengths: LongTensor) -> Tensor:
+        padding_mask = torch.arange(x.shape[1]).unsqueeze(0) >= lengths.unsqueeze(1)
+        x = self._module(x.masked_fill(padding_mask.unsqueeze(-1), 0.0))
+        x = x - x.mean(dim=1, keepdim=True)
+        return x.masked_fill(padding_mask.unsqueeze(-1), 0.0)
+
+
+class MaskedInputSequenceNormGradientTestCase(seq2seq.PaddingGradientTestCase):
+    module_wrapper_class = MaskedInputSequenceNormWrapper
+
+    def test_padding_does_not_leak_through_backward(self):
+        with self.assertRaises(AssertionError) as ae:
+            super().test_padding_does_not_leak_through_backward()
+        self.assertIn(
+            "differ from the sum of the gradients of its items without padding",
+            str(ae.exception))
+
+
+class BatchNormLeakWrapper(MLPPaddingSafeWrapper):
+    """
+    Wrapper of a batch normalization layer whose statistics are computed also over the
+    padding, with the output padding masked: in evaluation mode, the running statistics are
+    used and the padding does not affect the output.
+    """
+    def build_module(self) -> nn.Module:
+        return nn.BatchNorm1d(self.num_input_channels)
+
+    def forward(self, x: Tensor, lengths: LongTensor) -> Tensor:
+        padding_mask = torch.arange(x.shape[1]).unsqueeze(0) >= lengths.unsqueeze(1)
+        out = self._module(x.transpose(1, 2)).transpose(1, 2)
+        return out.masked_fill(padding_mask.unsqueeze(-1), 0.0)
+
+
+class BatchNormLeakGradientTestCase(seq2seq.PaddingGradientTestCase):
+    module_wrapper_class = BatchNormLeakWrapper
+    cache_module_wrapper = True
+
+    def test_padding_does_not_leak_through_backward(self):
+        with self.assertRaises(AssertionError) as ae:
+            super().test_padding_does_not_leak_through_backward()
+        self.assertIn("non-zero gradient in the padding area", str(ae.exception))
+        self.assertFalse(self.module_wrapper._module.training)
+
+
+if __name__ == '__main__':
+    unittest.main()
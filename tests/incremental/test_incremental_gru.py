@@ -0,0 +1,64 @@
+# Copyright 2023 FBK
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License
+import unittest
+from typing import Any, Optional, Tuple
+
+from torch import Tensor, LongTensor, nn
+
+from pangolinn import seq2seq
+
+
+class GRUWrapper(seq2seq.PangolinnSeq2SeqModuleWrapper):
+    """
+    Wrapper of a GRU layer, whose hidden state is used as incremental state.
+    """
+    def build_module(self) -> nn.Module:
+        return nn.GRU(self.num_input_channels, self.num_input_channels, batch_first=True)
+
+    @property
+    def num_input_channels(self) -> int:
+        return 4
+
+    def forward(self, x: Tensor, lengths: LongTensor) -> Tensor:
+        return self._module(x)[0]
+
+    def forward_step(self, x: Tensor, state: Optional[Any]) -> Tuple[Tensor, Any]:
+        return self._module(x, state)
+
+
+class GRUIncrementalTestCase(seq2seq.IncrementalDecodingTestCase):
+    module_wrapper_class = GRUWrapper
+    incremental_sequence_length = 64
+    max_step_latency_growth = 10.0
+
+
+class StatelessGRUWrapper(GRUWrapper):
+    """
+    Wrapper of a GRU layer that (wrongly) discards the incremental state.
+    """
+    def forward_step(self, x: Tensor, state: Optional[Any]) -> Tuple[Tensor, Any]:
+        return self._module(x)
+
+
+class StatelessGRUIncrementalTestCase(seq2seq.IncrementalDecodingTestCase):
+    module_wrapper_class = StatelessGRUWrapper
+
+    def test_incremental_decoding_matches_full_forward(self):
+        with self.assertRaises(AssertionError) as ae:
+            super().test_incremental_decoding_matches_full_forward()
+        self.assertIn("Tensor-likes are not close", str(ae.exception))
+
+
+if __name__ == '__main__':
+    unittest.main()
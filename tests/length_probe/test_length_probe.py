@@ -0,0 +1,106 @@
+# Copyright 2023 FBK
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License
+import unittest
+
+from torch import Tensor, LongTensor, nn
+
+from pangolinn import seq2seq
+from pangolinn.seq2seq.length_probe import LengthMapping, fit_length_mapping, \
+    probe_length_mapping, probe_output_lengths
+
+
+class TwoConvsWrapper(seq2seq.PangolinnSeq2SeqModuleWrapper):
+    """
+    Wrapper of two strided convolutions without padding, which do not declare the
+    corresponding downsampling.
+    """
+    def build_module(self) -> nn.Module:
+        return nn.Sequential(
+            nn.Conv1d(self.num_input_channels, self.num_input_channels, kernel_size=3, stride=2),
+            nn.Conv1d(self.num_input_channels, self.num_input_channels, kernel_size=5, stride=3))
+
+    @property
+    def num_input_channels(self) -> int:
+        return 2
+
+    def forward(self, x: Tensor, lengths: LongTensor) -> Tensor:
+        return self._module(x.transpose(1, 2)).transpose(1, 2)
+
+
+class SubsamplingWrapper(seq2seq.PangolinnSeq2SeqModuleWrapper):
+    """
+    Wrapper of a linear layer applied to one every four time steps, which is padding-safe
+    but does not declare its downsampling factor.
+    """
+    def build_module(self) -> nn.Module:
+        return nn.Linear(self.num_input_channels, self.num_input_channels, bias=False)
+
+    @property
+    def num_input_channels(self) -> int:
+        return 4
+
+    def forward(self, x: Tensor, lengths: LongTensor) -> Tensor:
+        return self._module(x[:, ::4, :])
+
+
+class SubsamplingProbedTestCase(seq2seq.EncoderPaddingTestCase):
+    module_wrapper_class = SubsamplingWrapper
+    probe_sequence_lengths = True
+
+    def test_inferred_mapping(self):
+        self.assertEqual(7, self.module_wrapper.output_sequence_length(27))
+        self.assertEqual(4, self._downsampling_factor)
+
+
+class WrongDownsamplingWrapper(SubsamplingWrapper):
+    @property
+    def sequence_downsampling_factor(self) -> int:
+        return 2
+
+
+class LengthProbeTestCase(unittest.TestCase):
+    def test_fit_length_mapping(self):
+        mapping = fit_length_mapping({
+            length: (length - 1) // 4 + 1 for length in range(1, 20)})
+        self.assertEqual(LengthMapping(stride=4, offset=3, bias=0), mapping)
+        self.assertIsNone(fit_length_mapping({1: 2, 2: 4, 3: 6, 4: 8}, max_stride=4))
+
+    def test_probe_stacked_convs(self):
+        output_lengths = probe_output_lengths(TwoConvsWrapper(), range(1, 40))
+        # inputs shorter than the kernels cannot be processed
+        self.assertNotIn(2, output_lengths)
+        self.assertEqual(1, output_lengths[11])
+        mapping = probe_length_mapping(TwoConvsWrapper())
+        self.assertEqual(6, mapping.stride)
+        for length in range(11, 200):
+            expected = ((length - 3) // 2 + 1 - 5) // 3 + 1
+            self.assertEqual(expected, mapping(length))
+
+    def test_wrong_declared_downsampling(self):
+        class WrongDownsamplingTestCase(seq2seq.EncoderPaddingTestCase):
+            module_wrapper_class = WrongDownsamplingWrapper
+            probe_sequence_lengths = True
+
+        test_case = WrongDownsamplingTestCase("test_padding_area_is_zero")
+        with self.assertRaises(AssertionError) as ae:
+            test_case.setUp()
+        self.assertIn(
+            "The output sequence lengths declared by WrongDownsamplingWrapper do not match the "
+            "ones returned by the module, which downsamples the input by a factor 4",
+            str(ae.exception))
+        self.assertIn("(3, 2, 1)", str(ae.exception))
+
+
+if __name__ == '__main__':
+    unittest.main()
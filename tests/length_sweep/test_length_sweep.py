@@ -0,0 +1,56 @@
+# Copyright 2023 FBK
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License
+import unittest
+
+from pangolinn.seq2seq.length_sweep import log_spaced_lengths, shrink_lengths, sweep_lengths
+
+
+class LengthSweepTestCase(unittest.TestCase):
+    def test_boundary_lengths(self):
+        self.assertListEqual([1, 3, 4, 5, 7, 8, 9, 10], sweep_lengths(4, 10))
+        self.assertListEqual([1, 2, 4, 5], sweep_lengths(1, 5))
+        self.assertListEqual(
+            [1, 3, 4, 5, 11, 12, 13, 23, 24, 25, 27], sweep_lengths(4, 27, num_multiples=3))
+
+    def test_number_of_lengths_does_not_grow_with_max_length(self):
+        # the number of lengths bounds the number of forwards of the padding tests
+        self.assertListEqual([1, 2, 26, 27], sweep_lengths(1, 27))
+        self.assertEqual(8, len(sweep_lengths(1, 27, num_random_lengths=4)))
+        self.assertEqual(8, len(sweep_lengths(1, 1000, num_random_lengths=4)))
+        self.assertEqual(9, len(sweep_lengths(2, 1000, num_random_lengths=4)))
+
+    def test_random_lengths(self):
+        lengths = sweep_lengths(8, 100, num_random_lengths=5, seed=1)
+        self.assertEqual(lengths, sweep_lengths(8, 100, num_random_lengths=5, seed=1))
+        boundary_lengths = sweep_lengths(8, 100)
+        self.assertTrue(set(boundary_lengths).issubset(lengths))
+        self.assertGreater(len(lengths), len(boundary_lengths))
+        self.assertTrue(all(1 <= length <= 100 for length in lengths))
+
+    def test_log_spaced_lengths(self):
+        self.assertListEqual([1, 10, 100, 1000], log_spaced_lengths(1, 1000, 4))
+        self.assertListEqual([375, 1061, 3000], log_spaced_lengths(375, 3000, 3))
+        self.assertListEqual([1, 2, 3], log_spaced_lengths(1, 3, 8))
+        self.assertListEqual([5], log_spaced_lengths(5, 5, 3))
+
+    def test_shrink(self):
+        def fails(lengths):
+            return len(lengths) >= 2 and max(lengths) >= 5
+
+        self.assertListEqual([1, 5], shrink_lengths([3, 9, 12, 27], fails))
+        self.assertListEqual([1, 5], shrink_lengths([1, 5], fails))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,75 @@
+# Copyright 2023 FBK
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License
+import unittest
+
+import torch
+from torch import Tensor, LongTensor, nn
+
+from pangolinn import seq2seq
+
+
+class LinearPaddingSafeWrapper(seq2seq.PangolinnSeq2SeqModuleWrapper):
+    """
+    Wrapper of a linear layer that masks the padding area.
+    """
+    def build_module(self) -> nn.Module:
+        return nn.Linear(self.num_input_channels, self.num_output_channels)
+
+    @property
+    def num_input_channels(self) -> int:
+        return 8
+
+    def forward(self, x: Tensor, lengths: LongTensor) -> Tensor:
+        padding_mask = torch.arange(x.shape[1]).unsqueeze(0) >= lengths.unsqueeze(1)
+        return self._module(x).masked_fill(padding_mask.unsqueeze(-1), 0.0)
+
+
+class LinearMemoryTestCase(seq2seq.MemoryTestCase):
+    module_wrapper_class = LinearPaddingSafeWrapper
+
+
+class LinearMemoryValidLengthsTestCase(seq2seq.MemoryTestCase):
+    module_wrapper_class = LinearPaddingSafeWrapper
+    memory_follows_valid_lengths = True
+
+    def test_peak_memory_follows_lengths(self):
+        with self.assertRaises(AssertionError) as ae:
+            super().test_peak_memory_follows_lengths()
+        self.assertIn("predicted from the valid lengths", str(ae.exception))
+
+
+class FlattenedAttentionWrapper(LinearPaddingSafeWrapper):
+    """
+    Wrapper of an attention that (wrongly) flattens the batch, attending over all the time
+    steps of all the sequences in the batch, so that its memory is quadratic in the batch size.
+    """
+    def forward(self, x: Tensor, lengths: LongTensor) -> Tensor:
+        x = self._module(x)
+        flat_x = x.reshape(1, -1, x.shape[-1])
+        attn = (flat_x @ flat_x.transpose(1, 2)).softmax(-1) @ flat_x
+        return attn.reshape(x.shape)
+
+
+class FlattenedAttentionMemoryTestCase(seq2seq.MemoryTestCase):
+    module_wrapper_class = FlattenedAttentionWrapper
+
+    def test_peak_memory_follows_lengths(self):
+        with self.assertRaises(AssertionError) as ae:
+            super().test_peak_memory_follows_lengths()
+        self.assertIn("predicted from the padded lengths", str(ae.exception))
+        self.assertIn("Activation memory per submodule: {'Linear': 131072}", str(ae.exception))
+
+
+if __name__ == '__main__':
+    unittest.main()
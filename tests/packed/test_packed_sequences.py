@@ -0,0 +1,121 @@
+# Copyright 2023 FBK
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License
+import unittest
+
+import torch
+from torch import Tensor, LongTensor, nn
+
+from pangolinn import seq2seq
+from pangolinn.seq2seq.utils import pack_sequences
+
+
+def unpack_sequences(packed: Tensor, lengths: LongTensor) -> Tensor:
+    """
+    Inverse of :py:func:`pangolinn.seq2seq.utils.pack_sequences`.
+    """
+    valid_mask = torch.arange(int(lengths.max())).unsqueeze(0) < lengths.unsqueeze(1)
+    padded = packed.new_zeros((len(lengths), valid_mask.shape[1], packed.shape[-1]))
+    padded[valid_mask] = packed
+    return padded
+
+
+class LinearPackedWrapper(seq2seq.PangolinnSeq2SeqModuleWrapper):
+    """
+    Wrapper of a linear layer, which can be applied to the packed sequences.
+    """
+    def build_module(self) -> nn.Module:
+        return nn.Linear(self.num_input_channels, self.num_output_channels)
+
+    @property
+    def num_input_channels(self) -> int:
+        return 4
+
+    def forward(self, x: Tensor, lengths: LongTensor) -> Tensor:
+        padding_mask = torch.arange(x.shape[1]).unsqueeze(0) >= lengths.unsqueeze(1)
+        return self._module(x).masked_fill(padding_mask.unsqueeze(-1), 0.0)
+
+    def forward_packed(self, x: Tensor, lengths: LongTensor) -> Tensor:
+        return self._module(x)
+
+
+class LinearPackedTestCase(seq2seq.PackedSequenceTestCase):
+    module_wrapper_class = LinearPackedWrapper
+
+    def test_pack_unpack(self):
+        lengths = LongTensor([3, 1, 2])
+        x = self._rand_padded_batch(lengths)
+        packed = pack_sequences(x, lengths)
+        self.assertListEqual([6, 4], list(packed.shape))
+        torch.testing.assert_close(packed[3], x[1, 0])
+        torch.testing.assert_close(unpack_sequences(packed, lengths), x)
+
+
+class StridedConvPackedWrapper(LinearPackedWrapper):
+    """
+    Wrapper of a strided convolution, which halves the sequence length, that processes each
+    packed sequence independently.
+    """
+    def build_module(self) -> nn.Module:
+        return nn.Conv1d(self.num_input_channels, self.num_output_channels, 3, 2, padding=1)
+
+    @property
+    def sequence_downsampling_factor(self) -> int:
+        return 2
+
+    def forward(self, x: Tensor, lengths: LongTensor) -> Tensor:
+        out_lens = (lengths - 1) // 2 + 1
+        padding_mask = torch.arange(x.shape[1]).unsqueeze(0) >= lengths.unsqueeze(1)
+        x = x.masked_fill(padding_mask.unsqueeze(-1), 0.0)
+        out = self._module(x.transpose(1, 2)).transpose(1, 2)
+        out_padding_mask = torch.arange(out.shape[1]).unsqueeze(0) >= out_lens.unsqueeze(1)
+        return out.masked_fill(out_padding_mask.unsqueeze(-1), 0.0)
+
+    def forward_packed(self, x: Tensor, lengths: LongTensor) -> Tensor:
+        return torch.cat([
+            self._module(seq.transpose(0, 1)).transpose(0, 1)
+            for seq in x.split(lengths.tolist())])
+
+
+class StridedConvPackedTestCase(seq2seq.PackedSequenceTestCase):
+    module_wrapper_class = StridedConvPackedWrapper
+    packed_padding_ratios = (0.5, )
+
+
+class NormalizationLeakWrapper(LinearPackedWrapper):
+    """
+    Wrapper that normalizes each sequence by its mean in the padded forward, but whose packed
+    forward normalizes by the mean over all the concatenated sequences.
+    """
+    def forward(self, x: Tensor, lengths: LongTensor) -> Tensor:
+        padding_mask = torch.arange(x.shape[1]).unsqueeze(0) >= lengths.unsqueeze(1)
+        x = x.masked_fill(padding_mask.unsqueeze(-1), 0.0)
+        mean = x.sum(dim=1, keepdim=True) / lengths.view(-1, 1, 1)
+        return (x - mean).masked_fill(padding_mask.unsqueeze(-1), 0.0)
+
+    def forward_packed(self, x: Tensor, lengths: LongTensor) -> Tensor:
+        return x - x.mean(dim=0, keepdim=True)
+
+
+class NormalizationLeakTestCase(seq2seq.PackedSequenceTestCase):
+    module_wrapper_class = NormalizationLeakWrapper
+
+    def test_packed_matches_padded(self):
+        with self.assertRaises(AssertionError) as ae:
+            super().test_packed_matches_padded()
+        self.assertIn("The padding-free output differs from the padded one", str(ae.exception))
+        self.assertIn("Minimal failing configuration of lengths: [1, 1]", str(ae.exception))
+
+
+if __name__ == '__main__':
+    unittest.main()
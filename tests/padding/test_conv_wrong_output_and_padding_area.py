@@ -55,6 +55,7 @@ class ConvPaddingUnsafeTestCase(seq2seq.EncoderPaddingTestCase):
         with self.assertRaises(AssertionError) as ae:
             super().test_batch_size_does_not_matter()
         self.assertIn("Tensor-likes are not close", str(ae.exception))
+        self.assertIn("Minimal failing configuration of lengths: [1, 3]", str(ae.exception))
 
 
 if __name__ == '__main__':
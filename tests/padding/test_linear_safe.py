@@ -46,6 +46,10 @@ class LinearPaddingSafeWrapper(seq2seq.PangolinnSeq2SeqModuleWrapper):
 class LinearPaddingSafeTestCase(seq2seq.EncoderPaddingTestCase):
     module_wrapper_class = LinearPaddingSafeWrapper
 
+    def test_batches_max_lengths(self):
+        # the longest sequence of the second batch is divisible by 4
+        self.assertListEqual([27, 24], [max(lengths) for lengths in self._batches_lengths()])
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,85 @@
+# Copyright 2023 FBK
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License
+import unittest
+
+import torch
+from torch import Tensor, LongTensor, nn
+
+from pangolinn import seq2seq
+
+
+class AttentionPaddingSafeWrapper(seq2seq.PangolinnSeq2SeqModuleWrapper):
+    """
+    Wrapper of a Transformer encoder layer that masks the padding both in the attention and
+    in the output.
+    """
+    def build_module(self) -> nn.Module:
+        return nn.TransformerEncoderLayer(
+            self.num_input_channels, 2, dim_feedforward=16, batch_first=True)
+
+    @property
+    def num_input_channels(self) -> int:
+        return 8
+
+    def forward(self, x: Tensor, lengths: LongTensor) -> Tensor:
+        padding_mask = torch.arange(x.shape[1]).unsqueeze(0) >= lengths.unsqueeze(1)
+        output = self._module(x, src_key_padding_mask=padding_mask)
+        return output.masked_fill(padding_mask.unsqueeze(-1), 0.0)
+
+
+class BFloat16PaddingTestCase(seq2seq.EncoderPaddingTestCase):
+    module_wrapper_class = AttentionPaddingSafeWrapper
+    precision_dtype = torch.bfloat16
+
+    def test_module_and_inputs_cast(self):
+        self.assertEqual(torch.bfloat16, self.module_wrapper._module.linear1.weight.dtype)
+        self.assertEqual(torch.bfloat16, self._rand_tensor((1, 2, 8), torch.float).dtype)
+        self.assertDictEqual({"rtol": 5e-2, "atol": 5e-2}, self._tolerances())
+
+
+class CausalDecoderWrapper(seq2seq.PangolinnSeq2SeqModuleWrapper):
+    """
+    Wrapper of a Transformer decoder layer with causal attention mask.
+    """
+    def build_module(self) -> nn.Module:
+        return nn.TransformerDecoderLayer(
+            self.num_input_channels, 1, dim_feedforward=8, batch_first=True)
+
+    @property
+    def num_input_channels(self) -> int:
+        return 4
+
+    def forward(self, x: Tensor, lengths: LongTensor) -> Tensor:
+        fake_encoder_out = torch.ones(x.shape[0], 1, self.num_input_channels, dtype=x.dtype)
+        tgt_mask = nn.Transformer.generate_square_subsequent_mask(x.shape[1], dtype=x.dtype)
+        return self._module(x, memory=fake_encoder_out, tgt_mask=tgt_mask)
+
+
+class BFloat16CausalTestCase(seq2seq.CausalTestCase):
+    module_wrapper_class = CausalDecoderWrapper
+    precision_dtype = torch.bfloat16
+
+
+class Float16CustomTolerancesCausalTestCase(seq2seq.CausalTestCase):
+    module_wrapper_class = CausalDecoderWrapper
+    precision_dtype = torch.float16
+    rtol = 1e-2
+    atol = 1e-2
+
+    def test_tolerances(self):
+        self.assertDictEqual({"rtol": 1e-2, "atol": 1e-2}, self._tolerances())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,91 @@
+# Copyright 2023 FBK
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License
+import io
+import json
+import os
+import tempfile
+import unittest
+
+import torch
+from torch import Tensor, LongTensor, nn
+
+from pangolinn import seq2seq
+from pangolinn.seq2seq.profiling import SubmoduleProfile, format_profile
+
+
+class MLPWrapper(seq2seq.PangolinnSeq2SeqModuleWrapper):
+    """
+    Wrapper of a two-layer feed-forward network that masks the padding area.
+    """
+    def build_module(self) -> nn.Module:
+        return nn.Sequential(
+            nn.Linear(self.num_input_channels, 8),
+            nn.ReLU(),
+            nn.Linear(8, self.num_output_channels))
+
+    @property
+    def num_input_channels(self) -> int:
+        return 4
+
+    def forward(self, x: Tensor, lengths: LongTensor) -> Tensor:
+        padding_mask = torch.arange(x.shape[1]).unsqueeze(0) >= lengths.unsqueeze(1)
+        return self._module(x).masked_fill(padding_mask.unsqueeze(-1), 0.0)
+
+
+class SubmoduleProfileTestCase(unittest.TestCase):
+    def test_record(self):
+        module_wrapper = MLPWrapper()
+        profile = SubmoduleProfile()
+        x = torch.rand(2, 5, 4)
+        with profile.record(module_wrapper._module):
+            module_wrapper.forward(x, LongTensor([5, 3]))
+            module_wrapper.forward(x, LongTensor([5, 3]))
+        module_wrapper.forward(x, LongTensor([5, 3]))
+        records = {record["submodule"]: record for record in profile.to_records()}
+        self.assertSetEqual({"Sequential", "0", "1", "2"}, set(records.keys()))
+        for record in records.values():
+            self.assertEqual(2, record["calls"])
+            self.assertLessEqual(record["total_time"], records["Sequential"]["total_time"])
+        self.assertEqual("Sequential", profile.to_records()[0]["submodule"])
+        table = format_profile(profile).split("\n")
+        self.assertEqual(5, len(table))
+        self.assertIn("calls", table[0])
+
+
+class ProfiledPaddingTestCase(seq2seq.EncoderPaddingTestCase):
+    module_wrapper_class = MLPWrapper
+    profile_submodules = True
+
+
+class ProfiledTestRunTestCase(unittest.TestCase):
+    def test_profile_saved_at_the_end_of_the_class(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            test_class = type(
+                "ProfiledPaddingTestCase",
+                (ProfiledPaddingTestCase, ),
+                {"profile_output_dir": tmp_dir, "__module__": __name__})
+            suite = unittest.defaultTestLoader.loadTestsFromTestCase(test_class)
+            result = unittest.TextTestRunner(stream=io.StringIO()).run(suite)
+            self.assertTrue(result.wasSuccessful())
+            with open(os.path.join(tmp_dir, f"{__name__}.ProfiledPaddingTestCase.json")) as f:
+                records = json.load(f)
+        self.assertEqual("Sequential", records[0]["submodule"])
+        calls = {record["submodule"]: record["calls"] for record in records}
+        # each test runs at least the forward over the whole batch
+        self.assertGreaterEqual(calls["Sequential"], 2)
+        self.assertEqual(calls["Sequential"], calls["0"])
+
+
+if __name__ == '__main__':
+    unittest.main()
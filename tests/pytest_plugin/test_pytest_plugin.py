@@ -0,0 +1,118 @@
+# Copyright 2023 FBK
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License
+import os
+import subprocess
+import sys
+import tempfile
+import textwrap
+import unittest
+
+from pangolinn import seq2seq
+
+
+TEST_MODULE = textwrap.dedent("""
+    import torch
+    from torch import nn
+
+    from pangolinn import seq2seq
+    from pangolinn.pytest_plugin import register_wrapper
+
+
+    @register_wrapper(cache_module_wrapper=True)
+    class CumsumWrapper(seq2seq.PangolinnSeq2SeqModuleWrapper):
+        def build_module(self):
+            return nn.Linear(self.num_input_channels, self.num_output_channels)
+
+        @property
+        def num_input_channels(self):
+            return 4
+
+        def forward(self, x, lengths):
+            padding_mask = torch.arange(x.shape[1]).unsqueeze(0) >= lengths.unsqueeze(1)
+            return self._module(x).cumsum(dim=1).masked_fill(padding_mask.unsqueeze(-1), 0.0)
+
+
+    @register_wrapper(seq2seq.EncoderPaddingTestCase)
+    class PaddingUnsafeWrapper(CumsumWrapper):
+        def forward(self, x, lengths):
+            return self._module(x).cumsum(dim=1)
+    """)
+
+# imports the wrappers, which must not generate tests in this module
+IMPORTING_TEST_MODULE = "from test_wrappers import CumsumWrapper  # noqa: F401\n"
+
+# the tests generated for each wrapper of TEST_MODULE, as (test class, test method name)
+EXPECTED_TESTS = [
+    (f"{wrapper}{tester.__name__}", test_name)
+    for wrapper, testers in [
+        ("CumsumWrapper", [seq2seq.EncoderPaddingTestCase, seq2seq.CausalTestCase]),
+        ("PaddingUnsafeWrapper", [seq2seq.EncoderPaddingTestCase])]
+    for tester in testers
+    for test_name in unittest.TestLoader().getTestCaseNames(tester)]
+
+
+class PytestPluginTestCase(unittest.TestCase):
+    def _run_pytest(self, *args: str) -> subprocess.CompletedProcess:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            with open(os.path.join(tmp_dir, "test_wrappers.py"), "w") as f:
+                f.write(TEST_MODULE)
+            with open(os.path.join(tmp_dir, "test_importing_wrappers.py"), "w") as f:
+                f.write(IMPORTING_TEST_MODULE)
+            # the plugin is loaded explicitly, as pangolinn may not be installed with its
+            # entry points in the environment running the tests
+            env = dict(os.environ, PYTEST_DISABLE_PLUGIN_AUTOLOAD="1")
+            return subprocess.run(
+                [sys.executable, "-m", "pytest", "-p", "pangolinn.pytest_plugin",
+                 "-p", "no:cacheprovider", "--rootdir", tmp_dir, *args],
+                cwd=tmp_dir,
+                env=env,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT,
+                universal_newlines=True)
+
+    def test_collection(self):
+        result = self._run_pytest("--collect-only", "-q")
+        self.assertEqual(0, result.returncode, msg=result.stdout)
+        collected = [line for line in result.stdout.split("\n") if "::" in line]
+        self.assertIn(
+            "test_wrappers.py::CumsumWrapperCausalTestCase::test_not_looking_at_the_future",
+            collected)
+        self.assertIn(
+            "test_wrappers.py::PaddingUnsafeWrapperEncoderPaddingTestCase::"
+            "test_padding_area_is_zero",
+            collected)
+        self.assertListEqual(
+            sorted(f"test_wrappers.py::{cls}::{name}" for cls, name in EXPECTED_TESTS),
+            sorted(collected),
+            msg=result.stdout)
+
+    def test_run_reports_failures_and_timings(self):
+        result = self._run_pytest("-q")
+        self.assertEqual(1, result.returncode, msg=result.stdout)
+        self.assertIn(
+            "FAILED test_wrappers.py::PaddingUnsafeWrapperEncoderPaddingTestCase::"
+            "test_padding_area_is_zero",
+            result.stdout)
+        self.assertIn("pangolinn timings", result.stdout)
+        timing_lines = {
+            line.split()[0]: line.split() for line in result.stdout.split("\n")
+            if line.startswith(("CumsumWrapper ", "PaddingUnsafeWrapper "))}
+        for wrapper in ["CumsumWrapper", "PaddingUnsafeWrapper"]:
+            self.assertEqual(
+                str(sum(1 for cls, _ in EXPECTED_TESTS if cls.startswith(wrapper))),
+                timing_lines[wrapper][1])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,70 @@
+# Copyright 2023 FBK
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License
+import unittest
+
+import torch
+from torch import Tensor, LongTensor, nn
+
+from pangolinn import seq2seq
+
+
+class LinearPaddingSafeWrapper(seq2seq.PangolinnSeq2SeqModuleWrapper):
+    """
+    Wrapper of a linear layer that masks the padding area.
+    """
+    def build_module(self) -> nn.Module:
+        return nn.Linear(self.num_input_channels, self.num_output_channels)
+
+    @property
+    def num_input_channels(self) -> int:
+        return 4
+
+    def forward(self, x: Tensor, lengths: LongTensor) -> Tensor:
+        padding_mask = torch.arange(x.shape[1]).unsqueeze(0) >= lengths.unsqueeze(1)
+        return self._module(x).masked_fill(padding_mask.unsqueeze(-1), 0.0)
+
+
+class QuantizedLinearPaddingTestCase(
+        seq2seq.QuantizedModuleTestCase, seq2seq.EncoderPaddingTestCase):
+    module_wrapper_class = LinearPaddingSafeWrapper
+
+    def test_module_is_quantized(self):
+        self.assertIsInstance(
+            self.module_wrapper._module, torch.ao.nn.quantized.dynamic.Linear)
+
+
+class LinearCumsumWrapper(LinearPaddingSafeWrapper):
+    """
+    Wrapper of a linear layer followed by a cumulative sum over time, which is causal.
+    """
+    def forward(self, x: Tensor, lengths: LongTensor) -> Tensor:
+        return self._module(x).cumsum(dim=1)
+
+
+class QuantizedLinearCausalTestCase(seq2seq.QuantizedModuleTestCase, seq2seq.CausalTestCase):
+    module_wrapper_class = LinearCumsumWrapper
+
+
+class TightTolerancesTestCase(seq2seq.QuantizedModuleTestCase):
+    module_wrapper_class = LinearPaddingSafeWrapper
+    rtol = 0.0
+    atol = 1e-7
+
+    def test_quantized_matches_float(self):
+        with self.assertRaises(AssertionError):
+            super().test_quantized_matches_float()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,79 @@
+# Copyright 2023 FBK
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License
+import contextlib
+import io
+import os
+import tempfile
+import textwrap
+import unittest
+from collections import Counter
+
+from pangolinn import run
+
+
+class RunTestCase(unittest.TestCase):
+    def test_run_padding_tests(self):
+        tests_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        results = run.run(
+            os.path.join(tests_dir, "padding"),
+            top_level_dir=tests_dir,
+            num_workers=2,
+            threads_per_worker=1)
+        expected_tests = Counter(
+            test.id().rsplit(".", 1)[0]
+            for test in run._iter_tests(unittest.TestLoader().discover(
+                os.path.join(tests_dir, "padding"), top_level_dir=tests_dir)))
+        self.assertIn("padding.test_linear_safe.LinearPaddingSafeTestCase", expected_tests)
+        self.assertTrue(all(result.was_successful for result in results))
+        self.assertDictEqual(
+            dict(expected_tests), {result.name: result.tests_run for result in results})
+        safe_result = next(
+            result for result in results
+            if result.name == "padding.test_linear_safe.LinearPaddingSafeTestCase")
+        self.assertIn(
+            "padding.test_linear_safe.LinearPaddingSafeTestCase.test_long_sequences",
+            [test_id for test_id, _ in safe_result.skipped])
+
+    def test_main_reports_failures(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            with open(os.path.join(tmp_dir, "test_failing.py"), "w") as f:
+                f.write(textwrap.dedent("""
+                    import unittest
+
+                    class FailingTestCase(unittest.TestCase):
+                        def test_failing(self):
+                            self.assertEqual(1, 2)
+
+                        def test_passing(self):
+                            pass
+
+                        @unittest.skip("skipped")
+                        def test_skipped(self):
+                            pass
+                    """))
+            with open(os.path.join(tmp_dir, "test_import_error.py"), "w") as f:
+                f.write("import not_existing_module\n")
+            output = io.StringIO()
+            with contextlib.redirect_stdout(output):
+                exit_code = run.main(["-s", tmp_dir, "-j", "1"])
+        self.assertEqual(1, exit_code)
+        report = output.getvalue()
+        self.assertIn("FAIL: test_failing.FailingTestCase.test_failing", report)
+        self.assertIn("ERROR: unittest.loader._FailedTest.test_import_error", report)
+        self.assertIn("Ran 4 tests", report)
+        self.assertIn("FAILED (failures=1, errors=1, skipped=1)", report)
+
+
+if __name__ == '__main__':
+    unittest.main()
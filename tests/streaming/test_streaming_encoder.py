@@ -0,0 +1,106 @@
+# Copyright 2023 FBK
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License
+import unittest
+from typing import Any, Optional, Tuple
+
+import torch
+from torch import Tensor, LongTensor, nn
+
+from pangolinn import seq2seq
+
+
+class ConvContextWrapper(seq2seq.PangolinnSeq2SeqModuleWrapper):
+    """
+    Wrapper of a convolution with a left and right context of 2 time steps, which is processed
+    in streaming mode with chunks of 4 time steps, caching the last input time steps of the
+    previous chunk as left context.
+    """
+    context = 2
+
+    def build_module(self) -> nn.Module:
+        return nn.Conv1d(
+            self.num_input_channels, self.num_output_channels, 2 * self.context + 1)
+
+    @property
+    def num_input_channels(self) -> int:
+        return 4
+
+    @property
+    def streaming_chunk_size(self) -> int:
+        return 4
+
+    @property
+    def streaming_lookahead(self) -> int:
+        return 2
+
+    def _conv(self, x: Tensor) -> Tensor:
+        return self._module(x.transpose(1, 2)).transpose(1, 2)
+
+    def forward(self, x: Tensor, lengths: LongTensor) -> Tensor:
+        return self._conv(nn.functional.pad(x, (0, 0, self.context, self.context)))
+
+    def forward_chunk(self, x: Tensor, state: Optional[Any]) -> Tuple[Tensor, Any]:
+        chunk_len = min(self.streaming_chunk_size, x.shape[1])
+        if state is None:
+            state = x.new_zeros((x.shape[0], self.context, x.shape[2]))
+        # at the end of the sequence, the missing right context is padded as in the forward
+        missing_context = self.context - (x.shape[1] - chunk_len)
+        chunk_with_context = nn.functional.pad(
+            torch.cat([state, x], dim=1), (0, 0, 0, max(0, missing_context)))
+        output = self._conv(chunk_with_context[:, :chunk_len + 2 * self.context, :])
+        return output, x[:, chunk_len - self.context:chunk_len, :]
+
+
+class ConvContextStreamingTestCase(seq2seq.StreamingEncoderTestCase):
+    module_wrapper_class = ConvContextWrapper
+
+
+class UnderstatedLookaheadWrapper(ConvContextWrapper):
+    """
+    Wrapper that declares a lookahead shorter than the right context used by its module.
+    """
+    @property
+    def streaming_lookahead(self) -> int:
+        return 1
+
+
+class UnderstatedLookaheadTestCase(seq2seq.StreamingEncoderTestCase):
+    module_wrapper_class = UnderstatedLookaheadWrapper
+
+    def test_output_depends_only_on_chunk_and_lookahead(self):
+        with self.assertRaises(AssertionError) as ae:
+            super().test_output_depends_only_on_chunk_and_lookahead()
+        self.assertIn(
+            "(output, input) position pairs in which the output changes when altering input "
+            "elements after the end of its chunk (of 4 elements) plus the lookahead (of 1 "
+            "elements): [[3, 5], [7, 9], [11, 13],",
+            str(ae.exception))
+
+    def test_chunked_matches_full_forward(self):
+        with self.assertRaises(AssertionError):
+            super().test_chunked_matches_full_forward()
+
+
+class ExceededLatencyTestCase(seq2seq.StreamingEncoderTestCase):
+    module_wrapper_class = ConvContextWrapper
+    max_chunk_latency = 1e-9
+
+    def test_chunk_latency(self):
+        with self.assertRaises(AssertionError) as ae:
+            super().test_chunk_latency()
+        self.assertIn("more than the maximum latency of", str(ae.exception))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,99 @@
+# Copyright 2023 FBK
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License
+import unittest
+
+import torch
+from torch import Tensor, LongTensor, nn
+
+from pangolinn import seq2seq
+
+
+class PositionalCumsumWrapper(seq2seq.PangolinnSeq2SeqModuleWrapper):
+    """
+    Wrapper of a linear layer followed by the addition of a positional bias and a cumulative
+    sum over time, which is causal and padding-safe.
+    """
+    def build_module(self) -> nn.Module:
+        return nn.Linear(self.num_input_channels, self.num_output_channels)
+
+    @property
+    def num_input_channels(self) -> int:
+        return 4
+
+    def positions(self, seq_len: int) -> Tensor:
+        return torch.arange(seq_len, dtype=torch.float)
+
+    def forward(self, x: Tensor, lengths: LongTensor) -> Tensor:
+        positional_bias = 1e-3 * self.positions(x.shape[1]).view(1, -1, 1)
+        padding_mask = torch.arange(x.shape[1]).unsqueeze(0) >= lengths.unsqueeze(1)
+        return (self._module(x) + positional_bias).cumsum(dim=1).masked_fill(
+            padding_mask.unsqueeze(-1), 0.0)
+
+
+class PositionalCumsumPaddingTestCase(seq2seq.EncoderPaddingTestCase):
+    module_wrapper_class = PositionalCumsumWrapper
+    stress_sequence_length = 3000
+    rtol = 1e-4
+    atol = 1e-4
+
+
+class PositionalCumsumCausalTestCase(seq2seq.CausalTestCase):
+    module_wrapper_class = PositionalCumsumWrapper
+    stress_sequence_length = 3000
+    rtol = 1e-4
+    atol = 1e-4
+
+
+class InterpolatedPositionsWrapper(PositionalCumsumWrapper):
+    """
+    Wrapper whose positions are interpolated to the first 1024 ones for sequences longer
+    than 1024, which makes the output depend on the padding and future time steps only for
+    long sequences.
+    """
+    def positions(self, seq_len: int) -> Tensor:
+        positions = super().positions(seq_len)
+        if seq_len > 1024:
+            positions = positions * 1024 / seq_len
+        return positions
+
+
+class InterpolatedPositionsPaddingTestCase(seq2seq.EncoderPaddingTestCase):
+    module_wrapper_class = InterpolatedPositionsWrapper
+    stress_sequence_length = 3000
+    rtol = 1e-4
+    atol = 1e-4
+
+    def test_long_sequences(self):
+        with self.assertRaises(AssertionError) as ae:
+            super().test_long_sequences()
+        self.assertIn(
+            "Mismatch in the time steps [0, 375) of sequences with 375 time steps",
+            str(ae.exception))
+
+
+class InterpolatedPositionsCausalTestCase(seq2seq.CausalTestCase):
+    module_wrapper_class = InterpolatedPositionsWrapper
+    stress_sequence_length = 3000
+    stress_chunk_size = 256
+    rtol = 1e-4
+    atol = 1e-4
+
+    def test_long_sequence_not_looking_at_the_future(self):
+        with self.assertRaises(AssertionError) as ae:
+            super().test_long_sequence_not_looking_at_the_future()
+        self.assertIn("Mismatch in the time steps [0, 3) of sequences with 3", str(ae.exception))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+# Copyright 2023 FBK
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License
+import unittest
+
+import torch
+from torch import Tensor, LongTensor, nn
+
+from pangolinn import seq2seq
+
+
+class LinearWrapper(seq2seq.PangolinnSeq2SeqModuleWrapper):
+    """
+    Wrapper of a linear layer that masks the padding area.
+    """
+    def build_module(self) -> nn.Module:
+        return nn.Linear(self.num_input_channels, self.num_output_channels)
+
+    @property
+    def num_input_channels(self) -> int:
+        return 4
+
+    def forward(self, x: Tensor, lengths: LongTensor) -> Tensor:
+        padding_mask = torch.arange(x.shape[1]).unsqueeze(0) >= lengths.unsqueeze(1)
+        return self._module(x).masked_fill(padding_mask.unsqueeze(-1), 0.0)
+
+
+class LinearThreadScalingTestCase(seq2seq.ThreadScalingTestCase):
+    module_wrapper_class = LinearWrapper
+    thread_batch_lengths = (16, ) * 4
+
+    def test_thread_scaling(self):
+        num_threads = torch.get_num_threads()
+        super().test_thread_scaling()
+        self.assertEqual(num_threads, torch.get_num_threads())
+
+
+class ThreadDependentWrapper(LinearWrapper):
+    """
+    Wrapper whose output changes with the number of threads, as a custom reduction that
+    splits the work among threads would do.
+    """
+    def forward(self, x: Tensor, lengths: LongTensor) -> Tensor:
+        return super().forward(x, lengths) + 1e-7 * torch.get_num_threads()
+
+
+class ThreadDependentTestCase(seq2seq.ThreadScalingTestCase):
+    module_wrapper_class = ThreadDependentWrapper
+    bitwise_thread_determinism = True
+    thread_batch_lengths = (16, ) * 4
+
+    def test_outputs_do_not_depend_on_thread_count(self):
+        with self.assertRaises(AssertionError) as ae:
+            super().test_outputs_do_not_depend_on_thread_count()
+        self.assertIn(
+            "The output with 2 threads is not bitwise identical to the one with 1 threads",
+            str(ae.exception))
+
+
+class ThreadDependentWithinToleranceTestCase(seq2seq.ThreadScalingTestCase):
+    module_wrapper_class = ThreadDependentWrapper
+    thread_batch_lengths = (16, ) * 4
+
+
+class UnattainableScalingTestCase(seq2seq.ThreadScalingTestCase):
+    module_wrapper_class = LinearWrapper
+    thread_batch_lengths = (16, ) * 4
+    min_thread_scaling = 1000.0
+
+    def test_thread_scaling(self):
+        with self.assertRaises(AssertionError) as ae:
+            super().test_thread_scaling()
+        self.assertIn("The throughput with 4 threads is only", str(ae.exception))
+
+
+if __name__ == '__main__':
+    unittest.main()